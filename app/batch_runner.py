@@ -0,0 +1,378 @@
+# app/batch_runner.py – Batch-Klon vieler Artikel in einem Prozess mit Checkpoint-Journal
+import csv
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from app.clone_runner import run_clone_process, new_clone_job, discard_clone_job, fetch_stage, transform_stage, output_stage
+from app.export_cache import is_export_cache_enabled, get_export_cache_stats
+from app.graph_fetcher import NeighbourCache
+from app.pipeline import Stage, run_pipeline, DEFAULT_QUEUE_SIZE
+from app.sap_id import get_token_cache_stats
+from app.sap_id_pool import is_pool_enabled, get_pool_stats
+
+# Statuswerte im Journal (in Reihenfolge des Ablaufs)
+STATUS_FETCHED = "fetched"
+STATUS_IDS_ASSIGNED = "ids_assigned"
+STATUS_UPLOADED = "uploaded"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# Fortschrittsereignisse aus run_clone_process, die ins Journal geschrieben werden
+JOURNAL_EVENTS = {STATUS_FETCHED, STATUS_IDS_ASSIGNED, STATUS_UPLOADED}
+# Letzter Status, bei dem eine vergebene SAP-Nummer auf einen unbestätigten Klon hinweist
+UNCONFIRMED_STATUSES = (STATUS_IDS_ASSIGNED, STATUS_UPLOADED, STATUS_FAILED)
+
+# Stufen im Pipeline-Modus und ihre Standardanzahl Worker
+DEFAULT_STAGE_WORKERS = {"fetch": 2, "transform": 1, "upload": 2}
+
+# Kopfzeilen, die in einer Manifest-Datei als Header erkannt werden
+MANIFEST_HEADERS = {"articlenr", "artikelnr", "identifier"}
+
+
+def read_manifest(path):
+    """
+    Liest eine Manifest-Datei (CSV) mit den zu klonenden Identifiern.
+
+    Erste Spalte: Artikelnummer/Identifier, optionale zweite Spalte: Lieferantennummer.
+    Leere Zeilen, Kommentarzeilen (#) und eine Kopfzeile werden übersprungen,
+    doppelte Identifier werden nur einmal übernommen.
+
+    Parameter:
+        path (str): Pfad zur Manifest-Datei
+
+    Rückgabe:
+        list: Liste von Dicts {"identifier": ..., "supplier_nr": ...}
+    """
+    items = []
+    seen = set()
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for row_nr, row in enumerate(csv.reader(f)):
+            cells = [c.strip() for c in row]
+            if not cells or not cells[0] or cells[0].startswith("#"):
+                continue
+            if row_nr == 0 and cells[0].lower() in MANIFEST_HEADERS:
+                continue
+            identifier = cells[0]
+            if identifier in seen:
+                continue
+            seen.add(identifier)
+            supplier_nr = cells[1] if len(cells) > 1 and cells[1] else None
+            items.append({"identifier": identifier, "supplier_nr": supplier_nr})
+    return items
+
+
+def parse_stage_workers(spec):
+    """
+    Liest die Worker je Pipeline-Stufe, z. B. "fetch=3,transform=1,upload=2".
+    Nicht angegebene Stufen behalten ihren Standardwert.
+
+    Parameter:
+        spec (str): Angabe aus der Kommandozeile (leer = Standardwerte)
+
+    Rückgabe:
+        dict: Stufe → Anzahl Worker
+    """
+    workers = dict(DEFAULT_STAGE_WORKERS)
+    for entry in (spec or "").split(","):
+        if not entry.strip():
+            continue
+        name, _, count = entry.partition("=")
+        name = name.strip()
+        if name not in workers or not count.strip().isdigit() or int(count) < 1:
+            raise ValueError(f"Ungültige Stufen-Angabe '{entry.strip()}' (erwartet z. B. fetch=2, "
+                             f"Stufen: {', '.join(DEFAULT_STAGE_WORKERS)})")
+        workers[name] = int(count)
+    return workers
+
+
+def load_journal_state(journal_path):
+    """
+    Liest das Journal und liefert den letzten Status je Identifier.
+
+    Die beim Status "ids_assigned" vergebenen SAP-Nummern (new_sap_id, new_sap_ids) werden in
+    die folgenden Einträge "uploaded" bzw. "failed" desselben Versuchs übernommen.
+
+    Parameter:
+        journal_path (str): Pfad zur Journal-Datei (JSON Lines)
+
+    Rückgabe:
+        dict: identifier → letzter Journal-Eintrag
+    """
+    state = {}
+    if not os.path.exists(journal_path):
+        return state
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Abgeschnittene letzte Zeile nach einem Absturz ignorieren
+                continue
+            previous = state.get(entry["identifier"])
+            if (previous and previous["status"] in (STATUS_IDS_ASSIGNED, STATUS_UPLOADED)
+                    and entry["status"] in (STATUS_UPLOADED, STATUS_FAILED)):
+                for key in ("new_sap_id", "new_sap_ids"):
+                    if key in previous:
+                        entry.setdefault(key, previous[key])
+            state[entry["identifier"]] = entry
+    return state
+
+
+_journal_lock = threading.Lock()
+
+
+def write_journal_entry(journal_path, identifier, status, **details):
+    """
+    Hängt eine Statuszeile thread-sicher an das Journal an (sofort auf Disk geschrieben).
+
+    Parameter:
+        journal_path (str): Pfad zur Journal-Datei (JSON Lines)
+        identifier (str): Identifier des Artikels
+        status (str): Neuer Status
+        details: Zusätzliche Angaben (z. B. new_sap_id, error)
+    """
+    entry = {
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "identifier": identifier,
+        "status": status,
+        **details
+    }
+    line = json.dumps(entry, ensure_ascii=False)
+    with _journal_lock:
+        with open(journal_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _item_data_dir(data_dir, identifier):
+    """Eigener Zwischenspeicher-Ordner pro Artikel, damit parallele Klone sich nicht überschreiben."""
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", identifier)
+    if safe != identifier:
+        # Ersetzte Zeichen machen Namen mehrdeutig ("a/b" und "a_b"): kurzer Hash der Original-ID
+        safe += "-" + hashlib.sha256(identifier.encode("utf-8")).hexdigest()[:8]
+    path = os.path.join(data_dir, "batch", safe)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _percentile(values, pct):
+    """Einfaches Perzentil (nearest rank) über eine sortierte Liste."""
+    if not values:
+        return 0.0
+    index = max(0, min(len(values) - 1, math.ceil(pct / 100.0 * len(values)) - 1))
+    return values[index]
+
+
+def run_batch(items, sync_config, env_config, template_path, data_dir, journal_path, workers=4, resume=False,
+              stage_workers=None, queue_size=DEFAULT_QUEUE_SIZE, retry_unconfirmed=False):
+    """
+    Führt run_clone_process für viele Identifier in einem Prozess mit begrenztem Worker-Pool aus.
+
+    Jeder Schritt (fetched / ids_assigned / uploaded / done / failed) wird pro Artikel in ein
+    Journal (JSON Lines) geschrieben. Mit resume=True werden bereits abgeschlossene Artikel
+    übersprungen. Brach der vorherige Lauf eines Artikels nach der SAP-Nummernvergabe ab oder
+    schlug danach fehl (ids_assigned / uploaded / failed mit SAP-Nummer), ist offen, ob der
+    Klon bereits in MDM angekommen ist: Der
+    Artikel wird dann nicht erneut geklont (zweite SAP-Nummer, mögliches Duplikat), sondern
+    mit seiner SAP-Nummer zur manuellen Prüfung gemeldet.
+
+    Mit stage_workers läuft der Batch als Pipeline (app/pipeline.py): Laden, Transformation
+    (Lieferantenwechsel bzw. ID- und SAP-Nummernvergabe) und Upload sind eigene Stufen mit
+    eigener Worker-Anzahl und begrenzten Warteschlangen dazwischen, sodass z. B. Artikel N+1
+    geladen wird, während für N die SAP-Nummer vergeben und N-1 hochgeladen wird.
+
+    Parameter:
+        items (list): Einträge aus read_manifest()
+        sync_config (dict): Clone-Konfiguration (einmalig geladen)
+        env_config (dict): Umgebungskonfiguration (einmalig geladen)
+        template_path (str): Pfad zur Payload-Vorlage
+        data_dir (str): Basisordner für Zwischenspeicher
+        journal_path (str): Pfad zur Journal-Datei
+        workers (int): Maximale Anzahl parallel laufender Klone
+        resume (bool): Bereits abgeschlossene Artikel überspringen
+        stage_workers (dict, optional): Worker je Stufe ("fetch", "transform", "upload"),
+            aktiviert den Pipeline-Modus (workers wird dann nicht verwendet)
+        queue_size (int): Plätze in der Warteschlange vor jeder Stufe (Pipeline-Modus)
+        retry_unconfirmed (bool): Zur Prüfung gemeldete Artikel trotzdem neu klonen
+            (nach manueller Prüfung, dass der vorherige Klon nicht in MDM angekommen ist)
+
+    Rückgabe:
+        dict: Zusammenfassung (Anzahl, Laufzeit, Durchsatz, Latenzen)
+    """
+    previous = load_journal_state(journal_path) if resume else {}
+
+    todo = []
+    skipped = 0
+    unconfirmed = []  # Artikel mit vergebener SAP-Nummer, aber unbestätigtem Abschluss
+    for item in items:
+        last = previous.get(item["identifier"])
+        if last and last["status"] == STATUS_DONE:
+            skipped += 1
+            continue
+        if last and last["status"] in UNCONFIRMED_STATUSES and last.get("new_sap_id"):
+            # SAP-Nummer wurde bereits verbraucht, Upload aber nicht bestätigt
+            if not retry_unconfirmed:
+                unconfirmed.append({
+                    "identifier": item["identifier"],
+                    "status": last["status"],
+                    "new_sap_id": last["new_sap_id"],
+                    "new_sap_ids": last.get("new_sap_ids")
+                })
+                continue
+            print(f"[WARNUNG] {item['identifier']}: Vorheriger Lauf endete nach der SAP-Nummernvergabe mit Status "
+                  f"'{last['status']}' (SAP-ID {last['new_sap_id']}) – wird erneut geklont.")
+        todo.append(item)
+
+    for entry in unconfirmed:
+        print(f"[WARNUNG] {entry['identifier']}: Vorheriger Lauf endete nach der SAP-Nummernvergabe mit Status "
+              f"'{entry['status']}' (SAP-ID {', '.join(entry['new_sap_ids'] or [entry['new_sap_id']])}) – nicht erneut geklont, "
+              f"bitte in MDM prüfen.")
+    print(f"[INFO] Batch: {len(todo)} Artikel zu verarbeiten, {skipped} bereits erledigt"
+          f"{f', {len(unconfirmed)} zur Prüfung' if unconfirmed else ''}.")
+
+    # Gemeinsame Nachbarn (z. B. Trade Items mehrerer Artikel) nur einmal pro Batch laden
+    neighbour_cache = NeighbourCache() if sync_config.get("fetch_strategy") == "graph" else None
+
+    latencies = []
+    results = {"ok": 0, "failed": 0}
+    results_lock = threading.Lock()
+
+    def journal_progress(identifier):
+        def progress(event, **details):
+            if event in JOURNAL_EVENTS:
+                write_journal_entry(journal_path, identifier, event, **details)
+        return progress
+
+    def finish(identifier, new_sap_id, duration):
+        write_journal_entry(journal_path, identifier, STATUS_DONE, new_sap_id=new_sap_id, duration_s=round(duration, 3))
+        with results_lock:
+            results["ok"] += 1
+            latencies.append(duration)
+
+    def fail(identifier, error, duration, **details):
+        write_journal_entry(journal_path, identifier, STATUS_FAILED, error=str(error), duration_s=round(duration, 3), **details)
+        print(f"[FEHLER] {identifier}: {error}")
+        with results_lock:
+            results["failed"] += 1
+
+    def process(item):
+        identifier = item["identifier"]
+        started = time.perf_counter()
+        try:
+            new_sap_id, _ = run_clone_process(
+                identifier,
+                sync_config,
+                env_config,
+                template_path,
+                _item_data_dir(data_dir, identifier),
+                supplier_nr=item.get("supplier_nr"),
+                progress=journal_progress(identifier),
+                neighbour_cache=neighbour_cache
+            )
+        except Exception as e:
+            fail(identifier, e, time.perf_counter() - started)
+            return
+        finish(identifier, new_sap_id, time.perf_counter() - started)
+
+    def start_job(job):
+        job["started"] = time.perf_counter()
+        return fetch_stage(job, sync_config, env_config, template_path, neighbour_cache=neighbour_cache)
+
+    def job_done(job):
+        finish(job["identifier"], job["new_sap_id"], time.perf_counter() - job["started"])
+
+    def job_failed(job, stage_name, error):
+        discard_clone_job(job)
+        fail(job["identifier"], error, time.perf_counter() - job.get("started", time.perf_counter()), stage=stage_name)
+
+    pipeline = None
+    started = time.perf_counter()
+    if stage_workers:
+        jobs = (
+            new_clone_job(item["identifier"], _item_data_dir(data_dir, item["identifier"]),
+                          supplier_nr=item.get("supplier_nr"), progress=journal_progress(item["identifier"]))
+            for item in todo
+        )
+        stages = [
+            Stage("fetch", start_job, stage_workers.get("fetch", 1)),
+            Stage("transform", lambda job: transform_stage(job, sync_config, env_config), stage_workers.get("transform", 1)),
+            Stage("upload", lambda job: output_stage(job, sync_config, env_config), stage_workers.get("upload", 1))
+        ]
+        pipeline = run_pipeline(jobs, stages, on_done=job_done, on_error=job_failed, queue_size=queue_size)
+    else:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="clone") as executor:
+            list(executor.map(process, todo))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    summary = {
+        "total": len(items),
+        "processed": len(todo),
+        "skipped": skipped,
+        "unconfirmed": unconfirmed,
+        "ok": results["ok"],
+        "failed": results["failed"],
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_min": round(len(todo) / elapsed * 60, 2) if elapsed > 0 else 0.0,
+        "latency_s": {
+            "min": round(latencies[0], 3) if latencies else 0.0,
+            "p50": round(_percentile(latencies, 50), 3),
+            "p95": round(_percentile(latencies, 95), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0
+        },
+        "sap_token_cache": get_token_cache_stats(),
+        "sap_id_pool": get_pool_stats() if is_pool_enabled() else None,
+        "neighbour_cache": neighbour_cache.stats() if neighbour_cache is not None else None,
+        "export_cache": get_export_cache_stats() if is_export_cache_enabled() else None,
+        "pipeline": pipeline
+    }
+    return summary
+
+
+def print_batch_summary(summary):
+    """Gibt die Zusammenfassung eines Batch-Laufs aus."""
+    lat = summary["latency_s"]
+    print("\n[INFO] Batch abgeschlossen:")
+    print(f"  Artikel gesamt:   {summary['total']} (übersprungen: {summary['skipped']})")
+    print(f"  Erfolgreich:      {summary['ok']}")
+    print(f"  Fehlgeschlagen:   {summary['failed']}")
+    if summary["unconfirmed"]:
+        print(f"  Zur Prüfung:      {len(summary['unconfirmed'])} (SAP-Nummer vergeben, Abschluss unbestätigt: "
+              f"{', '.join(entry['identifier'] for entry in summary['unconfirmed'])}; nach der Prüfung "
+              f"mit --retry-unconfirmed neu klonen)")
+    print(f"  Laufzeit:         {summary['elapsed_s']} s")
+    print(f"  Durchsatz:        {summary['throughput_per_min']} Artikel/min")
+    print(f"  Latenz pro Artikel: min {lat['min']} s | p50 {lat['p50']} s | p95 {lat['p95']} s | max {lat['max']} s")
+    tokens = summary["sap_token_cache"]
+    print(f"  SAP-Token-Cache:  {tokens['hits']} Treffer, {tokens['misses']} Abrufe, {tokens['invalidations']} invalidiert")
+    pool = summary["sap_id_pool"]
+    if pool:
+        print(f"  SAP-Nummern-Pool: {pool['taken_from_pool']} aus Pool, {pool['fetched_sync']} direkt geholt, "
+              f"{pool['reserved']} reserviert, frei: {pool['available']} (Ledger: {pool['ledger']})")
+    neighbours = summary["neighbour_cache"]
+    if neighbours:
+        print(f"  Nachbar-Cache:    {neighbours['hits']} Treffer, {neighbours['misses']} Abfragen, "
+              f"{neighbours['entries']} Entitäten")
+    export_cache = summary["export_cache"]
+    if export_cache:
+        print(f"  Export-Cache:     {export_cache['hits']} Treffer, {export_cache['misses']} Abfragen, "
+              f"Trefferquote {export_cache['hit_rate']:.0%}")
+    pipeline = summary["pipeline"]
+    if pipeline:
+        print("  Pipeline-Stufen:")
+        for stage in pipeline["stages"]:
+            print(f"    {stage['stage']:<10} {stage['workers']} Worker | {stage['items']} ok, {stage['failed']} Fehler | "
+                  f"{stage['throughput_per_min']} Artikel/min | Ø {stage['avg_s']} s | "
+                  f"Auslastung {stage['utilization']:.0%} | wartet auf Eingabe {stage['idle_s']} s, "
+                  f"Rückstau {stage['blocked_s']} s")
+        print(f"  Engpass:          {pipeline['bottleneck']}")
@@ -0,0 +1,218 @@
+# app/blob_upload.py – Paralleler Block-Blob-Upload (Put Block / Put Block List) mit Wiederaufnahme
+import base64
+import hashlib
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import quote
+from xml.etree import ElementTree
+from utils.http_client import request
+
+# Standardwerte für den Block-Upload
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+DEFAULT_BLOCK_WORKERS = 4
+DEFAULT_BLOCK_RETRIES = 3
+UPLOAD_DIR = os.path.join("data", "uploads")
+# API-Version für Block-Operationen (Put Block / Put Block List / Get Block List)
+BLOB_API_VERSION = "2021-08-06"
+
+
+def _with_query(url, query):
+    """Hängt Query-Parameter an eine (ggf. bereits mit SAS-Token versehene) URL an."""
+    return f"{url}{'&' if '?' in url else '?'}{query}"
+
+
+def _block_id(index):
+    # Alle Block-IDs eines Blobs müssen gleich lang sein → feste Breite
+    return base64.b64encode(f"block-{index:08d}".encode("ascii")).decode("ascii")
+
+
+def _block_headers(env_config):
+    # x-ms-blob-type gilt nur für Put Blob, nicht für einzelne Blöcke
+    headers = {k: v for k, v in env_config["headers"].items() if k.lower() != "x-ms-blob-type"}
+    headers["x-ms-version"] = BLOB_API_VERSION
+    return headers
+
+
+def _save_state(state_path, state, lock):
+    with lock:
+        tmp_path = f"{state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, state_path)
+
+
+def _read_block(spool_path, index, block_size):
+    with open(spool_path, "rb") as f:
+        f.seek(index * block_size)
+        return f.read(block_size)
+
+
+def get_uncommitted_block_ids(url, headers):
+    """
+    Fragt die bereits bereitgestellten, noch nicht committeten Blöcke eines Blobs ab.
+
+    Parameter:
+        url (str): Blob-URL
+        headers (dict): Header für Block-Operationen
+
+    Rückgabe:
+        set: Block-IDs (Base64)
+    """
+    response = request("GET", _with_query(url, "comp=blocklist&blocklisttype=uncommitted"), endpoint="blob", headers=headers)
+    if response.status_code == 404:
+        return set()  # Blob existiert noch nicht
+    response.raise_for_status()
+    root = ElementTree.fromstring(response.content)
+    return {name.text for name in root.iter("Name")}
+
+
+def _put_block(url, headers, spool_path, index, block_size, retries):
+    """Lädt einen Block hoch; bei transienten Fehlern wird nur dieser Block wiederholt."""
+    data = _read_block(spool_path, index, block_size)
+    block_url = _with_query(url, f"comp=block&blockid={quote(_block_id(index), safe='')}")
+    block_headers = {**headers, "Content-MD5": base64.b64encode(hashlib.md5(data).digest()).decode("ascii")}
+
+    response = request("PUT", block_url, endpoint="blob", retries=retries, headers=block_headers, data=data)
+    response.raise_for_status()
+    return len(data)
+
+
+def _commit_block_list(url, headers, block_count, content_encoding=None):
+    body = ['<?xml version="1.0" encoding="utf-8"?>', "<BlockList>"]
+    body.extend(f"<Latest>{_block_id(i)}</Latest>" for i in range(block_count))
+    body.append("</BlockList>")
+    headers = {**headers, "Content-Type": "application/xml", "x-ms-blob-content-type": "application/json"}
+    if content_encoding:
+        headers["x-ms-blob-content-encoding"] = content_encoding
+    response = request(
+        "PUT",
+        _with_query(url, "comp=blocklist"),
+        endpoint="blob",
+        headers=headers,
+        data="".join(body).encode("utf-8")
+    )
+    response.raise_for_status()
+
+
+def _upload_from_state(state_path, state, env_config, progress=None):
+    """Lädt alle fehlenden Blöcke gemäss Zustandsdatei hoch und committet die Blockliste."""
+    url = state["url"]
+    headers = _block_headers(env_config)
+    block_size = state["block_size"]
+    block_count = state["block_count"]
+    workers = env_config.get("upload_block_workers") or DEFAULT_BLOCK_WORKERS
+    retries = env_config.get("upload_block_retries", DEFAULT_BLOCK_RETRIES)
+    lock = threading.Lock()
+
+    # Bereits bereitgestellte Blöcke: Server ist massgebend (lokaler Zustand kann veraltet sein)
+    staged_remote = get_uncommitted_block_ids(url, headers) if state["staged"] else set()
+    staged = {i for i in state["staged"] if _block_id(i) in staged_remote}
+    state["staged"] = sorted(staged)
+    missing = [i for i in range(block_count) if i not in staged]
+
+    if staged:
+        print(f"[INFO] Block-Upload wird fortgesetzt: {len(staged)}/{block_count} Blöcke bereits vorhanden.")
+
+    sent = sum(min(block_size, state["size"] - i * block_size) for i in staged)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="blob-block")
+    futures = {}
+    try:
+        futures = {
+            executor.submit(_put_block, url, headers, state["spool_path"], i, block_size, retries): i
+            for i in missing
+        }
+        for future in as_completed(futures):
+            sent += future.result()
+            with lock:
+                state["staged"].append(futures[future])
+            _save_state(state_path, state, lock)
+            if progress is not None:
+                progress("upload_progress", bytes_sent=sent, bytes_total=state["size"])
+    except Exception:
+        # Block endgültig fehlgeschlagen: wartende Blöcke verwerfen, Zustand bleibt für resume_block_upload()
+        executor.shutdown(wait=True, cancel_futures=True)
+        # Noch laufende Blöcke, die erfolgreich waren, ebenfalls als bereitgestellt vermerken
+        for future, index in futures.items():
+            if future.done() and not future.cancelled() and future.exception() is None and index not in state["staged"]:
+                state["staged"].append(index)
+        _save_state(state_path, state, lock)
+        print(f"[FEHLER] Block-Upload abgebrochen – fortsetzen mit: python main.py --resume-upload {state_path}")
+        raise
+    executor.shutdown(wait=True)
+
+    _commit_block_list(url, headers, block_count, state.get("content_encoding"))
+    # Blob ist vollständig: Zwischenspeicher und Zustandsdatei werden nicht mehr benötigt
+    for path in (state["spool_path"], state_path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def upload_entities_in_blocks(chunks, url, filename, env_config, progress=None, content_encoding=None):
+    """
+    Lädt Entitäten als Block-Blob hoch: Der JSON-Body wird in Blöcke geteilt,
+    parallel per Put Block übertragen (Wiederholung je Block) und per Put Block List committet.
+
+    Der Body wird dafür in data/uploads/<filename> abgelegt und der Fortschritt in
+    data/uploads/<filename>.state.json festgehalten, damit ein abgebrochener Upload mit
+    resume_block_upload() an den bereits bereitgestellten Blöcken fortgesetzt werden kann.
+    Nach dem Commit werden beide Dateien gelöscht; nur abgebrochene Uploads bleiben liegen.
+
+    Parameter:
+        chunks (iterable): bytes-Blöcke des JSON-Bodys (siehe entity_uploader.iter_json_array)
+        url (str): Ziel-URL des Blobs
+        filename (str): Dateiname des Blobs
+        env_config (dict): Umgebungskonfiguration (Header, upload_block_size, upload_block_workers)
+        progress (callable, optional): Callback progress(event, **details)
+        content_encoding (str, optional): Kodierung der Blöcke (z. B. "gzip"), wird beim Commit
+            als x-ms-blob-content-encoding gesetzt und für die Wiederaufnahme gespeichert
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    spool_path = os.path.join(UPLOAD_DIR, filename)
+    state_path = f"{spool_path}.state.json"
+
+    size = 0
+    with open(spool_path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+            size += len(chunk)
+
+    block_size = env_config.get("upload_block_size") or DEFAULT_BLOCK_SIZE
+    state = {
+        "url": url,
+        "filename": filename,
+        "spool_path": spool_path,
+        "size": size,
+        "block_size": block_size,
+        "block_count": max(1, math.ceil(size / block_size)),
+        "staged": [],
+        "committed": False,
+        "content_encoding": content_encoding
+    }
+    _save_state(state_path, state, threading.Lock())
+
+    _upload_from_state(state_path, state, env_config, progress)
+
+
+def resume_block_upload(state_path, env_config, progress=None):
+    """
+    Setzt einen abgebrochenen Block-Upload anhand seiner Zustandsdatei fort.
+
+    Parameter:
+        state_path (str): Pfad zu data/uploads/<filename>.state.json
+        env_config (dict): Umgebungskonfiguration
+        progress (callable, optional): Callback progress(event, **details)
+    """
+    with open(state_path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+
+    if state.get("committed"):
+        print(f"[INFO] Upload {state['filename']} ist bereits abgeschlossen.")
+        return
+
+    _upload_from_state(state_path, state, env_config, progress)
+    print(f"[SUCCESS] Upload {state['filename']} erfolgreich fortgesetzt und abgeschlossen.")
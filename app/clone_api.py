@@ -0,0 +1,89 @@
+# app/clone_api.py – Importierbare Klon-Schnittstelle für CLI (main.py) und Streamlit-UI (ui.py)
+import os
+from utils.config_registry import get_clone_config
+from utils.env_config import get_env_config
+from app.clone_runner import run_clone_process
+
+# --- Konstanten und Pfade ---
+DATA_DIR = "data"                         # Speicherort für JSON-Daten
+TEMPLATE_PATH = "payloads/template.json"  # Template für API-Requests
+
+
+def load_clone_config(clone_config):
+    """
+    Lädt eine Clone-Konfiguration anhand ihres technischen Namens aus dem geteilten,
+    validierten Konfigurationsregister (utils/config_registry.py).
+
+    Parameter:
+        clone_config (str): Name der Konfiguration ohne Endung (z. B. exartikel_ArtikelKomplett)
+
+    Rückgabe:
+        dict: Die Konfiguration inkl. Schlüssel "clone_config" (für Upload-Dateinamen)
+    """
+    return get_clone_config(clone_config)
+
+
+def build_entity_link(new_sap_id, entity_type):
+    """
+    Baut den Link zur neu erstellten Entität (sofern BASE_URL gesetzt ist).
+
+    Rückgabe:
+        str|None: URL zur Entität im MDM oder None
+    """
+    base_url = os.getenv("BASE_URL")
+    if not new_sap_id or not base_url:
+        return None
+    return f"{base_url}/entity-manage?id={new_sap_id}&type={entity_type}"
+
+
+def run_clone(clone_config, identifier, supplier_nr=None, progress=None, data_dir=DATA_DIR, upload_delta=None,
+              copies=None):
+    """
+    Führt einen kompletten Klonvorgang im laufenden Prozess aus (ohne Subprozess/Shell).
+
+    Parameter:
+        clone_config (str): Name der Clone-Konfiguration
+        identifier (str): Artikelnummer oder Identifier
+        supplier_nr (str, optional): Neue Lieferantennummer für Lieferantenwechsel-Prozess
+        progress (callable, optional): Callback progress(event, **details) für Live-Fortschritt
+        data_dir (str): Ordner für Zwischenspeicher
+        upload_delta (bool, optional): Delta-Upload beim Lieferantenwechsel erzwingen bzw. abschalten
+            (None = Einstellung "upload_delta" der Konfiguration)
+        copies (int, optional): Anzahl Kopien aus einem Export (None = Einstellung "copies", sonst 1)
+
+    Rückgabe:
+        dict: {"new_sap_id": ..., "entity_type": ..., "link": ..., "new_sap_ids": [...]}
+            – new_sap_ids enthält bei mehreren Kopien die SAP-Nummer jeder Kopie
+    """
+    sync_config = load_clone_config(clone_config)
+    if upload_delta is not None:
+        sync_config["upload_delta"] = upload_delta
+    if copies is not None:
+        sync_config["copies"] = copies
+    env_config = get_env_config()
+
+    # SAP-Nummern aller Kopien aus dem Fortschritt "ids_assigned" übernehmen
+    assigned = {}
+
+    def track(event, **details):
+        if event == "ids_assigned":
+            assigned.update(details)
+        if progress is not None:
+            progress(event, **details)
+
+    new_sap_id, entity_type = run_clone_process(
+        identifier,
+        sync_config,
+        env_config,
+        TEMPLATE_PATH,
+        data_dir,
+        supplier_nr=supplier_nr,
+        progress=track
+    )
+
+    return {
+        "new_sap_id": new_sap_id,
+        "entity_type": entity_type,
+        "link": build_entity_link(new_sap_id, entity_type),
+        "new_sap_ids": assigned.get("new_sap_ids") or ([new_sap_id] if new_sap_id else [])
+    }
@@ -1,78 +1,331 @@
 # Importiere Funktionen für Entity-Export, ID-Vergabe & Relationen, Upload und JSON-Speicherung
-from app.entity_exporter import fetch_entities
-from app.id_mapper import assign_new_ids_and_update_relations
-from app.entity_uploader import upload_entities
+import json
+import os
+from app.entity_exporter import fetch_entities, iter_entities
+from app.graph_fetcher import fetch_entity_graph
+from app.id_mapper import build_id_plan, apply_id_plan, clone_copies, release_id_plan
+from app.entity_uploader import upload_entities, write_json_array
+from app.entity_delta import delta_entities
+from app.export_cache import evict_cached_exports
 from app.supplier_switch import handle_supplier_switch
 from utils.helpers import save_json
+from utils.json_stream import JsonLinesSpool
+from utils.metrics import span, profiled
 
+# Kopf des Debug-Exports send_entities.json (Ziel-Format)
+DEBUG_REQUEST = {"returnRequest": False, "requestId": "debug", "taskId": "debug"}
 
-def run_clone_process(identifier, sync_config, env_config, template_path, data_dir, supplier_nr=None):
+
+def _emit(progress, event, **details):
     """
-    Führt den gesamten Klon-Prozess aus:
-    - Lädt Entitäten anhand der Konfiguration und Identifier
-    - Führt optional das Klonen mit neuen IDs durch
-    - Optional: Lieferantenwechsel-Prozess
-    - Speichert die Daten lokal
-    - Lädt die Daten hoch (sofern kein Debug-Modus aktiv ist)
+    Meldet einen Fortschrittsschritt an den (optionalen) Callback.
+
+    Parameter:
+        progress (callable|None): Callback mit Signatur progress(event, **details)
+        event (str): Name des Schritts (z. B. "fetched", "ids_assigned", "uploaded")
+        details: Zusätzliche Angaben zum Schritt
+    """
+    if progress is not None:
+        progress(event, **details)
+
+
+def _is_supplier_switch(sync_config, supplier_nr):
+    return sync_config.get("process_type") == "lieferantenwechsel" and bool(supplier_nr)
+
+
+def _use_export_cache(sync_config):
+    # Der Lieferantenwechsel verändert die exportierten Entitäten selbst: immer frisch aus MDM laden
+    return sync_config.get("process_type") != "lieferantenwechsel"
+
+
+def _writes_source(sync_config, supplier_nr):
+    # Uploads ausser Klonen mit neuen IDs überschreiben die exportierten Entitäten in MDM
+    return _is_supplier_switch(sync_config, supplier_nr) or not sync_config.get("clone", False)
+
+
+def _copies(sync_config):
+    # Anzahl Kopien pro Artikel (Fan-out, --copies)
+    return max(1, int(sync_config.get("copies", 1) or 1))
+
+
+def _use_streaming(sync_config, supplier_nr):
+    """
+    Streaming-Modus: begrenzter Speicherbedarf unabhängig von der Anzahl Entitäten
+    (nicht für den Lieferantenwechsel, den Graph-Export und mehrere Kopien, die den ganzen
+    Graphen benötigen).
+    """
+    return bool(sync_config.get("stream_entities")) and sync_config.get("fetch_strategy") != "graph" \
+        and not _is_supplier_switch(sync_config, supplier_nr) and _copies(sync_config) == 1
+
+
+def _print_copies(copies):
+    """Gibt je Kopie die neue SAP-Nummer und die Zuordnung alte → neue IDs aus."""
+    for result in copies:
+        print(f"[INFO] Kopie {result['copy']}/{len(copies)}: SAP-Artikelnummer {result['new_sap_id']}")
+        for typ, ids in result["id_map"].items():
+            for old_id, new_id in ids.items():
+                print(f"    {typ}: {old_id} → {new_id}")
+
+
+def new_clone_job(identifier, data_dir, supplier_nr=None, progress=None):
+    """
+    Erstellt den Auftrag für einen Artikel, der durch die Klon-Schritte gereicht wird
+    (fetch_stage → transform_stage → output_stage).
 
     Parameter:
         identifier (str): Identifier (z.B. Artikelnummer) der zu klonenden Entität
-        sync_config (dict): Enthält die Clone-Konfiguration (welche Entitäten, Attribute, etc.)
-        env_config (dict): Umgebungskonfiguration (URLs, Header)
-        template_path (str): Pfad zur Payload-Vorlage
         data_dir (str): Ordner für Zwischenspeicher (JSON-Dateien)
         supplier_nr (str, optional): Neue Lieferantennummer für Lieferantenwechsel-Prozess
+        progress (callable, optional): Callback progress(event, **details)
 
     Rückgabe:
-        Tuple (new_sap_id, entity_type): Neue SAP-ID (falls erzeugt), Entitätstyp
+        dict: Auftrag (Entitäten und neue SAP-ID werden von den Schritten ergänzt)
     """
+    return {
+        "identifier": identifier,
+        "data_dir": data_dir,
+        "supplier_nr": supplier_nr,
+        "progress": progress,
+        "entities": None,   # Liste oder (im Streaming-Modus) Spool bzw. Sicht auf den Spool
+        "spool": None,
+        "new_sap_id": None,
+        "copies": None      # Bei mehreren Kopien: je Kopie {"copy", "new_sap_id", "id_map"}
+    }
 
-    # Konfigurationswerte auslesen
-    entity_type = sync_config["entity_type"]
-    identifier_attribute = sync_config["identifier_attribute"]
+
+def discard_clone_job(job):
+    """Gibt Zwischenspeicher eines Auftrags frei (Spool-Datei im Streaming-Modus)."""
+    if job.get("spool") is not None:
+        job["spool"].remove()
+        job["spool"] = None
+    job["entities"] = None
+
+
+def fetch_stage(job, sync_config, env_config, template_path, neighbour_cache=None):
+    """
+    Schritt 1: Lädt die Entitäten des Artikels aus MDM (je Typ über den Identifier oder
+    entlang der Relationen). Im Streaming-Modus werden sie direkt in einen JSON-Lines-Spool
+    geschrieben, statt sie im Speicher zu sammeln.
+
+    Parameter:
+        job (dict): Auftrag aus new_clone_job()
+        sync_config (dict): Clone-Konfiguration
+        env_config (dict): Umgebungskonfiguration (URLs, Header)
+        template_path (str): Pfad zur Payload-Vorlage
+        neighbour_cache (NeighbourCache, optional): Geteilter Cache für gemeinsame Nachbarn
+
+    Rückgabe:
+        dict: Der Auftrag (mit "entities")
+    """
+    print(f"\n[INFO] Starte Verarbeitung für: {job['identifier']}")
+
+    # Seitenweise Abfrage (Konfiguration vor Umgebung, 0 = alles in einer Abfrage)
+    page_size = int(sync_config.get("page_size", env_config.get("page_size", 0)) or 0)
+
+    with span("stage", stage="fetch") as measured:
+        _fetch(job, sync_config, env_config, template_path, neighbour_cache, page_size)
+        measured["entities"] = len(job["entities"])
+    _emit(job["progress"], "fetched", entity_count=len(job["entities"]))
+    return job
+
+
+def _fetch(job, sync_config, env_config, template_path, neighbour_cache, page_size):
+    identifier = job["identifier"]
+    progress = job["progress"]
     entity_configs = sync_config["entity_configs"]
-    debug_mode = sync_config.get("debug", False)
-    clone_mode = sync_config.get("clone", False)
 
-    print(f"\n[INFO] Starte Verarbeitung für: {identifier}")
+    if _use_streaming(sync_config, job["supplier_nr"]):
+        # Entitäten inkrementell aus den (ggf. seitenweisen) Antworten lesen und in den Spool schreiben
+        os.makedirs(job["data_dir"], exist_ok=True)
+        spool = job["spool"] = JsonLinesSpool(os.path.join(job["data_dir"], "entities.spool.jsonl"))
+        for entity in iter_entities(identifier, entity_configs, env_config, template_path,
+                                    progress=progress, page_size=page_size):
+            spool.write(entity)
+        spool.close()
+        job["entities"] = spool
 
-    # Daten aus MDM abrufen (gemäss Konfiguration)
-    alle_entities = fetch_entities(identifier, entity_configs, env_config, template_path)
+    # Daten aus MDM abrufen (gemäss Konfiguration): je Typ über den Identifier oder entlang der Relationen
+    elif sync_config.get("fetch_strategy") == "graph":
+        job["entities"] = fetch_entity_graph(
+            identifier,
+            entity_configs,
+            env_config,
+            template_path,
+            max_workers=sync_config.get("max_parallel_fetches"),
+            progress=progress,
+            neighbour_cache=neighbour_cache,
+            use_cache=_use_export_cache(sync_config)
+        )
+    else:
+        job["entities"] = fetch_entities(
+            identifier,
+            entity_configs,
+            env_config,
+            template_path,
+            max_workers=sync_config.get("max_parallel_fetches"),
+            progress=progress,
+            page_size=page_size,
+            use_cache=_use_export_cache(sync_config)
+        )
+
+
+def transform_stage(job, sync_config, env_config):
+    """
+    Schritt 2: Lieferantenwechsel oder (im Klon-Modus) Vergabe neuer IDs inkl. SAP-Nummer
+    und Umschreiben der Relationen. Im Streaming-Modus werden die neuen IDs in einem
+    Lesedurchlauf über den Spool festgelegt und erst beim Schreiben angewendet. Mit
+    "copies" > 1 entstehen mehrere Kopien, die gemeinsam hochgeladen werden.
 
-    new_sap_id = None
+    Parameter:
+        job (dict): Auftrag nach fetch_stage()
+        sync_config (dict): Clone-Konfiguration
+        env_config (dict): Umgebungskonfiguration (URLs, Header)
+
+    Rückgabe:
+        dict: Der Auftrag (mit umgeschriebenen "entities" und ggf. "new_sap_id")
+    """
+    identifier = job["identifier"]
+    data_dir = job["data_dir"]
 
     # Sonderfall: Lieferantenwechsel-Prozess
-    if sync_config.get("process_type") == "lieferantenwechsel" and supplier_nr:
+    if _is_supplier_switch(sync_config, job["supplier_nr"]):
         print("[INFO] Lieferantenwechsel-Prozess erkannt – führe Verarbeitung aus...")
-        alle_entities = handle_supplier_switch(
-            alle_entities,
-            identifier,
-            supplier_nr,
-            env_config
-        )
+        source_entities = job["entities"]
+        with span("stage", stage="transform", step="supplier_switch") as measured, profiled():
+            job["entities"] = handle_supplier_switch(
+                source_entities,
+                identifier,
+                job["supplier_nr"],
+                env_config
+            )
+            measured["entities"] = len(job["entities"])
+
+        # Delta-Modus: bestehende Entitäten nur mit geänderten Attributen und neuen Relationen senden
+        if sync_config.get("upload_delta", False):
+            with span("stage", stage="transform", step="delta") as measured, profiled():
+                job["entities"], stats = delta_entities(job["entities"], source_entities)
+                measured["entities"] = len(job["entities"])
+            print(f"[INFO] Delta-Upload: {stats['new']} neue, {stats['changed']} geänderte Entitäten, "
+                  f"{stats['unchanged']} unveränderte ausgelassen.")
+
+    # Mehrere Kopien: Graph nur einmal geladen, SAP-Nummern gemeinsam vergeben, ID-Plan je Kopie
+    elif sync_config.get("clone", False) and _copies(sync_config) > 1:
+        copies = _copies(sync_config)
+        with span("stage", stage="transform", step="id_rewrite") as measured, profiled():
+            job["entities"], job["copies"] = clone_copies(job["entities"], identifier, copies)
+            measured["entities"] = len(job["entities"])
+        new_sap_ids = [result["new_sap_id"] for result in job["copies"]]
+        job["new_sap_id"] = new_sap_ids[0]
+        save_json(job["copies"], f"{data_dir}/id_mapping.json")  # Mapping alte→neue IDs je Kopie
+        _print_copies(job["copies"])
+        _emit(job["progress"], "ids_assigned", new_sap_id=job["new_sap_id"], new_sap_ids=new_sap_ids)
 
     # Falls Klon-Modus aktiv, neue IDs zuweisen und Relationen aktualisieren
-    elif clone_mode:
-        alle_entities, id_map, new_sap_id = assign_new_ids_and_update_relations(alle_entities, identifier)
-        save_json(id_map, f"{data_dir}/id_mapping.json")  # Speichert Mapping alte→neue IDs
+    # (die Dauer enthält die SAP-Nummernvergabe, siehe Spans "sap_step")
+    elif sync_config.get("clone", False):
+        plan = None
+        try:
+            with span("stage", stage="transform", step="id_rewrite") as measured, profiled():
+                if job["spool"] is not None:
+                    spool = job["spool"]
+                    plan = build_id_plan(spool, identifier)
+                    job["entities"] = spool.map(lambda ent: apply_id_plan(ent, plan))
+                else:
+                    plan = build_id_plan(job["entities"], identifier)
+                    job["entities"] = [apply_id_plan(ent, plan) for ent in job["entities"]]
+                measured["entities"] = len(job["entities"])
+            save_json(plan["id_map"], f"{data_dir}/id_mapping.json")  # Speichert Mapping alte→neue IDs
+        except BaseException:
+            # Noch nichts hochgeladen: vergebene SAP-Nummern zurücklegen statt sie zu verlieren
+            if plan is not None:
+                release_id_plan(plan)
+            raise
+        job["new_sap_id"] = plan["new_sap_id"]
+        _emit(job["progress"], "ids_assigned", new_sap_id=plan["new_sap_id"])
 
-    # Entitäten lokal speichern (unabhängig von Debug- oder Klonmodus)
-    save_json(alle_entities, f"{data_dir}/get_entities.json")
+    return job
+
+
+def output_stage(job, sync_config, env_config):
+    """
+    Schritt 3: Lädt die Daten gestreamt hoch bzw. schreibt sie im Debug-Modus nur lokal.
+    Zwischenspeicher des Auftrags werden danach freigegeben.
 
-    # Nur Debug: keine Übertragung, JSON-Datei im Ziel-Format schreiben
-    if debug_mode:
+    Parameter:
+        job (dict): Auftrag nach transform_stage()
+        sync_config (dict): Clone-Konfiguration
+        env_config (dict): Umgebungskonfiguration (URLs, Header)
+
+    Rückgabe:
+        dict: Der Auftrag (Entitäten freigegeben, "new_sap_id" bleibt erhalten)
+    """
+    entities = job["entities"]
+    try:
+        with span("stage", stage="output") as measured:
+            measured["entities"] = len(entities)
+            _output(job, entities, sync_config, env_config)
+    finally:
+        discard_clone_job(job)
+    return job
+
+
+def _output(job, entities, sync_config, env_config):
+    data_dir = job["data_dir"]
+    # Nur Debug: keine Übertragung, Entitäten lokal und JSON-Datei im Ziel-Format schreiben
+    if sync_config.get("debug", False):
         print("\n[DEBUG] Debug-Modus aktiv – keine Daten werden gesendet.")
-        save_json({
-            "request": {"returnRequest": False, "requestId": "debug", "taskId": "debug"},
-            "response": {
-                "status": "success",
-                "totalRecords": len(alle_entities),
-                "entities": alle_entities
-            }
-        }, f"{data_dir}/send_entities.json")
+        # Kompakt und gestreamt (Liste oder Spool), optional gzip-komprimiert (LOCAL_COPY_GZIP)
+        compress = env_config.get("local_copy_gzip", False)
+        write_json_array(entities, f"{data_dir}/get_entities.json", compress=compress)
+        prefix = (f'{{"request":{json.dumps(DEBUG_REQUEST)},"response":{{"status":"success",'
+                  f'"totalRecords":{len(entities)},"entities":')
+        write_json_array(entities, f"{data_dir}/send_entities.json", prefix.encode("utf-8"), b"}}", compress=compress,
+                         measure=False)
     else:
-        # Übertrage Daten per PUT auf Zielsystem
-        upload_entities(alle_entities, env_config, sync_config)
+        # Übertrage Daten per PUT auf Zielsystem (gestreamt); lokale Kopie optional parallel dazu
+        local_copy_path = f"{data_dir}/get_entities.json" if sync_config.get("save_local_copy", True) else None
+        upload_entities(entities, env_config, sync_config, local_copy_path=local_copy_path, progress=job["progress"])
+        if _writes_source(sync_config, job["supplier_nr"]):
+            # Gecachter Export des Artikels ist nach diesem Upload veraltet
+            evict_cached_exports(job["identifier"], sync_config["entity_configs"], env_config["url_get"])
+        _emit(job["progress"], "uploaded", entity_count=len(entities))
+
+
+def run_clone_process(identifier, sync_config, env_config, template_path, data_dir, supplier_nr=None, progress=None,
+                      neighbour_cache=None):
+    """
+    Führt den gesamten Klon-Prozess aus:
+    - Lädt Entitäten anhand der Konfiguration und Identifier
+    - Führt optional das Klonen mit neuen IDs durch
+    - Optional: Lieferantenwechsel-Prozess
+    - Lädt die Daten gestreamt hoch (sofern kein Debug-Modus aktiv ist)
+    - Speichert die Daten lokal (im Debug-Modus immer, sonst optional parallel zum Upload)
+
+    Die Schritte (fetch_stage, transform_stage, output_stage) laufen hier nacheinander; für viele
+    Artikel können sie über app/pipeline.py überlappend ausgeführt werden (siehe batch_runner).
+
+    Parameter:
+        identifier (str): Identifier (z.B. Artikelnummer) der zu klonenden Entität
+        sync_config (dict): Enthält die Clone-Konfiguration (welche Entitäten, Attribute, etc.)
+        env_config (dict): Umgebungskonfiguration (URLs, Header)
+        template_path (str): Pfad zur Payload-Vorlage
+        data_dir (str): Ordner für Zwischenspeicher (JSON-Dateien)
+        supplier_nr (str, optional): Neue Lieferantennummer für Lieferantenwechsel-Prozess
+        progress (callable, optional): Callback progress(event, **details) für Fortschrittsmeldungen
+            ("type_fetched", "fetched", "ids_assigned", "upload_progress", "uploaded")
+        neighbour_cache (NeighbourCache, optional): Geteilter Cache für gemeinsame Nachbarn
+            (nur bei fetch_strategy "graph", z. B. innerhalb eines Batch-Laufs)
+
+    Rückgabe:
+        Tuple (new_sap_id, entity_type): Neue SAP-ID (falls erzeugt), Entitätstyp
+    """
+    job = new_clone_job(identifier, data_dir, supplier_nr=supplier_nr, progress=progress)
+    try:
+        fetch_stage(job, sync_config, env_config, template_path, neighbour_cache=neighbour_cache)
+        transform_stage(job, sync_config, env_config)
+        output_stage(job, sync_config, env_config)
+    finally:
+        discard_clone_job(job)
 
     # Gebe neue SAP-ID (falls vorhanden) und Entitätstyp zurück
-    return new_sap_id, entity_type
+    return job["new_sap_id"], sync_config["entity_type"]
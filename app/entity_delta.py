@@ -0,0 +1,117 @@
+# app/entity_delta.py – Delta-Upload: nur geänderte Attribute und neue Relationen gegenüber dem Export senden
+import json
+from app.entity_index import EntityIndex
+
+
+def _rel_key(rel):
+    # Relationseinträge sind kleine JSON-Objekte: über ihre kanonische Form (sortierte Schlüssel) vergleichen
+    return json.dumps(rel, sort_keys=True, ensure_ascii=False)
+
+
+def _relationship_delta(source_rels, target_rels):
+    """
+    Neue Einträge einer Relation.
+
+    Kamen nur Einträge hinzu, werden nur diese geliefert. Wurden Einträge entfernt oder
+    verändert, lässt sich das nicht als Ergänzung ausdrücken – dann wird die ganze Liste
+    (wie im Vollmodus) gesendet.
+
+    Rückgabe:
+        list|None: Zu sendende Einträge oder None, wenn sich nichts geändert hat
+    """
+    if target_rels is source_rels:
+        return None
+    source_keys = {}
+    for rel in source_rels:
+        key = _rel_key(rel)
+        source_keys[key] = source_keys.get(key, 0) + 1
+
+    added = []
+    for rel in target_rels:
+        key = _rel_key(rel)
+        if source_keys.get(key):
+            source_keys[key] -= 1
+        else:
+            added.append(rel)
+
+    if any(source_keys.values()):
+        return list(target_rels)
+    return added or None
+
+
+def diff_entity(source, target):
+    """
+    Reduziert eine ausgehende Entität auf die Änderungen gegenüber ihrer exportierten Fassung.
+
+    Felder auf oberster Ebene (id, type, name, …) bleiben erhalten; von data werden nur
+    Attribute mit geändertem Wert und die neu hinzugekommenen Relationseinträge übernommen.
+    Copy-on-write-Klone (siehe overlay_entity) teilen unveränderte Teilbäume mit dem Original,
+    diese werden ohne Vergleich der Inhalte übersprungen.
+
+    Parameter:
+        source (dict): Entität wie aus MDM exportiert
+        target (dict): Ausgehende Entität mit derselben ID
+
+    Rückgabe:
+        dict|None: Delta-Entität oder None, wenn keine Änderung vorliegt
+    """
+    source_data = source.get("data", {})
+    target_data = target.get("data", {})
+    if target_data is source_data:
+        return None
+
+    source_attributes = source_data.get("attributes", {})
+    attributes = {}
+    for name, value in target_data.get("attributes", {}).items():
+        old = source_attributes.get(name)
+        if value is not old and value != old:
+            attributes[name] = value
+
+    source_relationships = source_data.get("relationships", {})
+    relationships = {}
+    for name, rels in target_data.get("relationships", {}).items():
+        changed = _relationship_delta(source_relationships.get(name, []), rels)
+        if changed:
+            relationships[name] = changed
+
+    if not attributes and not relationships:
+        return None
+
+    delta = {key: value for key, value in target.items() if key != "data"}
+    data = {}
+    if attributes:
+        data["attributes"] = attributes
+    if relationships:
+        data["relationships"] = relationships
+    delta["data"] = data
+    return delta
+
+
+def delta_entities(entities, source_entities):
+    """
+    Baut die Importdatei für den Delta-Modus: neue Entitäten vollständig, bestehende nur mit
+    ihren Änderungen, unveränderte Entitäten gar nicht.
+
+    Parameter:
+        entities (list): Ausgehende Entitäten (z. B. Ergebnis des Lieferantenwechsels)
+        source_entities (list|EntityIndex): Exportierte Entitäten als Vergleichsbasis
+
+    Rückgabe:
+        tuple: (delta_list, stats) – stats: {"new", "changed", "unchanged"}
+    """
+    index = source_entities if isinstance(source_entities, EntityIndex) else EntityIndex(source_entities)
+    result = []
+    stats = {"new": 0, "changed": 0, "unchanged": 0}
+    for ent in entities:
+        source = index.get(ent.get("type"), ent.get("id"))
+        if source is None:
+            result.append(ent)
+            stats["new"] += 1
+            continue
+        delta = diff_entity(source, ent)
+        if delta is None:
+            stats["unchanged"] += 1
+        else:
+            result.append(delta)
+            stats["changed"] += 1
+    return result, stats
@@ -1,28 +1,42 @@
-# Importiere requests für HTTP-Anfragen und Hilfsfunktion für Payload-Erstellung
-import requests
+# Importiere Thread-Pool für parallele Abfragen, geteilte HTTP-Schicht und Hilfsfunktion für Payload-Erstellung
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from app.export_cache import get_cached_export, is_modified_check_enabled, modified_fingerprint, put_cached_export
 from utils.helpers import load_and_customize_payload
+from utils.http_client import request
+from utils.json_stream import iter_response_entities
+from utils.metrics import span
 
+# Standardwert für die maximale Anzahl gleichzeitiger MDM-Abfragen
+DEFAULT_MAX_PARALLEL_FETCHES = 5
 
-def fetch_entities(identifier, entity_configs, env_config, template_path):
+
+def iter_entity_type(cfg, identifier, env_config, template_path, page_size=0):
     """
-    Lädt Entitäten vom MDM-System basierend auf der übergebenen Konfiguration.
+    Liefert die Entitäten eines konfigurierten Entitätstyps als Generator.
 
-    Diese Funktion baut für jede konfigurierte Entität (z.B. exartikel, exlieferantenartikel etc.)
-    einen Payload dynamisch auf und ruft die MDM-API ab.
+    Die Antwort wird gestreamt und inkrementell geparst, d. h. Entitäten werden schon
+    weitergereicht, während der Rest der Antwort noch übertragen wird. Mit page_size > 0
+    wird seitenweise abgefragt (options.from / options.maxRecords), bis eine Seite weniger
+    als page_size Einträge liefert bzw. totalRecords erreicht ist.
 
     Parameter:
-        identifier (str): Artikelnummer oder generischer Identifier (z.B. axartikelnrsap)
-        entity_configs (list): Liste von Dicts mit Entity-Typen und Attributkonfigurationen
+        cfg (dict): Eintrag aus entity_configs (typ, attributes, relationships, relationship_attributes)
+        identifier (str): Artikelnummer oder generischer Identifier
         env_config (dict): Umgebungskonfiguration (API-Endpunkte, Header)
         template_path (str): Pfad zur JSON-Payload-Vorlage
+        page_size (int): Einträge pro Seite (0 = alles in einer Abfrage)
 
     Rückgabe:
-        list: Alle abgerufenen Entitäten in einem Array
+        generator: Entitäten dieses Typs
     """
+    with span("mdm_fetch", type=cfg["typ"]) as measured:
+        yield from _iter_pages(cfg, identifier, env_config, template_path, page_size, measured)
 
-    all_entities = []  # Hier werden alle gefundenen Entitäten gesammelt
 
-    for cfg in entity_configs:
+def _iter_pages(cfg, identifier, env_config, template_path, page_size, measured):
+    offset = 0
+    while True:
         # Baue dynamischen Payload basierend auf Template + Konfiguration
         payload = load_and_customize_payload(
             template_path=template_path,
@@ -32,15 +46,148 @@ def fetch_entities(identifier, entity_configs, env_config, template_path):
             relationships=cfg["relationships"],
             relationship_attributes=cfg["relationship_attributes"]
         )
+        if page_size:
+            payload["params"].setdefault("options", {}).update({"from": offset, "maxRecords": page_size})
+
+        # Sende POST-Request an die MDM-API und lies die Entitäten, während die Antwort eintrifft
+        meta = {}
+        page_count = 0
+        response = request("POST", env_config["url_get"], endpoint="mdm", json=payload, headers=env_config["headers_get"], stream=True)
+        with response:
+            response.raise_for_status()  # Bei HTTP-Fehler wird Ausnahme geworfen
+            for entity in iter_response_entities(response, meta):
+                page_count += 1
+                yield entity
+            measured["bytes"] += response.raw.tell()
+
+        offset += page_count
+        measured["entities"] += page_count
+        total = meta.get("totalRecords")
+        if not page_size or page_count < page_size or (isinstance(total, int) and offset >= total):
+            return
+
+
+def _modified_fingerprint(cfg, identifier, env_config, template_path, page_size=0):
+    """
+    Fragt dieselben Entitäten ohne Attribute und Relationen ab (nur IDs und Metadaten) und
+    liefert ihr modified_fingerprint() für die Frischeprüfung des Export-Caches.
+    """
+    bare = {**cfg, "attributes": [], "relationships": [], "relationship_attributes": []}
+    with span("mdm_fetch", type=cfg["typ"], check="modified") as measured:
+        return modified_fingerprint(_iter_pages(bare, identifier, env_config, template_path, page_size, measured))
+
+
+def fetch_entity_type(cfg, identifier, env_config, template_path, cancel_event=None, progress=None, page_size=0,
+                      use_cache=True):
+    """
+    Lädt die Entitäten eines einzelnen konfigurierten Entitätstyps (auch vom Graph-Export in
+    app/graph_fetcher.py für die Wurzel und nicht über Relationen erreichbare Typen verwendet).
+
+    Das Ergebnis wird im lokalen Export-Cache (app/export_cache.py) abgelegt; ein gültiger
+    Eintrag für denselben Typ, Identifier und dieselben Felder ersetzt die MDM-Abfrage.
+
+    Parameter:
+        cfg (dict): Eintrag aus entity_configs (typ, attributes, relationships, relationship_attributes)
+        identifier (str): Artikelnummer oder generischer Identifier
+        env_config (dict): Umgebungskonfiguration (API-Endpunkte, Header)
+        template_path (str): Pfad zur JSON-Payload-Vorlage
+        cancel_event (threading.Event, optional): Gesetzt, wenn ein anderer Typ fehlgeschlagen ist
+        progress (callable, optional): Callback progress(event, **details), meldet "type_fetched"
+        page_size (int): Einträge pro Seite (0 = alles in einer Abfrage)
+        use_cache (bool): Export-Cache verwenden (False z. B. beim Lieferantenwechsel)
+
+    Rückgabe:
+        list: Gefundene Entitäten dieses Typs (oder None, falls abgebrochen)
+    """
+
+    # Abbruch, falls ein anderer Typ bereits fehlgeschlagen ist
+    if cancel_event is not None and cancel_event.is_set():
+        return None
+
+    # Zuerst im lokalen Export-Cache nachsehen (optional mit Prüfung des Änderungsdatums in MDM)
+    entities = None
+    if use_cache:
+        verify = None
+        if is_modified_check_enabled():
+            verify = lambda: _modified_fingerprint(cfg, identifier, env_config, template_path, page_size)
+        entities = get_cached_export(cfg, identifier, env_config["url_get"], verify=verify)
+    cached = entities is not None
+
+    if not cached:
+        # Entitäten direkt aus der gestreamten Antwort sammeln (ohne den ganzen Body als Text zu halten)
+        entities = list(iter_entity_type(cfg, identifier, env_config, template_path, page_size))
+        if use_cache:
+            put_cached_export(cfg, identifier, env_config["url_get"], entities)
+
+    if progress is not None:
+        progress("type_fetched", typ=cfg["typ"], entity_count=len(entities), cached=cached)
+
+    return entities
+
+
+def fetch_entities(identifier, entity_configs, env_config, template_path, max_workers=None, progress=None, page_size=0,
+                   use_cache=True):
+    """
+    Lädt Entitäten vom MDM-System basierend auf der übergebenen Konfiguration.
 
-        # Sende POST-Request an die MDM-API mit konfigurierten Headern
-        response = requests.post(env_config["url_get"], json=payload, headers=env_config["headers_get"])
-        response.raise_for_status()  # Bei HTTP-Fehler wird Ausnahme geworfen
-        result = response.json()
+    Diese Funktion baut für jede konfigurierte Entität (z.B. exartikel, exlieferantenartikel etc.)
+    einen Payload dynamisch auf und ruft die MDM-API ab. Die Typen werden parallel abgefragt
+    (höchstens max_workers gleichzeitig) und teilen sich die HTTP-Schicht (Keep-Alive-Pool, Wiederholungen). Das Ergebnis
+    ist unabhängig von der Antwortreihenfolge immer in der Reihenfolge der Konfiguration.
+    Schlägt ein Typ fehl, werden noch nicht gestartete Abfragen abgebrochen und der Fehler
+    weitergereicht.
 
-        # Extrahiere Entitäten aus der Antwortstruktur
-        entities = result.get("response", {}).get("entities", [])
+    Parameter:
+        identifier (str): Artikelnummer oder generischer Identifier (z.B. axartikelnrsap)
+        entity_configs (list): Liste von Dicts mit Entity-Typen und Attributkonfigurationen
+        env_config (dict): Umgebungskonfiguration (API-Endpunkte, Header)
+        template_path (str): Pfad zur JSON-Payload-Vorlage
+        max_workers (int, optional): Maximale Anzahl paralleler Abfragen (1 = sequentiell)
+        progress (callable, optional): Callback progress(event, **details), meldet jeden fertigen Typ
+            sofort ("type_fetched") – bei paralleler Abfrage aus dem jeweiligen Worker-Thread
+        page_size (int): Einträge pro Seite (0 = alles in einer Abfrage)
+        use_cache (bool): Export-Cache verwenden (sofern eingeschaltet, siehe app/export_cache.py)
+
+    Rückgabe:
+        list: Alle abgerufenen Entitäten in einem Array
+    """
+
+    if max_workers is None:
+        max_workers = DEFAULT_MAX_PARALLEL_FETCHES
+    max_workers = max(1, min(int(max_workers), len(entity_configs) or 1))
+
+    if max_workers == 1:
+        # Sequentieller Modus: ein Typ nach dem anderen
+        results = [
+            fetch_entity_type(cfg, identifier, env_config, template_path, progress=progress, page_size=page_size,
+                              use_cache=use_cache)
+            for cfg in entity_configs
+        ]
+    else:
+        cancel_event = threading.Event()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mdm-fetch") as executor:
+            futures = [
+                executor.submit(
+                    fetch_entity_type, cfg, identifier, env_config, template_path, cancel_event, progress, page_size,
+                    use_cache
+                )
+                for cfg in entity_configs
+            ]
+            done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+
+            # Bei Fehler: übrige Abfragen abbrechen und den ersten Fehler (in Konfigurationsreihenfolge) werfen
+            failed = [f for f in futures if f in done and f.exception() is not None]
+            if failed:
+                cancel_event.set()
+                for future in pending:
+                    future.cancel()
+                raise failed[0].exception()
+
+        results = [future.result() for future in futures]
+
+    all_entities = []  # Hier werden alle gefundenen Entitäten gesammelt
 
+    for cfg, entities in zip(entity_configs, results):
         if entities:
             print(f"[OK] {cfg['typ']}: {len(entities)} Eintrag(e) gefunden.")
             all_entities.extend(entities)  # Füge gefundene Entitäten der Gesamtliste hinzu
@@ -48,3 +195,37 @@ def fetch_entities(identifier, entity_configs, env_config, template_path):
             print(f"[HINWEIS] {cfg['typ']}: Kein Eintrag gefunden.")
 
     return all_entities
+
+
+def iter_entities(identifier, entity_configs, env_config, template_path, progress=None, page_size=0):
+    """
+    Liefert alle konfigurierten Entitäten als Generator (Typ für Typ, in Konfigurationsreihenfolge).
+
+    Im Gegensatz zu fetch_entities() wird nichts gesammelt: Jede Entität wird weitergereicht,
+    sobald sie aus der Antwort gelesen ist, damit der Speicherbedarf unabhängig von der
+    Anzahl Entitäten (z. B. Konditionshistorie) bleibt. Der Export-Cache wird hier nicht
+    verwendet, da er die vollständige Liste je Typ speichert.
+
+    Parameter:
+        identifier (str): Artikelnummer oder generischer Identifier
+        entity_configs (list): Liste von Dicts mit Entity-Typen und Attributkonfigurationen
+        env_config (dict): Umgebungskonfiguration (API-Endpunkte, Header)
+        template_path (str): Pfad zur JSON-Payload-Vorlage
+        progress (callable, optional): Callback progress(event, **details), meldet "type_fetched"
+        page_size (int): Einträge pro Seite (0 = alles in einer Abfrage)
+
+    Rückgabe:
+        generator: Entitäten
+    """
+    for cfg in entity_configs:
+        count = 0
+        for entity in iter_entity_type(cfg, identifier, env_config, template_path, page_size):
+            count += 1
+            yield entity
+
+        if count:
+            print(f"[OK] {cfg['typ']}: {count} Eintrag(e) gefunden.")
+        else:
+            print(f"[HINWEIS] {cfg['typ']}: Kein Eintrag gefunden.")
+        if progress is not None:
+            progress("type_fetched", typ=cfg["typ"], entity_count=count)
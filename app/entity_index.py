@@ -0,0 +1,78 @@
+# app/entity_index.py – Index über exportierte Entitäten (nach Typ und ID)
+
+
+class EntityIndex:
+    """
+    Indiziert eine Liste exportierter Entitäten einmalig nach Typ und ID, damit Prozesse
+    wie der Lieferantenwechsel nicht wiederholt die ganze Liste durchsuchen.
+
+    - by_type:   typ → [Entitäten] (in Exportreihenfolge)
+    - by_id:     (typ, id) → Entität
+    """
+
+    def __init__(self, entities):
+        self.by_type = {}
+        self.by_id = {}
+
+        for ent in entities:
+            typ = ent.get("type")
+            self.by_type.setdefault(typ, []).append(ent)
+            self.by_id[(typ, ent.get("id"))] = ent
+
+    def of_type(self, typ):
+        """Alle Entitäten eines Typs."""
+        return self.by_type.get(typ, [])
+
+    def first(self, typ):
+        """Erste Entität eines Typs oder None."""
+        entities = self.by_type.get(typ)
+        return entities[0] if entities else None
+
+    def get(self, typ, entity_id):
+        """Entität nach Typ und ID oder None."""
+        return self.by_id.get((typ, entity_id))
+
+    def related(self, ent, rel_name, typ):
+        """
+        Entitäten vom Typ typ, auf die ent über die eigene Relation rel_name zeigt
+        (nur vorwärts, in Reihenfolge der Relationseinträge; fehlende Ziele werden übersprungen).
+        """
+        result = []
+        for rel in ent.get("data", {}).get("relationships", {}).get(rel_name, []):
+            other = self.by_id.get((typ, rel.get("relTo", {}).get("id")))
+            if other is not None:
+                result.append(other)
+        return result
+
+
+def overlay_entity(ent, attributes=None, relationships=None, drop=(), **fields):
+    """
+    Copy-on-write-Klon einer Entität: nur die geänderten Pfade werden neu angelegt,
+    alle übrigen Attribute und Relationen teilt der Klon mit dem Original.
+
+    Der Klon darf daher nur über overlay_entity() verändert werden (oder nach einer
+    eigenen Kopie des betroffenen Teilbaums) – geteilte Teilbäume bleiben unverändert.
+
+    Parameter:
+        ent (dict): Ursprüngliche Entität
+        attributes (dict, optional): Attributname → neuer Attributwert (ersetzt den bisherigen)
+        relationships (dict, optional): Relationsname → neue Liste von Relationen
+        drop (iterable, optional): Felder auf oberster Ebene, die entfernt werden (z. B. "name")
+        **fields: Neue Werte für Felder auf oberster Ebene (z. B. id="...")
+
+    Rückgabe:
+        dict: Neue Entität
+    """
+    clone = dict(ent)
+    for key in drop:
+        clone.pop(key, None)
+    clone.update(fields)
+
+    if attributes or relationships:
+        data = dict(ent.get("data", {}))
+        if attributes:
+            data["attributes"] = {**data.get("attributes", {}), **attributes}
+        if relationships:
+            data["relationships"] = {**data.get("relationships", {}), **relationships}
+        clone["data"] = data
+    return clone
@@ -0,0 +1,324 @@
+# app/entity_model.py – Kompaktes Entitätsmodell (__slots__) und Zugriffsfunktionen für das MDM-JSON-Format
+#
+# Aufbau einer Entität im MDM-Format:
+#     {"id": ..., "name": ..., "type": ...,
+#      "data": {"attributes": {name: {"values": [{"id": "1_0_0", "value": ..., "locale": "de-DE", "source": "internal"}]}},
+#               "relationships": {name: [{"id": "1_0_0", "relTo": {"id": ..., "type": ...}, "properties": {...},
+#                                         "attributes": {...}}]}}}
+#
+# Entity.from_mdm() / to_mdm() bilden dieses Format verlustfrei ab (unbekannte Schlüssel werden
+# mitgeführt). Locale, Source, Wert-IDs, Typen und Namen werden interniert, sodass sie in einem
+# grossen Graphen nur einmal im Speicher liegen. CompactEntities hält damit ganze Graphen, die bis
+# zum Upload im Speicher bleiben (z. B. alle Kopien von clone_copies).
+import sys
+
+DEFAULT_LOCALE = "de-DE"
+DEFAULT_SOURCE = "internal"
+DEFAULT_VALUE_ID = "1_0_0"
+
+
+class _Missing:
+    """Platzhalter für im JSON fehlende Schlüssel (unterscheidet "fehlt" von None)."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "<fehlt>"
+
+
+_MISSING = _Missing()
+_VALUE_KEYS = frozenset({"id", "value", "locale", "source"})
+_REL_KEYS = frozenset({"id", "relTo", "properties", "attributes"})
+_REL_TO_KEYS = frozenset({"id", "type"})
+_ENTITY_KEYS = frozenset({"id", "name", "type", "data"})
+_DATA_KEYS = frozenset({"attributes", "relationships"})
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _extra(obj, known):
+    # Unbekannte Schlüssel (verlustfreie Rückgabe); None, wenn es keine gibt
+    if len(obj) <= len(known) and known.issuperset(obj):
+        return None
+    return {key: value for key, value in obj.items() if key not in known}
+
+
+class AttributeValue:
+    """Ein Wert eines Attributs ({"id", "value", "locale", "source"}) mit internierten Kontextangaben."""
+
+    __slots__ = ("value", "locale", "source", "id", "extra")
+
+    def __init__(self, value, locale=DEFAULT_LOCALE, source=DEFAULT_SOURCE, id=DEFAULT_VALUE_ID, extra=None):
+        self.value = value
+        self.locale = _intern(locale)
+        self.source = _intern(source)
+        self.id = _intern(id)
+        self.extra = extra
+
+    @classmethod
+    def from_mdm(cls, raw):
+        return cls(raw.get("value", _MISSING), raw.get("locale", _MISSING), raw.get("source", _MISSING),
+                   raw.get("id", _MISSING), _extra(raw, _VALUE_KEYS))
+
+    def to_mdm(self):
+        raw = {}
+        for key in ("id", "value", "locale", "source"):
+            value = getattr(self, key)
+            if value is not _MISSING:
+                raw[key] = value
+        if self.extra:
+            raw.update(self.extra)
+        return raw
+
+    def __eq__(self, other):
+        return isinstance(other, AttributeValue) and self.to_mdm() == other.to_mdm()
+
+    def __repr__(self):
+        return f"AttributeValue({self.value!r})"
+
+
+def _attributes_from_mdm(raw):
+    """
+    name → Liste von AttributeValue. Attribute mit weiteren Schlüsseln neben "values"
+    (z. B. verschachtelte Gruppen) bleiben als JSON-Objekt erhalten.
+    """
+    attributes = {}
+    for name, attribute in raw.items():
+        if isinstance(attribute, dict) and list(attribute) == ["values"] and isinstance(attribute["values"], list):
+            attributes[_intern(name)] = [AttributeValue.from_mdm(value) for value in attribute["values"]]
+        else:
+            attributes[_intern(name)] = attribute
+    return attributes
+
+
+def _attributes_to_mdm(attributes):
+    return {
+        name: {"values": [value.to_mdm() for value in values]} if isinstance(values, list) else values
+        for name, values in attributes.items()
+    }
+
+
+class Relationship:
+    """Ein Relationseintrag (Ziel, Eigenschaften und Beziehungsattribute)."""
+
+    __slots__ = ("to_id", "to_type", "id", "properties", "attributes", "extra")
+
+    def __init__(self, to_id, to_type, id=DEFAULT_VALUE_ID, properties=_MISSING, attributes=_MISSING, extra=None):
+        self.to_id = to_id
+        self.to_type = _intern(to_type)
+        self.id = _intern(id)
+        self.properties = properties
+        self.attributes = attributes
+        self.extra = extra
+
+    @classmethod
+    def from_mdm(cls, raw):
+        rel_to = raw.get("relTo", _MISSING)
+        extra = _extra(raw, _REL_KEYS)
+        if rel_to is _MISSING:
+            to_id = to_type = _MISSING
+        elif not isinstance(rel_to, dict) or not _REL_TO_KEYS.issuperset(rel_to):
+            # Ungewöhnliches Ziel: unverändert mitführen
+            extra = {**(extra or {}), "relTo": rel_to}
+            to_id = to_type = _MISSING
+        else:
+            to_id, to_type = rel_to.get("id", _MISSING), rel_to.get("type", _MISSING)
+        attributes = raw.get("attributes", _MISSING)
+        if isinstance(attributes, dict):
+            attributes = _attributes_from_mdm(attributes)
+        return cls(to_id, to_type, raw.get("id", _MISSING), raw.get("properties", _MISSING), attributes, extra)
+
+    def to_mdm(self):
+        raw = {}
+        if self.id is not _MISSING:
+            raw["id"] = self.id
+        if self.to_id is not _MISSING or self.to_type is not _MISSING:
+            raw["relTo"] = {key: value for key, value in (("id", self.to_id), ("type", self.to_type))
+                            if value is not _MISSING}
+        if self.properties is not _MISSING:
+            raw["properties"] = self.properties
+        if self.attributes is not _MISSING:
+            raw["attributes"] = _attributes_to_mdm(self.attributes) if isinstance(self.attributes, dict) else self.attributes
+        if self.extra:
+            raw.update(self.extra)
+        return raw
+
+    def first_value(self, attribute, default=None):
+        """Erster Wert eines Beziehungsattributs (z. B. arelxregellieferant)."""
+        if not isinstance(self.attributes, dict):
+            return default
+        return _first(self.attributes.get(attribute), default)
+
+    def __repr__(self):
+        return f"Relationship({self.to_type!r}, {self.to_id!r})"
+
+
+def _first(values, default):
+    if isinstance(values, list) and values:
+        value = values[0].value
+        return default if value is _MISSING or value is None else value
+    return default
+
+
+class Entity:
+    """
+    Kompakte Darstellung einer MDM-Entität.
+
+    attributes: name → [AttributeValue]; relationships: name → [Relationship].
+    Entity.from_mdm(ent).to_mdm() == ent für jede Entität im MDM-Format.
+    """
+
+    __slots__ = ("id", "name", "type", "attributes", "relationships", "extra", "data_extra")
+    # data_extra: None = Entität ohne "data", () = "data" ohne weitere Schlüssel, sonst dict
+
+    def __init__(self, id, type, name=_MISSING, attributes=None, relationships=None, extra=None, data_extra=()):
+        self.id = id
+        self.type = _intern(type)
+        self.name = name
+        self.attributes = {} if attributes is None else attributes
+        self.relationships = {} if relationships is None else relationships
+        self.extra = extra
+        self.data_extra = data_extra
+
+    @classmethod
+    def from_mdm(cls, raw):
+        """Erzeugt eine Entity aus einem MDM-JSON-Objekt (z. B. aus response.entities)."""
+        extra = _extra(raw, _ENTITY_KEYS)
+        data = raw.get("data", _MISSING)
+        attributes = relationships = _MISSING
+        data_extra = None
+        if isinstance(data, dict):
+            if "attributes" in data:
+                attributes = _attributes_from_mdm(data["attributes"])
+            if "relationships" in data:
+                relationships = {
+                    _intern(name): [Relationship.from_mdm(rel) for rel in rels]
+                    for name, rels in data["relationships"].items()
+                }
+            data_extra = _extra(data, _DATA_KEYS) or ()
+        elif data is not _MISSING:
+            # data ohne erwartete Struktur: unverändert mitführen
+            extra = {**(extra or {}), "data": data}
+        return cls(raw.get("id", _MISSING), raw.get("type", _MISSING), raw.get("name", _MISSING),
+                   attributes, relationships, extra, data_extra)
+
+    def to_mdm(self):
+        """Erzeugt das MDM-JSON-Objekt (neue dicts, darf vom Aufrufer verändert werden)."""
+        raw = {}
+        for key in ("id", "name", "type"):
+            value = getattr(self, key)
+            if value is not _MISSING:
+                raw[key] = value
+        if self.data_extra is not None:
+            data = {}
+            if self.attributes is not _MISSING:
+                data["attributes"] = _attributes_to_mdm(self.attributes)
+            if self.relationships is not _MISSING:
+                data["relationships"] = {
+                    name: [rel.to_mdm() for rel in rels] for name, rels in self.relationships.items()
+                }
+            data.update(self.data_extra)
+            raw["data"] = data
+        if self.extra:
+            raw.update(self.extra)
+        return raw
+
+    def first_value(self, attribute, default=None):
+        """Erster Wert eines Attributs oder default."""
+        if self.attributes is _MISSING:
+            return default
+        return _first(self.attributes.get(attribute), default)
+
+    def set_value(self, attribute, value):
+        """Setzt ein Attribut auf genau einen Wert im Standardkontext."""
+        if self.attributes is _MISSING:
+            self.attributes = {}
+        self.attributes[_intern(attribute)] = [AttributeValue(value)]
+
+    def relations(self, rel_name):
+        """Relationseinträge eines Namens (leere Liste, wenn keine vorhanden)."""
+        if self.relationships is _MISSING:
+            return []
+        return self.relationships.get(rel_name, [])
+
+    def __repr__(self):
+        return f"Entity({self.type!r}, {self.id!r})"
+
+
+class CompactEntities:
+    """
+    Entitäten, die bis zum Upload im Speicher bleiben, als Entity (etwa 60 % weniger Speicher
+    als die MDM-dicts, siehe benchmarks/bench_entity_model.py).
+
+    Wie JsonLinesSpool wiederholt lesbar: jede Iteration liefert frisch erzeugte MDM-dicts
+    (Entity.to_mdm), z. B. für Längenbestimmung, Upload und lokale Kopie. Die gelieferten dicts
+    sind nur zum Lesen gedacht – nicht standardisierte Teile (properties, Gruppen) teilen sie
+    mit dem gespeicherten Modell.
+    """
+
+    __slots__ = ("_entities",)
+
+    def __init__(self, entities=()):
+        self._entities = [Entity.from_mdm(ent) for ent in entities]
+
+    def append(self, ent):
+        """Nimmt eine Entität im MDM-Format auf (das dict selbst wird nicht behalten)."""
+        self._entities.append(Entity.from_mdm(ent))
+
+    def extend(self, entities):
+        for ent in entities:
+            self.append(ent)
+
+    def __len__(self):
+        return len(self._entities)
+
+    def __iter__(self):
+        for ent in self._entities:
+            yield ent.to_mdm()
+
+
+# --- Zugriffsfunktionen auf Entitäten im MDM-JSON-Format (ohne Umwandlung) ---
+
+def attribute_value(value, locale=DEFAULT_LOCALE, source=DEFAULT_SOURCE):
+    """Attribut im MDM-Format mit genau einem Wert: {"values": [{"id", "value", "locale", "source"}]}."""
+    return {"values": [{"id": DEFAULT_VALUE_ID, "value": value, "locale": locale, "source": source}]}
+
+
+def first_value(ent, attribute, default=None):
+    """
+    Erster Wert eines Attributs einer Entität (bzw. eines Relationseintrags) im MDM-Format.
+
+    Ersetzt Ketten wie ent.get("data", {}).get("attributes", {}).get(name, {}).get("values", [{}])[0].get("value").
+
+    Args:
+        ent (dict): Entität ({"data": {"attributes": ...}}) oder Relationseintrag ({"attributes": ...})
+        attribute (str): Attributname
+        default: Rückgabe, wenn das Attribut fehlt oder keinen Wert hat
+
+    Returns:
+        Der Wert oder default
+    """
+    attributes = ent["data"].get("attributes") if "data" in ent else ent.get("attributes")
+    values = (attributes or {}).get(attribute, {}).get("values")
+    if not values:
+        return default
+    value = values[0].get("value")
+    return default if value is None else value
+
+
+def relations(ent, rel_name):
+    """Relationseinträge eines Namens einer Entität im MDM-Format (leere Liste, wenn keine vorhanden)."""
+    return ent.get("data", {}).get("relationships", {}).get(rel_name, [])
+
+
+def response_entities(data):
+    """Entitäten aus einer MDM-Antwort ({"response": {"entities": [...]}})."""
+    return data.get("response", {}).get("entities", [])
+
+
+def first_entity(data):
+    """Erste Entität einer MDM-Antwort oder ein leeres dict."""
+    entities = response_entities(data)
+    return entities[0] if entities else {}
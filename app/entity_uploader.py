@@ -1,35 +1,264 @@
 # Importiere notwendige Module
-import requests  # Für HTTP-Anfragen
-import uuid      # Für das Erzeugen einer eindeutigen ID für den Dateinamen
-import os        # Für Dateipfade
+import os         # Für den Zwischenspeicher des Upload-Bodys
+import threading  # Für das parallele Schreiben der lokalen Kopie
+import time       # Für die Messung der Serialisierungszeit
+import uuid       # Für das Erzeugen einer eindeutigen ID für den Dateinamen
+from app.blob_upload import UPLOAD_DIR, upload_entities_in_blocks
+from app.shard_upload import is_sharding_enabled, upload_sharded
+from utils.http_client import request
+from utils.metrics import record, span
+from utils.serialization import dumps, gzip_chunks, open_output, with_gzip_suffix
 
-def upload_entities(entities, env_config, sync_config):
+# Grösse der Blöcke, die an den PUT-Request übergeben werden
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(entities, chunk_size=UPLOAD_CHUNK_SIZE, measure=True):
+    """
+    Serialisiert Entitäten Stück für Stück als kompaktes JSON-Array.
+
+    Es wird immer nur eine Entität serialisiert und in Blöcken von etwa chunk_size Bytes
+    ausgegeben, der Speicherbedarf bleibt damit unabhängig von der Gesamtgrösse.
+    Die reine Serialisierungszeit (ohne die Zeit beim Empfänger der Blöcke) wird am Ende
+    als Schritt "serialize" erfasst.
+
+    Parameter:
+        entities (iterable): Zu serialisierende Entitäten
+        chunk_size (int): Zielgrösse der ausgegebenen Blöcke in Bytes
+        measure (bool): Als Schritt "serialize" erfassen (False für zusätzliche Durchläufe wie
+            Längenbestimmung oder lokale Kopie, damit jede Datei nur einmal zählt)
+
+    Rückgabe:
+        generator: bytes-Blöcke des JSON-Arrays
+    """
+    buffer = bytearray(b"[")
+    first = True
+    count = 0
+    size = 0
+    seconds = 0.0
+    started = time.perf_counter()
+    for entity in entities:
+        if not first:
+            buffer += b","
+        first = False
+        buffer += dumps(entity)
+        count += 1
+        if len(buffer) >= chunk_size:
+            seconds += time.perf_counter() - started
+            size += len(buffer)
+            yield bytes(buffer)
+            buffer.clear()
+            started = time.perf_counter()
+    buffer += b"]"
+    size += len(buffer)
+    if measure:
+        record("serialize", seconds + time.perf_counter() - started, bytes=size, entities=count)
+    yield bytes(buffer)
+
+
+def write_json_array(entities, path, prefix=b"", suffix=b"", compress=False, measure=True):
+    """
+    Schreibt Entitäten gestreamt als kompaktes JSON-Array in eine Datei (optional eingebettet
+    zwischen prefix und suffix), ohne die Liste im Speicher aufzubauen.
+    Mit compress wird gzip-komprimiert nach <path>.gz geschrieben.
+
+    Rückgabe:
+        str: Tatsächlich geschriebener Pfad
+    """
+    path = with_gzip_suffix(path, compress)
+    with open_output(path) as f:
+        f.write(prefix)
+        for chunk in iter_json_array(entities, measure=measure):
+            f.write(chunk)
+        f.write(suffix)
+    return path
+
+
+class _StreamBody:
+    """
+    Iterierbarer Request-Body für den PUT-Upload. Meldet nach jedem Block die bisher
+    gesendeten Bytes an den Fortschritts-Callback. Ist length 0, sendet requests den Body
+    mit Transfer-Encoding: chunked, sonst mit Content-Length.
+    """
+
+    def __init__(self, entities, length=0, progress=None, compress=False):
+        self._entities = entities
+        self._length = length
+        self._progress = progress
+        self._compress = compress
+        self.sent = 0
+
+    def __len__(self):
+        return self._length
+
+    def __bool__(self):
+        # requests ersetzt "leere" Bodies (data or {}) – der Stream ist nie leer
+        return True
+
+    def _chunks(self):
+        return _body_chunks(self._entities, self._compress)
+
+    def __iter__(self):
+        sent = self.sent = 0
+        for chunk in self._chunks():
+            sent += len(chunk)
+            self.sent = sent
+            if self._progress is not None:
+                self._progress("upload_progress", bytes_sent=sent, bytes_total=self._length or None)
+            yield chunk
+
+
+class _FileBody(_StreamBody):
+    """Bereits serialisierter Body aus einer Datei: Content-Length ist die Dateigrösse."""
+
+    def __init__(self, path, progress=None):
+        super().__init__(None, os.path.getsize(path), progress)
+        self._path = path
+
+    def _chunks(self):
+        # Jeder Durchlauf (auch bei Wiederholung des PUT) liest die Datei neu
+        with open(self._path, "rb") as f:
+            while True:
+                chunk = f.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+
+def _write_body(entities, path, compress):
+    # Body einmal serialisieren (ggf. gzip) und auf Disk ablegen
+    with open(path, "wb") as f:
+        for chunk in _body_chunks(entities, compress):
+            f.write(chunk)
+
+
+def _body_chunks(entities, compress, measure=True):
+    # JSON-Array der Entitäten, bei compress fortlaufend gzip-komprimiert
+    chunks = iter_json_array(entities, measure=measure)
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def _write_local_copy(entities, path, compress, errors):
+    # Läuft im Thread "local-copy": Fehler für den Upload-Thread festhalten statt sie zu verlieren
+    try:
+        write_json_array(entities, path, compress=compress, measure=False)
+    except Exception as e:
+        errors.append(e)
+
+
+def _counted(chunks, measured):
+    # Zählt die Bytes eines Block-Stroms für die Upload-Messung
+    for chunk in chunks:
+        measured["bytes"] += len(chunk)
+        yield chunk
+
+
+def upload_entities(entities, env_config, sync_config, local_copy_path=None, progress=None):
     """
     Lädt die geklonten Entitäten als Datei per HTTP PUT in das Zielsystem hoch (Blob Import).
 
+    Die Entitäten werden direkt aus dem Speicher als kompaktes JSON in den Request gestreamt
+    (ohne Umweg über data/get_entities.json). Für die von Azure Put Blob verlangte
+    Content-Length wird der Body einmal serialisiert und auf Disk abgelegt – in die lokale
+    Kopie, wenn sie im selben Format geschrieben wird, sonst nach data/uploads/ (danach
+    gelöscht) – und von dort gestreamt; nur mit env_config["upload_chunked"] wird ohne
+    Zwischenspeicher mit Transfer-Encoding: chunked gesendet.
+    Mit env_config["upload_mode"] == "blocks" wird stattdessen parallel in Blöcken
+    hochgeladen (siehe app/blob_upload.py), was bei grossen Dateien wiederaufnehmbar ist.
+    Mit env_config["upload_gzip"] wird der Body gzip-komprimiert als <name>.json.gz mit
+    x-ms-blob-content-encoding: gzip abgelegt (nur sinnvoll, wenn der Import dies unterstützt);
+    env_config["local_copy_gzip"] schreibt die lokale Kopie als .json.gz.
+    Sind env_config["upload_shard_entities"] bzw. ["upload_shard_bytes"] gesetzt, wird der Import
+    in mehrere Dateien in Abhängigkeitsreihenfolge aufgeteilt (siehe app/shard_upload.py).
+
     Parameter:
-        entities (list): Die zu sendenden Entitäten (werden nicht direkt verwendet, da sie bereits gespeichert sind)
+        entities (list|iterable): Die zu sendenden Entitäten (Liste oder wiederholt lesbarer Spool)
         env_config (dict): Ziel-Umgebungskonfiguration mit Upload-URL und Headern
-        sync_config (dict): Synchronisationskonfiguration (z. B. clone_config für Dateibenennung)
+        sync_config (dict): Synchronisationskonfiguration (z. B. clone_config für Dateibenennung)
+        local_copy_path (str, optional): Lokale Kopie (parallel zum Upload bzw. als Upload-Body)
+        progress (callable, optional): Callback progress(event, **details), meldet "upload_progress" (Bytes)
     """
 
     # Erzeuge einen eindeutigen Dateinamen basierend auf der Konfiguration + zufälliger UUID
-    filename = f"{sync_config['clone_config']}-{uuid.uuid4()}.json"
+    compress = env_config.get("upload_gzip", False)
+    filename = with_gzip_suffix(f"{sync_config['clone_config']}-{uuid.uuid4()}.json", compress)
 
-    # Speicherort der hochzuladenden Datei
-    path = os.path.join("data", "get_entities.json")
+    mode = "shards" if is_sharding_enabled(env_config) else env_config.get("upload_mode") or "single"
+    # Einzel-Upload mit Content-Length: Body einmal in eine Datei serialisieren
+    body_path = None
+    body_spooled = False
+    if mode == "single" and not env_config.get("upload_chunked", False):
+        if local_copy_path and env_config.get("local_copy_gzip", False) == compress:
+            # Die lokale Kopie hat genau das Format des Bodys: sie dient direkt als Upload-Quelle
+            body_path = with_gzip_suffix(local_copy_path, compress)
+            local_copy_path = None
+        else:
+            os.makedirs(UPLOAD_DIR, exist_ok=True)
+            body_path = os.path.join(UPLOAD_DIR, f"{filename}.body")
+            body_spooled = True
 
-    # Öffne Datei im Binärmodus (für PUT-Upload)
-    with open(path, "rb") as f:
-        # Ersetze Platzhalter "Filename" in der URL mit dem tatsächlichen Namen
-        url = env_config["url"].replace("Filename", filename)
+    # Lokale Kopie (optional, kompakt) in einem eigenen Thread schreiben, während der Upload läuft
+    copy_thread = None
+    copy_errors = []
+    if local_copy_path:
+        copy_thread = threading.Thread(
+            target=_write_local_copy,
+            args=(entities, local_copy_path, env_config.get("local_copy_gzip", False), copy_errors),
+            name="local-copy"
+        )
+        copy_thread.start()
 
+    # Ersetze Platzhalter "Filename" in der URL mit dem tatsächlichen Namen
+    url = env_config["url"].replace("Filename", filename)
+
+    if mode != "shards":
         print(f"[INFO] Upload-URL: {url}")  # Info für Nachvollziehbarkeit
+    content_encoding = "gzip" if compress else None
+    try:
+        with span("upload", mode=mode, encoding=content_encoding) as measured:
+            measured["entities"] = len(entities)
+            if mode == "shards":
+                # Mehrere Importdateien (Teile) in Abhängigkeitsreihenfolge plus Teile-Verzeichnis
+                base_name = filename[:-len(".json.gz")] if compress else filename[:-len(".json")]
+                manifest = upload_sharded(entities, env_config["url"], base_name, env_config, progress, content_encoding)
+                measured["bytes"] = manifest["total_bytes"]
+            elif mode == "blocks":
+                # Block-Blob: paralleler, wiederaufnehmbarer Upload
+                chunks = _counted(_body_chunks(entities, compress), measured)
+                upload_entities_in_blocks(chunks, url, filename, env_config, progress, content_encoding=content_encoding)
+            else:
+                if body_path is not None:
+                    _write_body(entities, body_path, compress)
+                    body = _FileBody(body_path, progress)
+                else:
+                    body = _StreamBody(entities, 0, progress, compress)
+
+                headers = env_config["headers"]
+                if content_encoding:
+                    headers = {**headers, "x-ms-blob-content-encoding": content_encoding}
 
-        # Sende PUT-Request mit Dateiinhalt
-        response = requests.put(url, headers=env_config["headers"], data=f)
+                # Sende PUT-Request mit gestreamtem Inhalt (Put Blob ist idempotent und darf wiederholt werden)
+                response = request(
+                    "PUT",
+                    url,
+                    endpoint="blob",
+                    headers=headers,
+                    data=body
+                )
 
-        # Wenn Upload fehlschlägt, wird hier eine Exception geworfen
-        response.raise_for_status()
+                # Wenn Upload fehlschlägt, wird hier eine Exception geworfen
+                response.raise_for_status()
+                measured["bytes"] = body.sent
+    finally:
+        if body_spooled:
+            try:
+                os.remove(body_path)
+            except FileNotFoundError:
+                pass
+        if copy_thread is not None:
+            copy_thread.join()
+            if copy_errors:
+                # Die lokale Kopie ist optional: Upload nicht deswegen als fehlgeschlagen melden
+                print(f"[WARNUNG] Lokale Kopie {local_copy_path} konnte nicht geschrieben werden: {copy_errors[0]}")
 
-        print("[SUCCESS] Upload erfolgreich abgeschlossen.")
+    print("[SUCCESS] Upload erfolgreich abgeschlossen.")
@@ -0,0 +1,260 @@
+# app/export_cache.py – Lokaler Read-Through-Cache für exportierte Quell-Entitäten (TTL, LRU-Grössenlimit)
+#
+# Ein Eintrag entspricht dem Ergebnis einer MDM-Abfrage aus entity_configs: alle Entitäten eines
+# Typs zu einem Identifier mit genau den angefragten Feldern. Schlüssel ist ein Hash aus
+# MDM-Endpunkt, Typ, Identifier sowie Attribut-, Relations- und Beziehungsattributliste – eine
+# geänderte Clone-Konfiguration trifft also nie auf einen alten Eintrag.
+#
+# Der Cache ist nur mit EXPORT_CACHE=true aktiv und prüft vor jeder Wiederverwendung das
+# Änderungsdatum in MDM (EXPORT_CACHE_CHECK_MODIFIED=false spart diese Abfrage). Nach einem
+# Upload, der die exportierten Entitäten selbst verändert (z. B. Lieferantenwechsel), werden
+# die Einträge des Artikels gelöscht (evict_cached_exports).
+#
+# Jeder Eintrag ist eine eigene gzip-Datei <hash>.json.gz. Die Änderungszeit der Datei dient als
+# "zuletzt verwendet" (wird bei jedem Treffer aktualisiert); überschreitet der Ordner das
+# Grössenlimit, werden die am längsten nicht verwendeten Einträge gelöscht.
+import hashlib
+import json
+import os
+import threading
+import time
+from utils.serialization import load, save
+
+# Speicherort der Einträge (geteilt von CLI-Läufen und UI-Workern)
+DEFAULT_CACHE_DIR = os.path.join("data", "export_cache")
+# Maximales Alter eines Eintrags in Sekunden (0 = Cache aus)
+DEFAULT_TTL = 3600
+# Grössenlimit des Ordners in Bytes (komprimiert)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+ENTRY_SUFFIX = ".json.gz"
+
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "expired": 0, "stale": 0, "stored": 0, "evicted": 0}
+_settings = {
+    "enabled": os.getenv("EXPORT_CACHE", "false").lower() in ("1", "true", "yes"),
+    "ttl": float(os.getenv("EXPORT_CACHE_TTL", str(DEFAULT_TTL))),
+    "max_bytes": int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+    "check_modified": os.getenv("EXPORT_CACHE_CHECK_MODIFIED", "true").lower() in ("1", "true", "yes")
+}
+
+
+def configure_export_cache(enabled=None, ttl=None, max_bytes=None, check_modified=None):
+    """
+    Konfiguriert den Cache (überschreibt EXPORT_CACHE, EXPORT_CACHE_TTL, EXPORT_CACHE_MAX_BYTES
+    und EXPORT_CACHE_CHECK_MODIFIED), z. B. enabled=False für --no-cache.
+
+    Args:
+        enabled (bool, optional): Cache verwenden.
+        ttl (float, optional): Maximales Alter eines Eintrags in Sekunden.
+        max_bytes (int, optional): Grössenlimit des Cache-Ordners.
+        check_modified (bool, optional): Vor der Wiederverwendung das Änderungsdatum in MDM prüfen.
+    """
+    with _cache_lock:
+        if enabled is not None:
+            _settings["enabled"] = bool(enabled)
+        if ttl is not None:
+            _settings["ttl"] = float(ttl)
+        if max_bytes is not None:
+            _settings["max_bytes"] = max(0, int(max_bytes))
+        if check_modified is not None:
+            _settings["check_modified"] = bool(check_modified)
+
+
+def is_export_cache_enabled():
+    """True, wenn der Cache eingeschaltet ist und eine TTL > 0 hat."""
+    return _settings["enabled"] and _settings["ttl"] > 0
+
+
+def is_modified_check_enabled():
+    """True, wenn vor jedem Treffer das Änderungsdatum der Entitäten in MDM geprüft wird."""
+    return _settings["check_modified"]
+
+
+def _cache_dir():
+    return os.getenv("EXPORT_CACHE_DIR", DEFAULT_CACHE_DIR)
+
+
+def cache_key(cfg, identifier, url):
+    """
+    Schlüssel eines Eintrags: Hash aus Endpunkt, Typ, Identifier und angefragten Feldern.
+
+    Args:
+        cfg (dict): Eintrag aus entity_configs (typ, attributes, relationships, relationship_attributes)
+        identifier (str): Artikelnummer oder generischer Identifier
+        url (str): MDM-Endpunkt (trennt Einträge verschiedener Umgebungen)
+
+    Returns:
+        str: Hex-Hash
+    """
+    fields = [cfg.get("attributes"), cfg.get("relationships"), cfg.get("relationship_attributes")]
+    raw = json.dumps([url, cfg["typ"], str(identifier), fields], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def modified_fingerprint(entities):
+    """
+    Kennzeichen für die Frischeprüfung: sortierte Paare (ID, properties.modifiedDate).
+
+    Erkennt geänderte, neue und gelöschte Entitäten; fehlt das Änderungsdatum in der
+    Antwort, wird nur die Menge der IDs verglichen.
+    """
+    return sorted(
+        [str(ent.get("id")), (ent.get("properties") or {}).get("modifiedDate")]
+        for ent in entities
+    )
+
+
+def _entry_path(key):
+    return os.path.join(_cache_dir(), key + ENTRY_SUFFIX)
+
+
+def _count(stat):
+    with _cache_lock:
+        _stats[stat] += 1
+
+
+def get_cached_export(cfg, identifier, url, verify=None):
+    """
+    Liest die Entitäten einer Abfrage aus dem Cache.
+
+    Args:
+        cfg (dict): Eintrag aus entity_configs
+        identifier (str): Artikelnummer oder generischer Identifier
+        url (str): MDM-Endpunkt
+        verify (callable, optional): Liefert das aktuelle modified_fingerprint() aus MDM;
+            weicht es vom gespeicherten ab, gilt der Eintrag als veraltet.
+
+    Returns:
+        list|None: Entitäten (frisch gelesen, dürfen verändert werden) oder None bei Fehlschlag
+    """
+    if not is_export_cache_enabled():
+        return None
+    path = _entry_path(cache_key(cfg, identifier, url))
+    try:
+        entry = load(path)
+    except (OSError, ValueError, EOFError):
+        # Fehlender oder beschädigter Eintrag gilt als Fehlschlag
+        _count("misses")
+        return None
+
+    if time.time() - entry.get("stored_at", 0) > _settings["ttl"]:
+        _count("expired")
+        _count("misses")
+        return None
+    if verify is not None and verify() != entry.get("fingerprint"):
+        _count("stale")
+        _count("misses")
+        return None
+
+    try:
+        os.utime(path)  # zuletzt verwendet (LRU)
+    except OSError:
+        pass
+    _count("hits")
+    return entry["entities"]
+
+
+def put_cached_export(cfg, identifier, url, entities):
+    """
+    Speichert die Entitäten einer Abfrage und hält danach das Grössenlimit ein.
+
+    Args:
+        cfg (dict): Eintrag aus entity_configs
+        identifier (str): Artikelnummer oder generischer Identifier
+        url (str): MDM-Endpunkt
+        entities (list): Exportierte Entitäten dieses Typs
+    """
+    if not is_export_cache_enabled():
+        return
+    path = _entry_path(cache_key(cfg, identifier, url))
+    entry = {
+        "typ": cfg["typ"],
+        "identifier": str(identifier),
+        "stored_at": time.time(),
+        "fingerprint": modified_fingerprint(entities),
+        "entities": entities
+    }
+    try:
+        # Atomar schreiben, damit parallel lesende Prozesse nie eine halbe Datei sehen
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = save(entry, f"{path}.{os.getpid()}.{threading.get_ident()}.tmp", compress=True)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[WARNUNG] Export-Cache: Eintrag für {cfg['typ']} {identifier} nicht gespeichert: {e}")
+        return
+    _count("stored")
+    _evict()
+
+
+def evict_cached_exports(identifier, entity_configs, url):
+    """
+    Löscht die Einträge eines Artikels für alle Typen einer Konfiguration, z. B. nachdem
+    ein Upload seine Entitäten in MDM verändert hat.
+
+    Args:
+        identifier (str): Artikelnummer oder generischer Identifier
+        entity_configs (list): Einträge aus entity_configs
+        url (str): MDM-Endpunkt
+    """
+    for cfg in entity_configs:
+        try:
+            os.remove(_entry_path(cache_key(cfg, identifier, url)))
+        except FileNotFoundError:
+            continue
+        _count("evicted")
+
+
+def _evict():
+    # Am längsten nicht verwendete Einträge löschen, bis das Grössenlimit eingehalten ist
+    directory = _cache_dir()
+    entries = []
+    with os.scandir(directory) as it:
+        for item in it:
+            if item.name.endswith(ENTRY_SUFFIX):
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= _settings["max_bytes"]:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        _count("evicted")
+
+
+def clear_export_cache():
+    """Löscht alle Einträge des Caches."""
+    directory = _cache_dir()
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith(ENTRY_SUFFIX):
+            os.remove(os.path.join(directory, name))
+
+
+def get_export_cache_stats():
+    """
+    Zähler des Caches seit Prozessstart.
+
+    Returns:
+        dict: hits, misses (davon expired = TTL abgelaufen, stale = in MDM geändert), stored,
+            evicted und hit_rate (Anteil Treffer an allen Abfragen, 0–1)
+    """
+    with _cache_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+    return stats
+
+
+def reset_export_cache_stats():
+    """Setzt die Zähler zurück (z. B. zwischen Benchmark-Szenarien)."""
+    with _cache_lock:
+        for key in _stats:
+            _stats[key] = 0
@@ -0,0 +1,192 @@
+# app/graph_fetcher.py – Export entlang der Relationen (Ebene für Ebene, gebündelte ID-Abfragen)
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from app.entity_exporter import fetch_entity_type, DEFAULT_MAX_PARALLEL_FETCHES
+from utils.helpers import render_template
+from utils.http_client import request
+from utils.json_stream import iter_response_entities
+from utils.metrics import span
+from utils.serialization import dumps, loads
+
+# Template für Abfragen nach IDs (statt nach axartikelnrsap)
+IDS_TEMPLATE_PATH = "payloads/template_ids.json"
+# Höchstzahl IDs pro Abfrage (grössere Mengen werden auf mehrere Abfragen verteilt)
+MAX_IDS_PER_QUERY = 100
+
+
+class NeighbourCache:
+    """
+    Prozessweit teilbarer Cache für per ID geladene Entitäten, z. B. für einen Batch-Lauf:
+    Gemeinsame Nachbarn (Lieferantenartikel, Trade Items, Konditionen) werden nur einmal abgefragt.
+
+    Einträge werden als JSON abgelegt und bei jedem Treffer neu erzeugt, da die Klon-Schritte
+    die geladenen Entitäten verändern.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, typ, entity_id):
+        with self._lock:
+            raw = self._entries.get((typ, entity_id))
+            if raw is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return loads(raw)
+
+    def put(self, typ, entity):
+        raw = dumps(entity)
+        with self._lock:
+            self._entries[(typ, entity["id"])] = raw
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
+
+
+def _fetch_by_ids(cfg, ids, env_config, ids_template_path, cancel_event=None):
+    """Lädt Entitäten eines Typs anhand ihrer IDs (eine Abfrage)."""
+    if cancel_event is not None and cancel_event.is_set():
+        return None
+
+    payload = render_template(ids_template_path, {
+        "REPLACE_ENTITY": cfg["typ"],
+        "REPLACE_IDS": ids,
+        "REPLACE_ATTRIBUTES": cfg["attributes"],
+        "REPLACE_RELATIONSHIPS": cfg["relationships"],
+        "REPLACE_RELATIONSHIPATTR": cfg["relationship_attributes"]
+    })
+    with span("mdm_fetch_ids", type=cfg["typ"]) as measured:
+        response = request("POST", env_config["url_get"], endpoint="mdm", json=payload, headers=env_config["headers_get"], stream=True)
+        with response:
+            response.raise_for_status()
+            entities = list(iter_response_entities(response))
+            measured["bytes"] = response.raw.tell()
+        measured["entities"] = len(entities)
+    return entities
+
+
+def _run_parallel(executor, calls):
+    """Führt calls [(func, args), ...] aus; beim ersten Fehler werden wartende Abfragen verworfen."""
+    cancel_event = threading.Event()
+    futures = [executor.submit(func, *args, cancel_event) for func, args in calls]
+    done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+    failed = [f for f in futures if f in done and f.exception() is not None]
+    if failed:
+        cancel_event.set()
+        for future in pending:
+            future.cancel()
+        raise failed[0].exception()
+    return [future.result() for future in futures]
+
+
+def fetch_entity_graph(identifier, entity_configs, env_config, template_path, max_workers=None, progress=None,
+                       neighbour_cache=None, ids_template_path=IDS_TEMPLATE_PATH, use_cache=True):
+    """
+    Lädt Entitäten entlang der Relationen statt über den axartikelnrsap-Filter je Typ.
+
+    Ablauf:
+    1. Die Wurzel (erster konfigurierter Typ, z. B. exartikel) wird über den Identifier geladen.
+    2. Ebene für Ebene werden die relTo-IDs der konfigurierten Relationen gesammelt (ohne
+       Duplikate) und je Typ in einer gebündelten ID-Abfrage geladen
+       (z. B. relxartikelzulieferantenartikel → relxtradeitemzuliefartikel → ...).
+    3. Konfigurierte Typen, auf die keine Relation verweist, werden wie bisher über den
+       Identifier-Filter geladen (Fallback).
+
+    Parameter:
+        identifier (str): Artikelnummer oder generischer Identifier
+        entity_configs (list): Liste von Dicts mit Entity-Typen und Attributkonfigurationen
+        env_config (dict): Umgebungskonfiguration (API-Endpunkte, Header)
+        template_path (str): Pfad zur JSON-Payload-Vorlage (Wurzel und Fallback)
+        max_workers (int, optional): Maximale Anzahl paralleler Abfragen
+        progress (callable, optional): Callback progress(event, **details), meldet "type_fetched" je Typ
+        neighbour_cache (NeighbourCache, optional): Geteilter Cache für per ID geladene Entitäten
+        ids_template_path (str): Pfad zur Payload-Vorlage für ID-Abfragen
+        use_cache (bool): Export-Cache für Wurzel und Fallback-Typen verwenden
+
+    Rückgabe:
+        list: Alle abgerufenen Entitäten, gruppiert in der Reihenfolge der Konfiguration
+    """
+    configs = {cfg["typ"]: cfg for cfg in entity_configs}
+    root_cfg = entity_configs[0]
+    if max_workers is None:
+        max_workers = DEFAULT_MAX_PARALLEL_FETCHES
+    max_workers = max(1, int(max_workers))
+
+    found = {typ: {} for typ in configs}  # typ → {id: Entität} (Reihenfolge des Ladens)
+    referenced = set()                    # Typen, auf die mindestens eine Relation verweist
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mdm-graph") as executor:
+        # 1. Wurzel über den Identifier laden
+        frontier = fetch_entity_type(root_cfg, identifier, env_config, template_path, use_cache=use_cache) or []
+        for ent in frontier:
+            found[root_cfg["typ"]][ent["id"]] = ent
+
+        # 2. Relationen Ebene für Ebene folgen
+        while frontier:
+            wanted = {}
+            for ent in frontier:
+                relationships = ent.get("data", {}).get("relationships", {})
+                for rel_name in configs[ent["type"]]["relationships"]:
+                    for rel in relationships.get(rel_name, []):
+                        rel_to = rel.get("relTo") or {}
+                        typ, entity_id = rel_to.get("type"), rel_to.get("id")
+                        # Zurück zur Wurzel wird nicht gefolgt: andere Artikel gehören nicht zum Klon
+                        if typ not in configs or typ == root_cfg["typ"] or not entity_id:
+                            continue
+                        referenced.add(typ)
+                        if entity_id not in found[typ]:
+                            wanted.setdefault(typ, {})[entity_id] = None
+
+            frontier = []
+            calls = []
+            for typ, ids in wanted.items():
+                missing = []
+                for entity_id in ids:
+                    cached = neighbour_cache.get(typ, entity_id) if neighbour_cache is not None else None
+                    if cached is not None:
+                        found[typ][entity_id] = cached
+                        frontier.append(cached)
+                    else:
+                        missing.append(entity_id)
+                for start in range(0, len(missing), MAX_IDS_PER_QUERY):
+                    chunk = missing[start:start + MAX_IDS_PER_QUERY]
+                    calls.append((_fetch_by_ids, (configs[typ], chunk, env_config, ids_template_path)))
+
+            for entities in _run_parallel(executor, calls):
+                for ent in entities:
+                    by_id = found.get(ent.get("type"))
+                    if by_id is None or ent["id"] in by_id:
+                        continue
+                    by_id[ent["id"]] = ent
+                    frontier.append(ent)
+                    if neighbour_cache is not None:
+                        neighbour_cache.put(ent["type"], ent)
+
+        # 3. Fallback für Typen, die über keine Relation erreichbar sind
+        unreachable = [cfg for cfg in entity_configs if cfg is not root_cfg and cfg["typ"] not in referenced]
+        # _run_parallel hängt cancel_event als nächstes Positionsargument an
+        fetch_fallback = functools.partial(fetch_entity_type, use_cache=use_cache)
+        calls = [(fetch_fallback, (cfg, identifier, env_config, template_path)) for cfg in unreachable]
+        for cfg, entities in zip(unreachable, _run_parallel(executor, calls)):
+            for ent in entities or []:
+                found[cfg["typ"]].setdefault(ent["id"], ent)
+
+    all_entities = []
+    for cfg in entity_configs:
+        entities = list(found[cfg["typ"]].values())
+        if progress is not None:
+            progress("type_fetched", typ=cfg["typ"], entity_count=len(entities))
+        if entities:
+            how = "Relationen" if cfg["typ"] in referenced else "Identifier"
+            print(f"[OK] {cfg['typ']}: {len(entities)} Eintrag(e) gefunden (über {how}).")
+            all_entities.extend(entities)
+        else:
+            print(f"[HINWEIS] {cfg['typ']}: Kein Eintrag gefunden.")
+
+    return all_entities
@@ -1,71 +1,284 @@
 # Module importieren
 import uuid  # Für das Generieren neuer UUIDs
-from collections import defaultdict  # Für verschachtelte Dictionaries mit Standardwerten
-from app.sap_id import get_new_sap_artikelnummer  # SAP-Artikelnummernservice
+from collections import Counter, deque  # Für die Zuordnung der Entitäten zu ihrem Artikel (Breitensuche)
+from app.sap_id import get_new_sap_artikelnummer, get_new_sap_artikelnummern, release_sap_artikelnummern  # SAP-Artikelnummernservice
+from utils.serialization import dumps, loads  # Schnelle tiefe Kopie der exportierten Entitäten
+from app.entity_model import CompactEntities, first_value  # Kompakte Ablage, Zugriff auf Attributwerte im MDM-Format
 
+# Entitätstyp, der eine eigene SAP-Artikelnummer erhält (Wurzel eines Klon-Graphen)
+ROOT_TYPE = "exartikel"
+# Attribut mit der SAP-Artikelnummer
+SAP_ID_ATTRIBUTE = "axartikelnrsap"
+# Attribute (auch Beziehungsattribute), deren Werte IDs anderer Entitäten enthalten
+ID_ATTRIBUTES = frozenset({"axidentifier"})
 
 
-def assign_new_ids_and_update_relations(entities, identifier):
-    """
-    Weist allen Entitäten neue IDs zu (bei exartikel = neue SAP-ID) und aktualisiert ihre Relationen.
-    
-    Parameter:
-        entities (list): Die exportierten Entitäten, die geklont werden sollen.
-        identifier (str): Ursprünglicher Identifier (z. B. Artikelnummer), wird für SAP verwendet.
-    
-    Rückgabe:
-        cloned (list): Liste der bearbeiteten Entitäten mit neuen IDs und ggf. angepassten Relationen.
-        id_map (dict): Mapping von alten zu neuen IDs je Entitätstyp.
-        new_sap_id (str|None): Die neu generierte SAP-ID, falls vorhanden.
-    """
+def _remap_values(attributes, new_ids):
+    """Schreibt die Werte ID-tragender Attribute (Verweise ohne Typangabe) auf die neuen IDs um."""
+    for name in ID_ATTRIBUTES.intersection(attributes):
+        for value in attributes[name].get("values", ()):
+            if isinstance(value.get("value"), str):
+                value["value"] = new_ids.get(value["value"], value["value"])
 
-    id_map = defaultdict(dict)  # Dict nach Typ gruppiert: exartikel → {alte_id: neue_id, ...}
-    cloned = []  # Liste der final bearbeiteten Entitäten
-    new_sap_id = None  # Wird nur bei exartikel vergeben
 
+def _owning_roots(entity_count, roots, neighbours):
+    """Ordnet jede Entität dem nächstgelegenen Artikel zu (Breitensuche von allen Wurzeln gleichzeitig)."""
+    owner = [None] * entity_count
+    queue = deque()
+    for pos in roots:
+        owner[pos] = pos
+        queue.append(pos)
+    while queue:
+        pos = queue.popleft()
+        for other in neighbours[pos]:
+            if owner[other] is None:
+                owner[other] = owner[pos]
+                queue.append(other)
+    return owner
 
-    for ent in entities:
-        typ = ent["type"]
-        old_id = ent["id"]
 
-        if typ == "exartikel":
-            # Bei Artikeln eine echte SAP-ID holen (inkl. MDM-Abfrage etc.)
-            new_id = get_new_sap_artikelnummer(identifier)
-            new_sap_id = new_id
-        else:
-            # Bei allen anderen Typen eine zufällige UUID verwenden
-            new_id = str(uuid.uuid4())
+def _sap_identifier(ent, default):
+    # Bisherige SAP-Artikelnummer der Wurzel (für die Nummernkreis-Ermittlung in SAP/MDM)
+    return first_value(ent, SAP_ID_ATTRIBUTE) or default
+
+
+def _release_allocated(allocated, release_sap_ids):
+    """Legt vergebene SAP-Nummern [(bisherige Nummer, neue Nummer), ...] je bisheriger Nummer zurück."""
+    by_identifier = {}
+    for sap_identifier, sap_id in allocated:
+        by_identifier.setdefault(sap_identifier, []).append(sap_id)
+    for sap_identifier, sap_ids in by_identifier.items():
+        release_sap_ids(sap_identifier, sap_ids)
+
+
+def release_id_plan(plan, release_sap_ids=None):
+    """
+    Legt die SAP-Nummern eines ID-Plans zurück, wenn der Klon scheitert, bevor er hochgeladen wird.
+
+    Parameter:
+        plan (dict): Ergebnis von build_id_plan()
+        release_sap_ids (callable, optional): release_sap_ids(identifier, sap_ids)
+            (Standard: release_sap_artikelnummern)
+    """
+    _release_allocated(plan["allocated"], release_sap_ids or release_sap_artikelnummern)
 
-        id_map[typ][old_id] = new_id  # Mapping speichern
 
-    for ent in entities:
-        typ = ent["type"]
-        old_id = ent["id"]
-        new_id = id_map[typ][old_id]
+def build_id_plan(entities, identifier, allocate_sap_id=None, release_sap_ids=None):
+    """
+    Liest einen Klon-Graphen einmal durch und legt alle neuen IDs fest (ID-Plan).
 
-        # Neue ID zuweisen & Name entfernen (z. B. aus Naming-Regeln ableiten)
-        ent["id"] = new_id
-        ent.pop("name", None)
+    Es werden nur Typ, ID und Relationsziele jeder Entität festgehalten, nicht die Entitäten
+    selbst – entities darf daher auch ein Generator sein (z. B. beim Streaming-Export).
+    Jeder Artikel (exartikel) erhält genau eine eigene SAP-Nummer; die übrigen Entitäten
+    erhalten die SAP-Nummer des Artikels, mit dem sie über Relationen verbunden sind.
 
-        if new_sap_id:
-            ent.setdefault("data", {}).setdefault("attributes", {})["axartikelnrsap"] = {
-                "values": [{
-                    "id": "1_0_0",
-                    "value": new_sap_id,
-                    "locale": "de-DE",
-                    "source": "internal"
-                }]
-            }
+    Parameter:
+        entities (iterable): Die exportierten Entitäten
+        identifier (str): Ursprünglicher Identifier (z. B. Artikelnummer), wird für SAP verwendet.
+        allocate_sap_id (callable, optional): Vergibt eine neue SAP-Nummer, allocate_sap_id(identifier) -> str
+            (Standard: get_new_sap_artikelnummer)
+        release_sap_ids (callable, optional): Legt bereits vergebene Nummern zurück, wenn die
+            Vergabe für einen weiteren Artikel fehlschlägt, release_sap_ids(identifier, sap_ids)
+            (Standard: release_sap_artikelnummern; mit eigenem allocate_sap_id: nichts zurücklegen)
 
+    Rückgabe:
+        dict: ID-Plan für apply_id_plan() mit "id_map" (typ → {alte_id: neue_id}), "new_ids"
+            (alte_id → neue_id für Verweise ohne Typangabe; IDs, die in mehreren Typen vorkommen,
+            fehlen darin), "new_sap_id" und "allocated" (vergebene Nummern für release_id_plan())
+    """
+    if allocate_sap_id is None:
+        allocate_sap_id = get_new_sap_artikelnummer
+        release_sap_ids = release_sap_ids or release_sap_artikelnummern
+    keys = []        # (typ, id) je Position
+    positions = {}   # (typ, id) → Position
+    edges = []       # (Position, (typ, id) des Relationsziels)
+    roots = []       # (Position, bisherige SAP-Nummer) der Artikel
 
+    for pos, ent in enumerate(entities):
+        key = (ent["type"], ent["id"])
+        keys.append(key)
+        positions[key] = pos
+        if ent["type"] == ROOT_TYPE:
+            roots.append((pos, _sap_identifier(ent, identifier)))
         for rels in ent.get("data", {}).get("relationships", {}).values():
             for rel in rels:
                 rel_to = rel.get("relTo")
                 if rel_to:
-                    t, i = rel_to["type"], rel_to["id"]
-                    if i in id_map[t]:
-                        rel_to["id"] = id_map[t][i]
+                    edges.append((pos, (rel_to.get("type"), rel_to.get("id"))))
+
+    # Relationen ungerichtet speichern, damit Kinder ihren Artikel finden
+    neighbours = [[] for _ in keys]
+    for pos, target in edges:
+        other = positions.get(target)
+        if other is not None:
+            neighbours[pos].append(other)
+            neighbours[other].append(pos)
+
+    # SAP-Nummern pro Wurzel vergeben (der gesuchte Artikel zuerst, damit er die Haupt-Nummer erhält)
+    roots.sort(key=lambda root: root[1] != identifier)
+    root_sap_ids = {}
+    allocated = []  # (bisherige Nummer, neue Nummer) in Vergabereihenfolge
+    try:
+        for pos, sap_identifier in roots:
+            root_sap_ids[pos] = allocate_sap_id(sap_identifier)
+            allocated.append((sap_identifier, root_sap_ids[pos]))
+    except BaseException:
+        if release_sap_ids is not None:
+            _release_allocated(allocated, release_sap_ids)
+        raise
+    new_sap_id = root_sap_ids[roots[0][0]] if roots else None
+
+    id_map = {}     # Dict nach Typ gruppiert: exartikel → {alte_id: neue_id, ...}
+    new_ids = {}    # Alte ID → neue ID (für Attributverweise ohne Typangabe)
+    id_types = {}   # Alte ID → Typ, unter dem sie zuerst vorkam
+    ambiguous = set()
+    for pos, (typ, old_id) in enumerate(keys):
+        # Artikel erhalten ihre SAP-ID, alle anderen Typen eine zufällige UUID
+        new_id = root_sap_ids[pos] if pos in root_sap_ids else str(uuid.uuid4())
+        id_map.setdefault(typ, {})[old_id] = new_id
+        if id_types.setdefault(old_id, typ) != typ:
+            ambiguous.add(old_id)
+        new_ids[old_id] = new_id
+
+    # Dieselbe ID in mehreren Typen: Verweise ohne Typangabe sind nicht eindeutig und bleiben unverändert
+    for old_id in ambiguous:
+        del new_ids[old_id]
+    if ambiguous:
+        print(f"[WARNUNG] {len(ambiguous)} ID(s) kommen in mehreren Typen vor und werden in Attributverweisen "
+              f"ohne Typangabe nicht ersetzt: {', '.join(sorted(map(str, ambiguous)))}")
+
+    owner = _owning_roots(len(keys), [pos for pos, _ in roots], neighbours)
+    sap_ids = {key: root_sap_ids[owner[pos]] for pos, key in enumerate(keys) if owner[pos] is not None}
+
+    return {"id_map": id_map, "new_ids": new_ids, "sap_ids": sap_ids, "new_sap_id": new_sap_id,
+            "allocated": allocated}
+
+
+def apply_id_plan(ent, plan):
+    """
+    Schreibt eine Entität gemäss ID-Plan um (in einem Durchlauf über ihre Verweise):
+    neue ID, Relationen (relTo), ID-tragende Attribute und Beziehungsattribute sowie die
+    SAP-Nummer des zugehörigen Artikels.
+
+    Parameter:
+        ent (dict): Entität (wird verändert)
+        plan (dict): Ergebnis von build_id_plan()
+
+    Rückgabe:
+        dict: Die umgeschriebene Entität
+    """
+    id_map = plan["id_map"]
+    new_ids = plan["new_ids"]
+    key = (ent["type"], ent["id"])
+    data = ent.setdefault("data", {})
+    attributes = data.setdefault("attributes", {})
+
+    _remap_values(attributes, new_ids)
+    for rels in data.get("relationships", {}).values():
+        for rel in rels:
+            rel_to = rel.get("relTo")
+            if rel_to:
+                new_id = id_map.get(rel_to.get("type"), {}).get(rel_to.get("id"))
+                if new_id is not None:
+                    rel_to["id"] = new_id
+            _remap_values(rel.get("attributes", {}), new_ids)
+
+    # Neue ID zuweisen & Name entfernen (z. B. aus Naming-Regeln ableiten)
+    ent["id"] = id_map[key[0]][key[1]]
+    ent.pop("name", None)
+
+    sap_id = plan["sap_ids"].get(key, plan["new_sap_id"])
+    if sap_id:
+        attributes[SAP_ID_ATTRIBUTE] = {
+            "values": [{
+                "id": "1_0_0",
+                "value": sap_id,
+                "locale": "de-DE",
+                "source": "internal"
+            }]
+        }
+    return ent
+
+
+def assign_new_ids_and_update_relations(entities, identifier, allocate_sap_id=None):
+    """
+    Weist allen Entitäten neue IDs zu (bei exartikel = neue SAP-ID) und aktualisiert ihre Relationen.
+
+    Zuerst werden alle neuen IDs festgelegt (build_id_plan), danach wird jede Entität in einem
+    linearen Durchlauf umgeschrieben (apply_id_plan): Relationen, ID-tragende Attribute und
+    Beziehungsattribute. Scheitert das Umschreiben, werden die vergebenen SAP-Nummern zurückgelegt.
+
+    Parameter:
+        entities (list): Die exportierten Entitäten, die geklont werden sollen.
+        identifier (str): Ursprünglicher Identifier (z. B. Artikelnummer), wird für SAP verwendet.
+        allocate_sap_id (callable, optional): Vergibt eine neue SAP-Nummer, allocate_sap_id(identifier) -> str
+            (Standard: get_new_sap_artikelnummer)
+
+    Rückgabe:
+        cloned (list): Liste der bearbeiteten Entitäten mit neuen IDs und ggf. angepassten Relationen.
+        id_map (dict): Mapping von alten zu neuen IDs je Entitätstyp.
+        new_sap_id (str|None): Die neu generierte SAP-ID des (ersten) Artikels, falls vorhanden.
+    """
+    plan = build_id_plan(entities, identifier, allocate_sap_id)
+    try:
+        cloned = [apply_id_plan(ent, plan) for ent in entities]
+    except BaseException:
+        # Noch nichts hochgeladen: SAP-Nummern nicht verlieren (nur selbst vergebene)
+        if allocate_sap_id is None:
+            release_id_plan(plan)
+        raise
+    return cloned, plan["id_map"], plan["new_sap_id"]
+
+
+def clone_copies(entities, identifier, copies, allocate_sap_ids=None, release_sap_ids=None):
+    """
+    Erstellt mehrere Kopien desselben Klon-Graphen (Fan-out, z. B. --copies N).
+
+    Die SAP-Nummern aller Kopien werden vorab in einem Schritt je bisheriger Artikelnummer
+    vergeben (Artikelart und Nummernkreis nur einmal, Nummern aus dem Pool bzw. parallel).
+    Danach wird für jede Kopie ein eigener ID-Plan auf dem Graphen im Speicher erstellt und
+    auf eine Kopie der Entitäten angewendet – die letzte Kopie verwendet die Originale.
+    Die fertigen Kopien bleiben bis zum Upload im Speicher und werden daher kompakt als
+    CompactEntities abgelegt (jede umgeschriebene Entität sofort, die dicts werden nicht behalten).
+    Schlägt die Vergabe für eine weitere Artikelnummer oder die Planung fehl, werden alle
+    bereits vergebenen Nummern zurückgelegt.
+
+    Parameter:
+        entities (list): Die exportierten Entitäten (werden von der letzten Kopie verändert)
+        identifier (str): Ursprünglicher Identifier (z. B. Artikelnummer), wird für SAP verwendet.
+        copies (int): Anzahl Kopien
+        allocate_sap_ids (callable, optional): Vergibt mehrere SAP-Nummern,
+            allocate_sap_ids(identifier, count) -> list (Standard: get_new_sap_artikelnummern)
+        release_sap_ids (callable, optional): Legt nicht verwendete Nummern zurück,
+            release_sap_ids(identifier, sap_ids) (Standard: release_sap_artikelnummern)
+
+    Rückgabe:
+        cloned (CompactEntities): Entitäten aller Kopien (Kopie für Kopie), wiederholt lesbar
+        results (list): Je Kopie {"copy", "new_sap_id", "id_map"}
+    """
+    allocate_sap_ids = allocate_sap_ids or get_new_sap_artikelnummern
+    release_sap_ids = release_sap_ids or release_sap_artikelnummern
+    roots = Counter(_sap_identifier(ent, identifier) for ent in entities if ent["type"] == ROOT_TYPE)
+    numbers = {}  # bisherige Artikelnummer → vergebene SAP-Nummern
+    try:
+        for sap_identifier, count in roots.items():
+            numbers[sap_identifier] = allocate_sap_ids(sap_identifier, count * copies)
+        allocated = {sap_identifier: deque(ids) for sap_identifier, ids in numbers.items()}
 
-        cloned.append(ent)
+        # Alle Pläne auf den unveränderten Entitäten erstellen, erst danach umschreiben
+        plans = [build_id_plan(entities, identifier, lambda sap_identifier: allocated[sap_identifier].popleft())
+                 for _ in range(copies)]
+    except BaseException:
+        # Noch nichts umgeschrieben: alle bereits vergebenen Nummern zurücklegen
+        for sap_identifier, ids in numbers.items():
+            release_sap_ids(sap_identifier, ids)
+        raise
+    snapshot = dumps(entities) if copies > 1 else None
 
-    return cloned, id_map, new_sap_id
\ No newline at end of file
+    cloned = CompactEntities()
+    results = []
+    for number, plan in enumerate(plans, start=1):
+        source = entities if number == copies else loads(snapshot)
+        cloned.extend(apply_id_plan(ent, plan) for ent in source)
+        results.append({"copy": number, "new_sap_id": plan["new_sap_id"], "id_map": plan["id_map"]})
+    return cloned, results
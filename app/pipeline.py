@@ -0,0 +1,164 @@
+# app/pipeline.py – Stufen-Pipeline mit begrenzten Warteschlangen (Fetch, Transformation, Upload überlappend)
+import queue
+import threading
+import time
+
+# Standardgrösse der Warteschlange vor jeder Stufe (begrenzt die Anzahl Aufträge in Arbeit)
+DEFAULT_QUEUE_SIZE = 2
+
+# Markiert das Ende des Eingabestroms einer Stufe
+_END = object()
+
+
+class Stage:
+    """
+    Eine Stufe der Pipeline.
+
+    Args:
+        name (str): Name der Stufe (für Statistik und Meldungen)
+        func (callable): func(item) → Ergebnis, das an die nächste Stufe weitergegeben wird
+        workers (int): Anzahl paralleler Worker dieser Stufe
+        queue_size (int, optional): Plätze in der Warteschlange vor dieser Stufe
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=None):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.queue_size = queue_size
+
+
+class _StageState:
+    def __init__(self, stage, queue_size):
+        self.stage = stage
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.lock = threading.Lock()
+        self.running = stage.workers
+        self.items = 0
+        self.failed = 0
+        self.busy = 0.0     # Zeit in func
+        self.idle = 0.0     # Warten auf Eingabe (Stufe davor ist langsamer)
+        self.blocked = 0.0  # Warten auf Platz in der nächsten Warteschlange (Rückstau)
+
+    def add(self, busy, idle, blocked, failed):
+        with self.lock:
+            self.busy += busy
+            self.idle += idle
+            self.blocked += blocked
+            if failed:
+                self.failed += 1
+            else:
+                self.items += 1
+
+    def stats(self, elapsed):
+        capacity = elapsed * self.stage.workers
+        return {
+            "stage": self.stage.name,
+            "workers": self.stage.workers,
+            "items": self.items,
+            "failed": self.failed,
+            "busy_s": round(self.busy, 3),
+            "idle_s": round(self.idle, 3),
+            "blocked_s": round(self.blocked, 3),
+            "avg_s": round(self.busy / (self.items + self.failed), 3) if self.items + self.failed else 0.0,
+            "throughput_per_min": round(self.items / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "utilization": round(self.busy / capacity, 3) if capacity > 0 else 0.0
+        }
+
+
+def _print_error(item, stage_name, exc):
+    print(f"[FEHLER] Pipeline-Stufe '{stage_name}': {exc}")
+
+
+def _notify(callback, *args):
+    # Fehler im Callback dürfen keinen Worker beenden (sonst bliebe die Pipeline stehen)
+    if callback is None:
+        return
+    try:
+        callback(*args)
+    except Exception as e:
+        print(f"[FEHLER] Pipeline-Callback fehlgeschlagen: {e}")
+
+
+def run_pipeline(items, stages, on_done=None, on_error=None, queue_size=DEFAULT_QUEUE_SIZE):
+    """
+    Führt items durch die Stufen, wobei jede Stufe eigene Worker hat und die Stufen überlappen:
+    Während Auftrag N+1 geladen wird, läuft die Transformation von N und der Upload von N-1.
+
+    Zwischen den Stufen liegen begrenzte Warteschlangen. Ist eine Stufe langsamer als die
+    vorherige, füllt sich ihre Warteschlange und die vorherige Stufe wartet (Rückstau), sodass
+    nie mehr als (Worker + Warteschlangenplätze) Aufträge je Stufe im Speicher sind.
+    Die Reihenfolge der Ergebnisse entspricht nicht zwingend der Eingabereihenfolge.
+
+    Args:
+        items (iterable): Eingaben der ersten Stufe (werden erst bei freiem Platz gelesen)
+        stages (list): Liste von Stage-Objekten in Ablaufreihenfolge
+        on_done (callable, optional): on_done(result) für jedes Ergebnis der letzten Stufe
+        on_error (callable, optional): on_error(item, stage_name, exc) bei Fehler in einer Stufe;
+            der Auftrag wird danach nicht weitergereicht
+        queue_size (int): Standardgrösse der Warteschlangen (falls Stage.queue_size nicht gesetzt)
+
+    Returns:
+        dict: {"elapsed_s": ..., "stages": [Statistik je Stufe], "bottleneck": Name der Stufe
+            mit der höchsten Auslastung}
+    """
+    states = [_StageState(stage, stage.queue_size or queue_size) for stage in stages]
+    if on_error is None:
+        on_error = _print_error
+
+    def worker(index):
+        state = states[index]
+        following = states[index + 1] if index + 1 < len(states) else None
+        while True:
+            waited = time.perf_counter()
+            item = state.queue.get()
+            idle = time.perf_counter() - waited
+            if item is _END:
+                with state.lock:
+                    state.idle += idle
+                    state.running -= 1
+                    last = state.running == 0
+                # Der letzte Worker gibt das Ende an alle Worker der nächsten Stufe weiter
+                if last and following is not None:
+                    for _ in range(following.stage.workers):
+                        following.queue.put(_END)
+                return
+
+            started = time.perf_counter()
+            try:
+                result = state.stage.func(item)
+            except Exception as e:
+                state.add(time.perf_counter() - started, idle, 0.0, True)
+                _notify(on_error, item, state.stage.name, e)
+                continue
+            busy = time.perf_counter() - started
+
+            waited = time.perf_counter()
+            if following is not None:
+                following.queue.put(result)
+            else:
+                _notify(on_done, result)
+            state.add(busy, idle, time.perf_counter() - waited if following is not None else 0.0, False)
+
+    threads = []
+    for index, state in enumerate(states):
+        for n in range(state.stage.workers):
+            thread = threading.Thread(target=worker, args=(index,), name=f"pipeline-{state.stage.name}-{n}", daemon=True)
+            thread.start()
+            threads.append(thread)
+
+    started = time.perf_counter()
+    first = states[0]
+    try:
+        for item in items:
+            first.queue.put(item)  # blockiert bei voller Warteschlange (Rückstau bis zur Eingabe)
+    finally:
+        for _ in range(first.stage.workers):
+            first.queue.put(_END)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    stats = [state.stats(elapsed) for state in states]
+    bottleneck = max(stats, key=lambda s: s["utilization"])["stage"] if stats else None
+    return {"elapsed_s": round(elapsed, 3), "stages": stats, "bottleneck": bottleneck}
@@ -1,30 +1,292 @@
-import requests
+from utils.http_client import request
 import os
 import json
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.reference_cache import get_cached_reference, put_cached_reference
+from utils.metrics import span
+from app.sap_id_pool import is_pool_enabled, release_sap_ids, take_sap_id, take_sap_ids
+from app.entity_model import first_entity, first_value
+
+# Token wird so viele Sekunden vor Ablauf erneuert
+TOKEN_REFRESH_MARGIN = 60
+# Gültigkeit, falls der Token-Endpunkt kein expires_in liefert
+DEFAULT_TOKEN_TTL = 300
+# Parallele SAP Calls, wenn mehrere Nummern auf einmal benötigt werden (ohne Pool)
+DEFAULT_PARALLEL_SAP_CALLS = 4
+
+# Cache-Bereich und Standard-TTL (Sekunden) für die Zuordnung Artikelart → Nummernkreis
+NUMMERNKREIS_CACHE_NAMESPACE = "nummernkreis"
+DEFAULT_NUMMERNKREIS_CACHE_TTL = 86400
+
+# Prozessweiter Token-Cache (geteilt von allen Klonen/Threads)
+_token_lock = threading.Lock()
+_token_cache = {"token": None, "expires_at": 0.0}
+_token_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _cached_token():
+    """Liefert den gecachten Token, sofern er noch nicht im Erneuerungsfenster liegt."""
+    if _token_cache["token"] and time.monotonic() < _token_cache["expires_at"]:
+        return _token_cache["token"]
+    return None
+
+
+def get_sap_token():
+    """
+    Liefert einen gültigen SAP-OAuth-Token aus dem prozessweiten Cache.
+
+    Der Token wird erst kurz vor Ablauf (expires_in des Token-Endpunkts abzüglich
+    TOKEN_REFRESH_MARGIN) neu geholt. Gleichzeitige Aufrufe warten auf einen einzigen
+    Refresh (Single-Flight) statt je eigene Token anzufordern.
+
+    Returns:
+        str: Access Token
+    """
+    token = _cached_token()
+    if token:
+        with _token_lock:
+            _token_stats["hits"] += 1
+        return token
+
+    with _token_lock:
+        # Ein anderer Thread könnte den Token inzwischen erneuert haben
+        token = _cached_token()
+        if token:
+            _token_stats["hits"] += 1
+            return token
+
+        _token_stats["misses"] += 1
+        token_url = os.getenv("SAP_TOKEN_URL")
+        auth_header = {"Authorization": os.getenv("SAP_TOKEN_AUTH")}
+        with span("sap_step", step="token") as measured:
+            token_response = request("GET", token_url, endpoint="sap", headers=auth_header)
+            token_response.raise_for_status()
+            measured["bytes"] = len(token_response.content)
+        token_data = token_response.json()
+        token = token_data.get("access_token")
+
+        if not token:
+            raise Exception("Token konnte nicht abgefragt werden.")
+
+        try:
+            expires_in = float(token_data.get("expires_in") or DEFAULT_TOKEN_TTL)
+        except (TypeError, ValueError):
+            expires_in = DEFAULT_TOKEN_TTL
+        # Bei sehr kurzer Gültigkeit höchstens die halbe Laufzeit als Puffer verwenden
+        margin = min(TOKEN_REFRESH_MARGIN, expires_in / 2)
+        _token_cache["token"] = token
+        _token_cache["expires_at"] = time.monotonic() + expires_in - margin
+        return token
+
+
+def invalidate_sap_token(token=None):
+    """
+    Verwirft den gecachten Token (z. B. nach einer 401-Antwort).
+
+    Args:
+        token (str, optional): Nur verwerfen, wenn der Cache noch genau diesen Token enthält –
+            verhindert, dass ein bereits von einem anderen Thread erneuerter Token verworfen wird.
+    """
+    with _token_lock:
+        if token is None or _token_cache["token"] == token:
+            _token_cache["token"] = None
+            _token_cache["expires_at"] = 0.0
+            _token_stats["invalidations"] += 1
+
+
+def get_token_cache_stats():
+    """
+    Liefert die Zähler des Token-Caches.
+
+    Returns:
+        dict: {"hits": int, "misses": int, "invalidations": int}
+    """
+    with _token_lock:
+        return dict(_token_stats)
+
+
+def get_nummernkreis(artikelart, mdm_url, mdm_headers):
+    """
+    Liefert den SAP-Nummernkreis (arefxnummernkreis) zu einer Artikelart.
+
+    Die Zuordnung refxartikelartsap → Nummernkreis ändert sich sehr selten und wird daher
+    pro Artikelart in einem persistenten TTL-Cache abgelegt (NUMMERNKREIS_CACHE_TTL Sekunden,
+    Standard 1 Tag). Nur bei fehlendem oder abgelaufenem Eintrag wird MDM abgefragt.
+
+    Args:
+        artikelart (str): Wert von axartikelartsap
+        mdm_url (str): URL der MDM-Get-API
+        mdm_headers (dict): Header für die MDM-Get-API
+
+    Returns:
+        str: Nummernkreis
+    """
+    ttl = float(os.getenv("NUMMERNKREIS_CACHE_TTL", DEFAULT_NUMMERNKREIS_CACHE_TTL))
+    nummernkreis = get_cached_reference(NUMMERNKREIS_CACHE_NAMESPACE, artikelart, ttl)
+    if nummernkreis:
+        return nummernkreis
+
+    mdm_payload_ref = {
+        "params": {
+            "query": {
+                "filters": {
+                    "typesCriterion": ["refxartikelartsap"],
+                    "attributesCriterion": [
+                        {
+                            "value": {
+                                "exacts": str(artikelart),
+                                "type": "_STRING",
+                                "valueContexts": [{"source": "internal", "locale": "de-DE"}]
+                            }
+                        }
+                    ]
+                }
+            },
+            "fields": {
+                "attributes": ["arefxnummernkreis"],
+                "relationships": [],
+                "relationshipAttributes": []
+            }
+        }
+    }
+
+    with span("sap_step", step="nummernkreis") as measured:
+        nummernkreis_response = request("POST", mdm_url, endpoint="mdm", headers=mdm_headers, json=mdm_payload_ref)
+        nummernkreis_response.raise_for_status()
+        measured["bytes"] = len(nummernkreis_response.content)
+    nummernkreis_data = nummernkreis_response.json()
+
+    nummernkreis = first_value(first_entity(nummernkreis_data), "arefxnummernkreis")
+
+    if not nummernkreis:
+        raise Exception("Nummernkreis konnte nicht aus MDM gelesen werden.")
+
+    put_cached_reference(NUMMERNKREIS_CACHE_NAMESPACE, artikelart, nummernkreis)
+    return nummernkreis
+
+
+def fetch_sap_id(nummernkreis):
+    """
+    Holt genau eine neue Artikelnummer für einen Nummernkreis direkt bei SAP.
+
+    Args:
+        nummernkreis (str): SAP-Nummernkreis
+
+    Returns:
+        str: Neue SAP-Artikelnummer ohne führende Nullen
+    """
+
+    # Token aus dem prozessweiten Cache (siehe get_sap_token)
+    token = get_sap_token()
+
+    # SAP Call mit Nummernkreis
+    sap_id_url = os.getenv("SAP_ID_URL_TEMPLATE").replace("{nummernkreis}", str(nummernkreis))
+    # Jeder Aufruf vergibt eine Nummer: nur wiederholen, wenn SAP den Request abgelehnt hat
+    sap_response = request("GET", sap_id_url, endpoint="sap", idempotent=False, headers={"Authorization": f"Bearer {token}"})
+    if sap_response.status_code == 401:
+        # Token wurde serverseitig verworfen: Cache invalidieren und einmalig mit neuem Token wiederholen
+        invalidate_sap_token(token)
+        token = get_sap_token()
+        sap_response = request("GET", sap_id_url, endpoint="sap", idempotent=False, headers={"Authorization": f"Bearer {token}"})
+    sap_response.raise_for_status()
+    raw_sap_id = sap_response.text.strip()  # Beispiel: "00000001401096"
+
+    # Entferne führende Nullen via Regex
+    sap_id = re.sub(r"^0+", "", raw_sap_id)
+
+    if not sap_id:
+        raise Exception("SAP ID konnte nicht geholt oder war leer.")
+
+    return sap_id
 
 
 def get_new_sap_artikelnummer(mdm_identifier: str) -> str:
     """
     Holt eine neue Artikelnummer aus SAP, indem:
-    1. Ein Token geholt wird
+    1. Ein Token geholt wird (aus dem prozessweiten Cache, siehe get_sap_token)
     2. Ein Attributwert aus exartikel gelesen wird
     3. Ein weiterer MDM-Wert abgefragt wird (arefxnummernkreis über refxartikelartsap)
     4. Mit diesem Wert eine neue Artikelnummer bei SAP geholt wird
+       (bzw. aus dem vorreservierten Pool genommen, siehe app/sap_id_pool.py)
+
+    Schritt 1 erfolgt erst beim SAP Call selbst (fetch_sap_id), damit Nummern aus dem
+    Pool ganz ohne Token-Abfrage vergeben werden.
+    """
+    nummernkreis = _nummernkreis_for_identifier(mdm_identifier)
+
+    # 4. SAP-Nummer holen: aus dem lokalen Pool (falls aktiviert) oder direkt per SAP Call
+    with span("sap_step", step="number", via="pool" if is_pool_enabled() else "sap"):
+        if is_pool_enabled():
+            return take_sap_id(nummernkreis, fetch_sap_id)
+        return fetch_sap_id(nummernkreis)
+
+
+def get_new_sap_artikelnummern(mdm_identifier: str, count: int) -> list:
+    """
+    Holt count neue Artikelnummern für denselben Artikel auf einmal (z. B. für --copies).
+
+    Artikelart und Nummernkreis werden nur einmal ermittelt; die Nummern kommen aus dem
+    Pool (falls aktiviert) bzw. werden parallel bei SAP geholt und teilen sich einen Token.
+    Schlägt ein SAP Call fehl, werden die bereits erhaltenen Nummern zurückgelegt
+    (release_sap_ids) und der Fehler weitergereicht.
+
+    Args:
+        mdm_identifier (str): Bisherige SAP-Artikelnummer des Artikels
+        count (int): Anzahl benötigter Nummern
+
+    Returns:
+        list: count neue SAP-Artikelnummern
     """
+    nummernkreis = _nummernkreis_for_identifier(mdm_identifier)
 
-    # 1. Token holen (Beispiel: über Client Credentials)
-    token_url = os.getenv("SAP_TOKEN_URL")
-    auth_header = {"Authorization": os.getenv("SAP_TOKEN_AUTH")}
-    token_response = requests.get(token_url, headers=auth_header)
-    token_response.raise_for_status()
-    token = token_response.json().get("access_token")
+    with span("sap_step", step="number", via="pool" if is_pool_enabled() else "sap") as measured:
+        measured["entities"] = count
+        if is_pool_enabled():
+            return take_sap_ids(nummernkreis, count, fetch_sap_id)
+        fetched = []
+        errors = []
+        workers = max(1, min(DEFAULT_PARALLEL_SAP_CALLS, count))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sap-id-fetch") as executor:
+            futures = [executor.submit(fetch_sap_id, nummernkreis) for _ in range(count)]
+            for future in as_completed(futures):
+                try:
+                    fetched.append(future.result())
+                except Exception as e:
+                    errors.append(e)
+        if errors:
+            # Bereits vergebene Nummern nicht verlieren
+            release_sap_ids(nummernkreis, fetched)
+            raise errors[0]
+        return fetched
 
-    if not token:
-        raise Exception("Token konnte nicht abgefragt werden.")
 
-    bearer_header = {"Authorization": f"Bearer {token}"}
+def release_sap_artikelnummern(mdm_identifier: str, sap_ids: list):
+    """
+    Legt vergebene, aber nicht verwendete Artikelnummern eines Artikels zurück (siehe
+    release_sap_ids), z. B. wenn beim Klonen nach der Vergabe ein Fehler auftritt.
+
+    Lässt sich der Nummernkreis nicht ermitteln, werden die Nummern nur protokolliert.
+
+    Args:
+        mdm_identifier (str): Bisherige SAP-Artikelnummer des Artikels
+        sap_ids (list): Nicht verwendete SAP-Artikelnummern
+    """
+    if not sap_ids:
+        return
+    try:
+        nummernkreis = _nummernkreis_for_identifier(mdm_identifier)
+    except Exception as e:
+        print(f"[FEHLER] Nicht verwendete SAP-Nummern zu {mdm_identifier} konnten nicht zurückgelegt "
+              f"werden ({e}): {', '.join(sap_ids)}")
+        return
+    release_sap_ids(nummernkreis, sap_ids)
 
+
+def _nummernkreis_for_identifier(mdm_identifier):
+    """Schritte 2 und 3: Artikelart des Artikels und den zugehörigen Nummernkreis aus MDM lesen."""
     # 2. MDM Call: axartikelartsap aus exartikel lesen
     mdm_url = os.getenv("API_URL_GET")
     mdm_headers = {
@@ -60,61 +322,16 @@ def get_new_sap_artikelnummer(mdm_identifier: str) -> str:
         }
     }
 
-    mdm_response = requests.post(mdm_url, headers=mdm_headers, json=mdm_payload_art)
-    mdm_response.raise_for_status()
+    with span("sap_step", step="artikelart") as measured:
+        mdm_response = request("POST", mdm_url, endpoint="mdm", headers=mdm_headers, json=mdm_payload_art)
+        mdm_response.raise_for_status()
+        measured["bytes"] = len(mdm_response.content)
     mdm_data = mdm_response.json()
 
-    attributes = mdm_data.get("response", {}).get("entities", [{}])[0].get("data", {}).get("attributes", {})
-    artikelart = attributes.get("axartikelartsap", {}).get("values", [{}])[0].get("value")
+    artikelart = first_value(first_entity(mdm_data), "axartikelartsap")
 
     if not artikelart:
         raise Exception("Artikelart nicht gefunden.")
 
-    # 3. MDM Call: Nummernkreis über Artikelart referenziert
-    mdm_payload_ref = {
-        "params": {
-            "query": {
-                "filters": {
-                    "typesCriterion": ["refxartikelartsap"],
-                    "attributesCriterion": [
-                        {
-                            "value": {
-                                "exacts": str(artikelart),
-                                "type": "_STRING",
-                                "valueContexts": [{"source": "internal", "locale": "de-DE"}]
-                            }
-                        }
-                    ]
-                }
-            },
-            "fields": {
-                "attributes": ["arefxnummernkreis"],
-                "relationships": [],
-                "relationshipAttributes": []
-            }
-        }
-    }
-
-    nummernkreis_response = requests.post(mdm_url, headers=mdm_headers, json=mdm_payload_ref)
-    nummernkreis_response.raise_for_status()
-    nummernkreis_data = nummernkreis_response.json()
-
-    nummernkreis = nummernkreis_data.get("response", {}).get("entities", [{}])[0] \
-        .get("data", {}).get("attributes", {}).get("arefxnummernkreis", {}).get("values", [{}])[0].get("value")
-
-    if not nummernkreis:
-        raise Exception("Nummernkreis konnte nicht aus MDM gelesen werden.")
-
-    # 4. SAP Call mit Nummernkreis
-    sap_id_url = os.getenv("SAP_ID_URL_TEMPLATE").replace("{nummernkreis}", str(nummernkreis))
-    sap_response = requests.get(sap_id_url, headers=bearer_header)
-    sap_response.raise_for_status()
-    raw_sap_id = sap_response.text.strip()  # Beispiel: "00000001401096"
-
-    # Entferne führende Nullen via Regex
-    sap_id = re.sub(r"^0+", "", raw_sap_id)
-
-    if not sap_id:
-        raise Exception("SAP ID konnte nicht geholt oder war leer.")
-
-    return sap_id
\ No newline at end of file
+    # 3. MDM Call: Nummernkreis über Artikelart referenziert (persistent gecacht)
+    return get_nummernkreis(artikelart, mdm_url, mdm_headers)
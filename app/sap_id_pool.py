@@ -0,0 +1,315 @@
+# app/sap_id_pool.py – Vorreservierte SAP-Artikelnummern pro Nummernkreis
+import json
+import os
+import threading
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+try:
+    import fcntl  # Nur unter Unix verfügbar: erkennt Ledger beendeter Prozesse
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# Ordner für die Ledger-Dateien (eine pro Prozess)
+DEFAULT_LEDGER_DIR = os.path.join("data", "sap_id_pool")
+# Anzahl paralleler SAP Calls beim Auffüllen eines Blocks
+DEFAULT_REFILL_WORKERS = 4
+
+_pool_lock = threading.Lock()
+_pools = {}          # nummernkreis → deque reservierter, noch freier Nummern
+_refilling = set()   # Nummernkreise mit laufendem Hintergrund-Refill
+_stats = {"taken_from_pool": 0, "fetched_sync": 0, "reserved": 0, "refill_errors": 0}
+_settings = {
+    "block_size": int(os.getenv("SAP_ID_POOL_SIZE", "0")),
+    "low_watermark": int(os.getenv("SAP_ID_POOL_LOW_WATERMARK", "0")),
+    "workers": int(os.getenv("SAP_ID_POOL_WORKERS", str(DEFAULT_REFILL_WORKERS)))
+}
+_ledger = {"path": None, "file": None}
+_executor = None
+
+
+def configure_sap_id_pool(block_size, low_watermark=None, workers=None):
+    """
+    Aktiviert bzw. konfiguriert den Pool (z. B. für Batch-Läufe).
+
+    Args:
+        block_size (int): Anzahl Nummern, die pro Refill reserviert werden (0 = Pool aus).
+        low_watermark (int, optional): Refill startet, sobald weniger Nummern frei sind
+            (Standard: ein Viertel der Blockgrösse).
+        workers (int, optional): Parallele SAP Calls beim Auffüllen.
+    """
+    with _pool_lock:
+        _settings["block_size"] = max(0, int(block_size))
+        if low_watermark is not None:
+            _settings["low_watermark"] = max(0, int(low_watermark))
+        if workers is not None:
+            _settings["workers"] = max(1, int(workers))
+
+
+def is_pool_enabled():
+    """True, wenn eine Blockgrösse > 0 konfiguriert ist (SAP_ID_POOL_SIZE bzw. configure_sap_id_pool)."""
+    return _settings["block_size"] > 0
+
+
+def _low_watermark():
+    return _settings["low_watermark"] or max(1, _settings["block_size"] // 4)
+
+
+def _ledger_dir():
+    return os.getenv("SAP_ID_POOL_LEDGER_DIR", DEFAULT_LEDGER_DIR)
+
+
+def _write_ledger(event, nummernkreis, sap_id):
+    # Aufruf nur unter _pool_lock
+    entry = {
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "event": event,
+        "nummernkreis": str(nummernkreis),
+        "sap_id": sap_id
+    }
+    f = _ledger["file"]
+    f.write(json.dumps(entry) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _read_outstanding(path):
+    """Liest eine Ledger-Datei und liefert die reservierten, aber nicht verbrauchten Nummern."""
+    outstanding = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            ids = outstanding.setdefault(entry["nummernkreis"], [])
+            if entry["event"] == "reserved":
+                ids.append(entry["sap_id"])
+            elif entry["event"] == "consumed" and entry["sap_id"] in ids:
+                ids.remove(entry["sap_id"])
+    return outstanding
+
+
+def _open_ledger():
+    """
+    Öffnet das Ledger dieses Prozesses und übernimmt freie Nummern aus Ledgern beendeter
+    Prozesse, damit reservierte Nummern nach einem Neustart weiterverwendet werden.
+    Aufruf nur unter _pool_lock.
+    """
+    if _ledger["file"] is not None:
+        return
+
+    ledger_dir = _ledger_dir()
+    os.makedirs(ledger_dir, exist_ok=True)
+    path = os.path.join(ledger_dir, f"{os.getpid()}-{uuid.uuid4().hex[:8]}.jsonl")
+    f = open(path, "a", encoding="utf-8")
+    if fcntl is not None:
+        # Exklusive Sperre solange der Prozess lebt – andere Prozesse übernehmen das Ledger nicht
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    _ledger["path"] = path
+    _ledger["file"] = f
+
+    if fcntl is None:
+        print("[WARNUNG] SAP-ID-Pool: Übernahme alter Ledger ohne fcntl nicht möglich.")
+        return
+
+    for name in sorted(os.listdir(ledger_dir)):
+        other_path = os.path.join(ledger_dir, name)
+        if other_path == path or not name.endswith(".jsonl"):
+            continue
+        try:
+            other = open(other_path, "r+", encoding="utf-8")
+        except FileNotFoundError:
+            continue  # Gleichzeitig von einem anderen Prozess übernommen und gelöscht
+        with other:
+            try:
+                fcntl.flock(other.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                continue  # Ledger gehört einem laufenden Prozess
+            try:
+                outstanding = _read_outstanding(other_path)
+            except FileNotFoundError:
+                continue  # Während des Wartens auf die Sperre übernommen und gelöscht
+            for nummernkreis, ids in outstanding.items():
+                for sap_id in ids:
+                    _pools.setdefault(nummernkreis, deque()).append(sap_id)
+                    _write_ledger("reserved", nummernkreis, sap_id)
+            os.remove(other_path)
+        adopted = sum(len(ids) for ids in outstanding.values())
+        if adopted:
+            print(f"[INFO] SAP-ID-Pool: {adopted} unverbrauchte Nummer(n) aus {name} übernommen.")
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=_settings["workers"], thread_name_prefix="sap-id-refill")
+    return _executor
+
+
+def _refill(nummernkreis, fetch_one, count):
+    """Reserviert count Nummern im Hintergrund (parallel) und legt sie in den Pool."""
+    try:
+        with ThreadPoolExecutor(max_workers=_settings["workers"], thread_name_prefix="sap-id-fetch") as executor:
+            futures = [executor.submit(fetch_one, nummernkreis) for _ in range(count)]
+            # Jede Nummer sofort im Ledger festhalten, damit sie auch bei einem Absturz nicht verloren geht
+            for future in as_completed(futures):
+                try:
+                    sap_id = future.result()
+                except Exception as e:
+                    with _pool_lock:
+                        _stats["refill_errors"] += 1
+                    print(f"[WARNUNG] SAP-ID-Pool: Reservierung für Nummernkreis {nummernkreis} fehlgeschlagen: {e}")
+                    continue
+                with _pool_lock:
+                    _write_ledger("reserved", nummernkreis, sap_id)
+                    _pools.setdefault(str(nummernkreis), deque()).append(sap_id)
+                    _stats["reserved"] += 1
+    finally:
+        with _pool_lock:
+            _refilling.discard(str(nummernkreis))
+
+
+def _trigger_refill(nummernkreis, fetch_one):
+    # Aufruf nur unter _pool_lock
+    key = str(nummernkreis)
+    if key in _refilling:
+        return
+    available = len(_pools.get(key, ()))
+    if available >= _low_watermark():
+        return
+    _refilling.add(key)
+    _get_executor().submit(_refill, nummernkreis, fetch_one, _settings["block_size"] - available)
+
+
+def take_sap_id(nummernkreis, fetch_one):
+    """
+    Nimmt eine SAP-Artikelnummer aus dem Pool des Nummernkreises.
+
+    Ist der Pool leer, wird eine Nummer synchron geholt. Fällt der Bestand unter die
+    Low-Watermark, wird im Hintergrund ein neuer Block reserviert. Jede reservierte und
+    verbrauchte Nummer wird im Ledger protokolliert.
+
+    Args:
+        nummernkreis (str): SAP-Nummernkreis
+        fetch_one (callable): Holt genau eine Nummer bei SAP, fetch_one(nummernkreis) -> str
+
+    Returns:
+        str: SAP-Artikelnummer
+    """
+    key = str(nummernkreis)
+    with _pool_lock:
+        _open_ledger()
+        pool = _pools.get(key)
+        sap_id = pool.popleft() if pool else None
+        if sap_id is not None:
+            _write_ledger("consumed", key, sap_id)
+            _stats["taken_from_pool"] += 1
+        _trigger_refill(nummernkreis, fetch_one)
+
+    if sap_id is not None:
+        return sap_id
+
+    # Pool leer: eine Nummer direkt holen (Refill läuft bereits im Hintergrund)
+    sap_id = fetch_one(nummernkreis)
+    with _pool_lock:
+        _write_ledger("reserved", key, sap_id)
+        _write_ledger("consumed", key, sap_id)
+        _stats["fetched_sync"] += 1
+    return sap_id
+
+
+def take_sap_ids(nummernkreis, count, fetch_one):
+    """
+    Nimmt count SAP-Artikelnummern auf einmal (z. B. für mehrere Kopien eines Artikels).
+
+    Zuerst werden freie Nummern aus dem Pool genommen, der Rest wird parallel direkt bei SAP
+    geholt. Schlägt dabei ein Call fehl, kommen alle bereits erhaltenen Nummern zurück in den
+    Pool (nichts geht verloren) und der Fehler wird weitergereicht.
+
+    Args:
+        nummernkreis (str): SAP-Nummernkreis
+        count (int): Anzahl benötigter Nummern
+        fetch_one (callable): Holt genau eine Nummer bei SAP, fetch_one(nummernkreis) -> str
+
+    Returns:
+        list: count SAP-Artikelnummern
+    """
+    key = str(nummernkreis)
+    with _pool_lock:
+        _open_ledger()
+        pool = _pools.get(key) or deque()
+        taken = [pool.popleft() for _ in range(min(count, len(pool)))]
+        for sap_id in taken:
+            _write_ledger("consumed", key, sap_id)
+        _stats["taken_from_pool"] += len(taken)
+
+    fetched = []
+    errors = []
+    missing = count - len(taken)
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(_settings["workers"], missing), thread_name_prefix="sap-id-fetch") as executor:
+            futures = [executor.submit(fetch_one, nummernkreis) for _ in range(missing)]
+            for future in as_completed(futures):
+                try:
+                    fetched.append(future.result())
+                except Exception as e:
+                    errors.append(e)
+
+    with _pool_lock:
+        if errors:
+            # Bereits erhaltene Nummern für spätere Läufe aufbewahren
+            for sap_id in taken + fetched:
+                _write_ledger("reserved", key, sap_id)
+            _pools.setdefault(key, deque()).extend(taken + fetched)
+            _stats["reserved"] += len(fetched)
+        else:
+            for sap_id in fetched:
+                _write_ledger("reserved", key, sap_id)
+                _write_ledger("consumed", key, sap_id)
+            _stats["fetched_sync"] += len(fetched)
+        _trigger_refill(nummernkreis, fetch_one)
+
+    if errors:
+        raise errors[0]
+    return taken + fetched
+
+
+def release_sap_ids(nummernkreis, sap_ids):
+    """
+    Legt bereits geholte, aber nicht verwendete Nummern zurück (z. B. wenn eine
+    Mehrfachvergabe mittendrin fehlschlägt). Sie kommen in den Pool und werden im Ledger als
+    reserviert protokolliert – auch bei ausgeschaltetem Pool, damit ein späterer Lauf mit Pool
+    sie übernimmt – und zusätzlich auf der Konsole ausgegeben.
+
+    Args:
+        nummernkreis (str): SAP-Nummernkreis
+        sap_ids (list): Zurückzulegende SAP-Artikelnummern
+    """
+    if not sap_ids:
+        return
+    key = str(nummernkreis)
+    print(f"[WARNUNG] SAP-ID-Pool: {len(sap_ids)} nicht verwendete Nummer(n) für Nummernkreis {key} "
+          f"zurückgelegt: {', '.join(sap_ids)}")
+    with _pool_lock:
+        _open_ledger()
+        for sap_id in sap_ids:
+            _write_ledger("reserved", key, sap_id)
+        _pools.setdefault(key, deque()).extend(sap_ids)
+        _stats["reserved"] += len(sap_ids)
+
+
+def get_pool_stats():
+    """
+    Liefert Kennzahlen des Pools.
+
+    Returns:
+        dict: Zähler plus freie Nummern je Nummernkreis ("available") und Ledger-Pfad.
+    """
+    with _pool_lock:
+        stats = dict(_stats)
+        stats["available"] = {key: len(pool) for key, pool in _pools.items()}
+        stats["ledger"] = _ledger["path"]
+        return stats
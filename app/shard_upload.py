@@ -0,0 +1,352 @@
+# app/shard_upload.py – Aufteilen grosser Importe in mehrere Dateien (nach Anzahl/Bytes) in Abhängigkeitsreihenfolge
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from utils.http_client import request
+from utils.metrics import record
+from utils.serialization import dumps, gzip_compressor, with_gzip_suffix
+
+# Stufen in Abhängigkeitsreihenfolge: Teile einer Stufe dürfen parallel importiert werden,
+# die nächste Stufe erst, wenn die vorherige vollständig ist. Typen ohne feste Stufe
+# (z. B. exlieferant) kommen in die erste Stufe, da andere Entitäten auf sie verweisen können.
+SHARD_TIERS = (
+    ("exartikel", "exlieferantenartikel"),
+    ("extradeitem",),
+    ("exeinkaufskond", "exverkaufskond")
+)
+DEFAULT_SHARD_WORKERS = 4
+UPLOAD_DIR = os.path.join("data", "uploads")
+
+PART_PENDING = "pending"
+PART_UPLOADED = "uploaded"
+PART_FAILED = "failed"
+
+_TIER_OF = {typ: tier for tier, types in enumerate(SHARD_TIERS) for typ in types}
+
+
+def is_sharding_enabled(env_config):
+    """True, wenn Importdateien nach Anzahl Entitäten oder Bytes aufgeteilt werden sollen."""
+    return bool(env_config.get("upload_shard_entities") or env_config.get("upload_shard_bytes"))
+
+
+def tier_of(entity_type):
+    """Stufe (0 = zuerst) eines Entitätstyps gemäss SHARD_TIERS."""
+    return _TIER_OF.get(entity_type, 0)
+
+
+def _open_part(tier, path, compress):
+    # Teile werden während des Durchlaufs direkt geschrieben: im Speicher nur Zähler, Hash und Datei
+    part = {
+        "tier": tier,
+        "spool_path": path,
+        "entities": 0,
+        "types": {},
+        "bytes": 1,          # unkomprimiert, inkl. "[" und "]"
+        "bytes_sent": 0,     # wie hochgeladen (ggf. gzip)
+        "_file": open(path, "wb"),
+        "_sha": hashlib.sha256(),
+        "_gzip": gzip_compressor() if compress else None
+    }
+    _write_part(part, b"[")
+    return part
+
+
+def _write_part(part, data):
+    if part["_gzip"] is not None:
+        data = part["_gzip"].compress(data)
+    if data:
+        part["_file"].write(data)
+        part["_sha"].update(data)
+        part["bytes_sent"] += len(data)
+
+
+def _close_part(part):
+    _write_part(part, b"]")
+    compressor = part.pop("_gzip")
+    if compressor is not None:
+        tail = compressor.flush()
+        part["_file"].write(tail)
+        part["_sha"].update(tail)
+        part["bytes_sent"] += len(tail)
+    part.pop("_file").close()
+    part["sha256"] = part.pop("_sha").hexdigest()
+
+
+def write_shards(entities, base_name, max_entities=0, max_bytes=0, compress=False):
+    """
+    Teilt Entitäten in Teile auf und schreibt sie gestreamt nach data/uploads/: je Stufe
+    (SHARD_TIERS) in Exportreihenfolge, höchstens max_entities Entitäten bzw. max_bytes Bytes
+    (kompaktes JSON, unkomprimiert) pro Teil. Eine einzelne Entität über max_bytes bildet einen
+    eigenen Teil. Teile mischen keine Stufen.
+
+    Jede Entität wird sofort in die offene Datei ihrer Stufe geschrieben; im Speicher bleiben
+    nur Zähler, Grössen und Prüfsummen. Danach werden die Teile nach Stufe nummeriert
+    (<base_name>-partNNN.json bzw. .json.gz).
+
+    Parameter:
+        entities (iterable): Zu sendende Entitäten (wird einmal durchlaufen)
+        base_name (str): Dateiname ohne Endung
+        max_entities (int): Höchstzahl Entitäten pro Teil (0 = unbegrenzt)
+        max_bytes (int): Höchstgrösse pro Teil in Bytes (0 = unbegrenzt)
+        compress (bool): Teile gzip-komprimiert schreiben
+
+    Rückgabe:
+        list: Teile als dicts {"index", "tier", "file", "spool_path", "entities", "types",
+            "bytes", "bytes_sent", "sha256"} in Upload-Reihenfolge
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    parts = []
+    current = {}  # Stufe → offener Teil
+    seconds = 0.0
+    size = 0
+    try:
+        for ent in entities:
+            started = time.perf_counter()
+            raw = dumps(ent)
+            seconds += time.perf_counter() - started
+            size += len(raw)
+
+            tier = tier_of(ent.get("type"))
+            # "," zwischen den Entitäten bzw. "]" am Ende
+            added = len(raw) + 1
+            part = current.get(tier)
+            if part is not None and ((max_entities and part["entities"] >= max_entities)
+                                     or (max_bytes and part["bytes"] + added > max_bytes)):
+                _close_part(part)
+                part = None
+            if part is None:
+                path = os.path.join(UPLOAD_DIR, f"{base_name}-tier{tier}-{len(parts):04d}.tmp")
+                part = current[tier] = _open_part(tier, path, compress)
+                parts.append(part)
+
+            _write_part(part, b"," + raw if part["entities"] else raw)
+            part["entities"] += 1
+            part["types"][ent.get("type")] = part["types"].get(ent.get("type"), 0) + 1
+            part["bytes"] += added
+        for part in current.values():
+            _close_part(part)
+    except BaseException:
+        # Unvollständige Teile nicht liegen lassen
+        for part in parts:
+            if "_file" in part:
+                part["_file"].close()
+            try:
+                os.remove(part["spool_path"])
+            except FileNotFoundError:
+                pass
+        raise
+    record("serialize", seconds, bytes=size, entities=sum(part["entities"] for part in parts))
+
+    # Nummern in Upload-Reihenfolge: Stufe für Stufe, innerhalb der Stufe in Schreibreihenfolge
+    parts.sort(key=lambda part: part["tier"])
+    for index, part in enumerate(parts, start=1):
+        part["index"] = index
+        part["file"] = with_gzip_suffix(f"{base_name}-part{index:03d}.json", compress)
+        spool_path = os.path.join(UPLOAD_DIR, part["file"])
+        os.replace(part["spool_path"], spool_path)
+        part["spool_path"] = spool_path
+    return parts
+
+
+def _save_manifest(path, manifest):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _set_status(part, status, error, lock, manifest_path, manifest):
+    # Zustand eines Teils ändern und sofort festhalten (Teile einer Stufe laufen parallel)
+    with lock:
+        part["status"] = status
+        if error:
+            part["error"] = error
+        else:
+            part.pop("error", None)
+        _save_manifest(manifest_path, manifest)
+
+
+def _public_manifest(manifest):
+    # Für das Zielsystem: ohne URLs (SAS-Token) und lokale Pfade
+    return {
+        "name": manifest["name"],
+        "created": manifest["created"],
+        "content_encoding": manifest["content_encoding"],
+        "tiers": manifest["tiers"],
+        "parts": [
+            {key: part[key] for key in ("index", "tier", "file", "entities", "bytes", "types", "sha256")}
+            for part in manifest["parts"]
+        ]
+    }
+
+
+def _put(url, headers, data):
+    # Put Blob ist idempotent und darf wiederholt werden
+    response = request("PUT", url, endpoint="blob", headers=headers, data=data)
+    response.raise_for_status()
+
+
+def _upload_part(part, headers, lock, manifest_path, manifest, progress, sent):
+    with open(part["spool_path"], "rb") as f:
+        data = f.read()
+    try:
+        _put(part["url"], headers, data)
+    except Exception as e:
+        _set_status(part, PART_FAILED, str(e), lock, manifest_path, manifest)
+        raise
+
+    _set_status(part, PART_UPLOADED, None, lock, manifest_path, manifest)
+    os.remove(part["spool_path"])
+    with lock:
+        sent[0] += len(data)
+        total = sent[0]
+    if progress is not None:
+        progress("upload_progress", bytes_sent=total, bytes_total=manifest["total_bytes"],
+                 part=part["index"], parts=len(manifest["parts"]))
+
+
+def _headers(env_config, content_encoding):
+    headers = dict(env_config["headers"])
+    if content_encoding:
+        headers["x-ms-blob-content-encoding"] = content_encoding
+    return headers
+
+
+def _upload_from_manifest(manifest_path, manifest, env_config, progress=None, only=None):
+    """
+    Lädt alle noch nicht hochgeladenen Teile Stufe für Stufe hoch (innerhalb einer Stufe parallel)
+    und zuletzt das Teile-Verzeichnis. Schlägt ein Teil fehl, werden die übrigen Teile der Stufe
+    noch beendet, spätere Stufen aber nicht begonnen.
+
+    Rückgabe:
+        list: Fehlgeschlagene Teile
+    """
+    lock = threading.Lock()
+    headers = _headers(env_config, manifest["content_encoding"])
+    workers = env_config.get("upload_shard_workers") or DEFAULT_SHARD_WORKERS
+    sent = [sum(part["bytes_sent"] for part in manifest["parts"] if part["status"] == PART_UPLOADED)]
+    failed = []
+
+    for tier in range(len(manifest["tiers"])):
+        todo = [part for part in manifest["parts"]
+                if part["tier"] == tier and part["status"] != PART_UPLOADED and (only is None or part["index"] in only)]
+        if not todo:
+            continue
+        with ThreadPoolExecutor(max_workers=min(workers, len(todo)), thread_name_prefix="shard-upload") as executor:
+            futures = [(part, executor.submit(_upload_part, part, headers, lock, manifest_path, manifest, progress, sent))
+                       for part in todo]
+            for part, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"[FEHLER] Teil {part['index']} ({part['file']}) fehlgeschlagen: {e}")
+                    failed.append(part)
+        if failed:
+            break
+
+    if not failed and all(part["status"] == PART_UPLOADED for part in manifest["parts"]):
+        body = json.dumps(_public_manifest(manifest), ensure_ascii=False, indent=2).encode("utf-8")
+        _put(manifest["url"], env_config["headers"], body)
+        manifest["committed"] = True
+        _save_manifest(manifest_path, manifest)
+    return failed
+
+
+def upload_sharded(entities, url_template, base_name, env_config, progress=None, content_encoding=None):
+    """
+    Lädt Entitäten als mehrere Importdateien hoch: <base_name>-partNNN.json (bzw. .json.gz) in
+    Abhängigkeitsreihenfolge (SHARD_TIERS) und zuletzt <base_name>.manifest.json mit der Liste
+    der Teile (Stufe, Datei, Anzahl Entitäten je Typ, Bytes, SHA-256).
+
+    Die Teile werden beim Durchlauf über die Entitäten direkt in data/uploads/ geschrieben
+    (siehe write_shards, Speicherbedarf unabhängig von der Grösse) und der Zustand in
+    data/uploads/<base_name>.manifest.json festgehalten; erfolgreich hochgeladene Teile werden
+    lokal gelöscht. Fehlgeschlagene Teile lassen sich mit resend_shards() einzeln erneut senden.
+
+    Parameter:
+        entities (iterable): Zu sendende Entitäten
+        url_template (str): Upload-URL mit Platzhalter "Filename"
+        base_name (str): Dateiname ohne Endung, z. B. <clone_config>-<uuid>
+        env_config (dict): Umgebungskonfiguration (upload_shard_entities, upload_shard_bytes,
+            upload_shard_workers, headers)
+        progress (callable, optional): Callback progress(event, **details), meldet "upload_progress"
+        content_encoding (str, optional): "gzip", um die Teile komprimiert hochzuladen
+
+    Rückgabe:
+        dict: Das Teile-Verzeichnis (inkl. "path" der lokalen Zustandsdatei)
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    manifest_name = f"{base_name}.manifest.json"
+    manifest_path = os.path.join(UPLOAD_DIR, manifest_name)
+
+    parts = write_shards(entities, base_name, env_config.get("upload_shard_entities") or 0,
+                         env_config.get("upload_shard_bytes") or 0, compress=content_encoding == "gzip")
+    for part in parts:
+        part["url"] = url_template.replace("Filename", part["file"])
+        part["status"] = PART_PENDING
+
+    manifest = {
+        "name": base_name,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "content_encoding": content_encoding,
+        "tiers": [list(types) for types in SHARD_TIERS],
+        "url": url_template.replace("Filename", manifest_name),
+        "total_bytes": sum(part["bytes_sent"] for part in parts),
+        "parts": parts,
+        "committed": False
+    }
+    _save_manifest(manifest_path, manifest)
+    print(f"[INFO] Import in {len(parts)} Teile aufgeteilt: {manifest_path}")
+
+    failed = _upload_from_manifest(manifest_path, manifest, env_config, progress)
+    manifest["path"] = manifest_path
+    if failed:
+        raise Exception(f"{len(failed)} von {len(parts)} Teilen nicht hochgeladen (Teile "
+                        f"{', '.join(str(part['index']) for part in failed)}); erneut senden mit "
+                        f"python main.py --resend-shards {manifest_path}")
+    return manifest
+
+
+def resend_shards(manifest_path, env_config, parts=None, progress=None):
+    """
+    Sendet nicht hochgeladene Teile eines aufgeteilten Imports erneut (alle offenen oder nur
+    die angegebenen) und lädt danach das Teile-Verzeichnis hoch, sobald alle Teile vorliegen.
+
+    Parameter:
+        manifest_path (str): Pfad zu data/uploads/<name>.manifest.json
+        env_config (dict): Umgebungskonfiguration
+        parts (iterable, optional): Nummern der Teile (Standard: alle offenen bzw. fehlgeschlagenen)
+        progress (callable, optional): Callback progress(event, **details)
+
+    Rückgabe:
+        list: Weiterhin fehlgeschlagene Teile
+    """
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("committed"):
+        print(f"[INFO] Import {manifest['name']} ist bereits vollständig hochgeladen.")
+        return []
+
+    only = set(parts) if parts else None
+    unknown = (only or set()) - {part["index"] for part in manifest["parts"]}
+    if unknown:
+        raise ValueError(f"Unbekannte Teile: {', '.join(str(i) for i in sorted(unknown))}")
+
+    open_parts = [part["index"] for part in manifest["parts"]
+                  if part["status"] != PART_UPLOADED and (only is None or part["index"] in only)]
+    print(f"[INFO] Sende {len(open_parts)} Teile von {manifest['name']} erneut: {', '.join(map(str, open_parts)) or '-'}")
+
+    failed = _upload_from_manifest(manifest_path, manifest, env_config, progress, only)
+    if failed:
+        print(f"[WARNUNG] Weiterhin fehlgeschlagen: {', '.join(str(part['index']) for part in failed)}")
+    elif manifest.get("committed"):
+        print(f"[SUCCESS] Import {manifest['name']} vollständig hochgeladen.")
+    else:
+        pending = [str(part["index"]) for part in manifest["parts"] if part["status"] != PART_UPLOADED]
+        print(f"[INFO] Noch offene Teile: {', '.join(pending)}")
+    return failed
@@ -1,21 +1,17 @@
-import copy
 import uuid
-import requests
+from utils.http_client import request
+from app.entity_index import EntityIndex, overlay_entity
+from app.entity_model import attribute_value, first_entity, first_value, relations
+from utils.metrics import span
 
 
-def handle_supplier_switch(entities, identifier, supplier_nr, env_config):
+def fetch_supplier(supplier_nr, env_config):
     """
-    Führt den Lieferantenwechsel-Prozess aus:
-    - Holt die ID des neuen Lieferanten
-    - Erstellt neue Relationen zu diesem Lieferanten im Artikel
-    - Klont existierende Lieferantenartikel + zugehörige Trade Items
-    - Verknüpft geklonte Trade Items mit Artikel + neuem Lieferantenartikel
+    Holt ID und Name (axnameeins) des Lieferanten mit der gegebenen Lieferantennummer.
 
     Rückgabe:
-        Liste aller betroffenen Entitäten (Original + neue)
+        tuple: (supplier_id, supplier_name)
     """
-
-    # 1. Neue Lieferanten-ID via API-Call abfragen
     payload = {
         "params": {
             "query": {
@@ -45,131 +41,147 @@ def handle_supplier_switch(entities, identifier, supplier_nr, env_config):
         }
     }
 
-    response = requests.post(env_config["url_get"], json=payload, headers=env_config["headers_get"])
-    response.raise_for_status()
-    data = response.json()
+    with span("mdm_fetch", type="exlieferant") as measured:
+        response = request("POST", env_config["url_get"], endpoint="mdm", json=payload, headers=env_config["headers_get"])
+        response.raise_for_status()
+        measured["bytes"] = len(response.content)
+        data = response.json()
+        measured["entities"] = len(data.get("response", {}).get("entities", []))
 
-    try:
-        supplier_id = data["response"]["entities"][0]["id"]
-    except (KeyError, IndexError):
+    supplier = first_entity(data)
+    supplier_id = supplier.get("id")
+    if not supplier_id:
         raise Exception("Lieferanten-ID konnte nicht gefunden werden.")
-    
-    supplier_name = data["response"]["entities"][0]["data"]["attributes"].get("axnameeins", {}).get("values", [{}])[0].get("value")
 
-    print(f"[INFO] Neue Lieferanten-ID: {supplier_id}")
+    supplier_name = first_value(supplier, "axnameeins")
+    return supplier_id, supplier_name
 
-    # Initiale Daten extrahieren
-    artikel_entity = next((e for e in entities if e.get("type") == "exartikel"), None)
-    alte_lieferantenartikel = [e for e in entities if e.get("type") == "exlieferantenartikel"]
-    alte_tradeitems = [e for e in entities if e.get("type") == "extradeitem"]
 
-    if not artikel_entity:
-        raise Exception("exartikel nicht vorhanden in Konfiguration – erforderlich für Lieferantenwechsel.")
+def handle_supplier_switch(entities, identifier, supplier_nr, env_config):
+    """
+    Führt den Lieferantenwechsel-Prozess aus:
+    - Holt die ID des neuen Lieferanten
+    - Erstellt neue Relationen zu diesem Lieferanten im Artikel
+    - Klont existierende Lieferantenartikel + zugehörige Trade Items
+    - Verknüpft geklonte Trade Items mit Artikel + neuem Lieferantenartikel
 
-    # SAP-ID vom Artikel extrahieren
-    sap_id_value = artikel_entity.get("data", {}).get("attributes", {}).get("axartikelnrsap", {}).get("values", [{}])[0].get("value")
-    article_id = artikel_entity.get("data", {}).get("attributes", {}).get("axidentifier", {}).get("values", [{}])[0].get("value")
-    article_name = artikel_entity.get("data", {}).get("attributes", {}).get("axmdmname", {}).get("values", [{}])[0].get("value")
-
-    # 2. Neue Lieferantenrelation am Artikel setzen
-    artikel_entity = copy.deepcopy(artikel_entity)
-    artikel_entity.setdefault("data", {}).setdefault("relationships", {}).setdefault("relxliefzuart", []).append({
-        "id": "1_0_0",
-        "relTo": {"id": supplier_id, "type": "exlieferant"},
-        "properties": {
-            "direction": "both",
-            "relationshipType": "relxliefzuart"
-        },
-        "attributes": {
-            "arelxregellieferant": {
-                "values": [{
-                    "id": "1_0_0",
-                    "value": False,
-                    "locale": "de-DE"
-                }]
-            }
-        }
-    })
+    Rückgabe:
+        Liste aller betroffenen Entitäten (Original + neue)
+    """
 
-    neue_entities = []
-    artikel_entity["id"] = article_id
-    artikel_entity["name"] = article_name
-
-    for alt_lieferantenartikel in alte_lieferantenartikel:
-        # 3. Neuer Lieferantenartikel
-        neuer_lieferantenartikel = copy.deepcopy(alt_lieferantenartikel)
-        neuer_lieferantenartikel["id"] = f"{sap_id_value}-{supplier_nr}"
-        neuer_lieferantenartikel.pop("name", f"{sap_id_value}-{supplier_name}-{supplier_nr}")
-
-        # Neue Lieferanteninfo setzen
-        attrs = neuer_lieferantenartikel.setdefault("data", {}).setdefault("attributes", {})
-        attrs["axlieferantennr"] = {"values": [{"id": "1_0_0", "value": supplier_nr, "locale": "de-DE", "source": "internal"}]}
-        attrs["axnameeins"] = {"values": [{"id": "1_0_0", "value": supplier_name, "locale": "de-DE", "source": "internal"}]}
-        attrs["axartikelnrsap"] = {"values": [{"id": "1_0_0", "value": sap_id_value, "locale": "de-DE", "source": "internal"}]}
-        attrs["axmdmname"] = {"values": [{"id": "1_0_0", "value": f"{sap_id_value}-{supplier_name}-{supplier_nr}", "locale": "de-DE", "source": "internal"}]}
-        attrs["axidentifier"] = {"values": [{"id": "1_0_0", "value": f"{sap_id_value}-{supplier_nr}", "locale": "de-DE", "source": "internal"}]}
-
-        # Bestehende Lieferanten-Relationen bereinigen
-        neuer_lieferantenartikel.setdefault("data", {}).setdefault("relationships", {})["relxliefzuliefart"] = []
-        
-        # Neue Relation zum Lieferanten
-        neuer_lieferantenartikel.setdefault("data", {}).setdefault("relationships", {}).setdefault("relxliefzuliefart", []).append({
-            "id": "1_0_0",
-            "relTo": {"id": supplier_id, "type": "exlieferant"}
-        })
+    # 1. Neue Lieferanten-ID via API-Call abfragen
+    supplier_id, supplier_name = fetch_supplier(supplier_nr, env_config)
+    print(f"[INFO] Neue Lieferanten-ID: {supplier_id}")
+    return switch_supplier(entities, identifier, supplier_nr, supplier_id, supplier_name)
 
-        # 4. Neue Trade Items klonen
-        neue_tradeitem_ids = []
-        original_tradeitem_ids = alt_lieferantenartikel.get("data", {}).get("relationships", {}).get("relxtradeitemzuliefartikel", [])
 
-        for rel in original_tradeitem_ids:
-            trade_item_id = rel.get("relTo", {}).get("id")
-            if not trade_item_id:
-                continue
+def switch_supplier(entities, identifier, supplier_nr, supplier_id, supplier_name):
+    """
+    Baut die Entitäten für den Lieferantenwechsel zum bereits ermittelten Lieferanten auf.
 
-            original_trade_item = next((t for t in alte_tradeitems if t.get("id") == trade_item_id), None)
-            if not original_trade_item:
-                continue
+    Entitäten werden über einen EntityIndex nachgeschlagen (statt Listen zu durchsuchen) und
+    als Copy-on-write-Klone erzeugt: Nur geänderte Attribute und Relationen werden neu
+    angelegt, alles Übrige teilen die Klone mit den exportierten Entitäten.
 
-            new_trade_item = copy.deepcopy(original_trade_item)
-            new_trade_item["id"] = str(uuid.uuid4())
-            new_trade_item.pop("name", None)
+    Rückgabe:
+        Liste aller betroffenen Entitäten (Original + neue)
+    """
+    index = EntityIndex(entities)
 
-            new_trade_item.setdefault("data", {}).setdefault("relationships", {}).setdefault("relxtradeitemzuart", []).append({
-                "id": "1_0_0",
-                "relTo": {"id": identifier, "type": "exartikel"},
-                "properties": {"relationshipType": "relxtradeitemzuart"}
-            })
-            
-            # Artikelnummer auf neue Trade Item schreiben
-            new_trade_item.setdefault("data", {}).setdefault("attributes", {})["axartikelnrsap"] = {
-                "values": [{"id": "1_0_0", "value": sap_id_value, "locale": "de-DE", "source": "internal"}]
-            }
-            
-            # Lieferanten Name auf neue Trade Item schreiben
-            new_trade_item.setdefault("data", {}).setdefault("attributes", {})["axnameeins"] = {
-                "values": [{"id": "1_0_0", "value": supplier_name, "locale": "de-DE", "source": "internal"}]
-            }
+    # Initiale Daten extrahieren
+    artikel_entity = index.first("exartikel")
+    if not artikel_entity:
+        raise Exception("exartikel nicht vorhanden in Konfiguration – erforderlich für Lieferantenwechsel.")
 
-            # Lieferanten Nummer auf neue Trade Item schreiben
-            new_trade_item.setdefault("data", {}).setdefault("attributes", {})["axlieferantennr"] = {
-                "values": [{"id": "1_0_0", "value": supplier_nr, "locale": "de-DE", "source": "internal"}]
-            }
+    # SAP-ID vom Artikel extrahieren
+    sap_id_value = first_value(artikel_entity, "axartikelnrsap")
+    article_id = first_value(artikel_entity, "axidentifier")
+    article_name = first_value(artikel_entity, "axmdmname")
+
+    neue_entities = []
+    neue_lieferantenartikel_rels = []
 
+    for alt_lieferantenartikel in index.of_type("exlieferantenartikel"):
+        # 3. Neuer Lieferantenartikel (ID ist je Lieferant eindeutig)
+        lieferantenartikel_id = f"{sap_id_value}-{supplier_nr}"
+
+        # 4. Neue Trade Items klonen (Index statt Suche in allen Trade Items)
+        neue_tradeitem_ids = []
+        for original_trade_item in index.related(alt_lieferantenartikel, "relxtradeitemzuliefartikel", "extradeitem"):
+            new_trade_item = overlay_entity(
+                original_trade_item,
+                id=str(uuid.uuid4()),
+                drop=("name",),
+                attributes={
+                    # Artikelnummer, Lieferanten Name und Nummer auf neue Trade Item schreiben
+                    "axartikelnrsap": attribute_value(sap_id_value),
+                    "axnameeins": attribute_value(supplier_name),
+                    "axlieferantennr": attribute_value(supplier_nr)
+                },
+                relationships={
+                    "relxtradeitemzuart": relations(original_trade_item, "relxtradeitemzuart") + [{
+                        "id": "1_0_0",
+                        "relTo": {"id": identifier, "type": "exartikel"},
+                        "properties": {"relationshipType": "relxtradeitemzuart"}
+                    }]
+                }
+            )
             neue_tradeitem_ids.append({"id": "1_0_0", "relTo": {"id": new_trade_item["id"], "type": "extradeitem"}})
             neue_entities.append(new_trade_item)
 
-        # Neue Trade Item Relationen hinzufügen
-        neuer_lieferantenartikel.setdefault("data", {}).setdefault("relationships", {}).setdefault("relxtradeitemzuliefartikel", []).extend(neue_tradeitem_ids)
+        # Neue Lieferanteninfo setzen, bestehende Lieferanten-Relationen durch den neuen Lieferanten ersetzen
+        neuer_lieferantenartikel = overlay_entity(
+            alt_lieferantenartikel,
+            id=lieferantenartikel_id,
+            drop=("name",),
+            attributes={
+                "axlieferantennr": attribute_value(supplier_nr),
+                "axnameeins": attribute_value(supplier_name),
+                "axartikelnrsap": attribute_value(sap_id_value),
+                "axmdmname": attribute_value(f"{sap_id_value}-{supplier_name}-{supplier_nr}"),
+                "axidentifier": attribute_value(lieferantenartikel_id)
+            },
+            relationships={
+                "relxliefzuliefart": [{"id": "1_0_0", "relTo": {"id": supplier_id, "type": "exlieferant"}}],
+                # Neue Trade Item Relationen hinzufügen
+                "relxtradeitemzuliefartikel": relations(alt_lieferantenartikel, "relxtradeitemzuliefartikel") + neue_tradeitem_ids
+            }
+        )
 
         # 5. Neue Relation zum Artikel
-        artikel_entity.setdefault("data", {}).setdefault("relationships", {}).setdefault("relxartikelzulieferantenartikel", []).append({
+        neue_lieferantenartikel_rels.append({
             "id": "1_0_0",
             "relTo": {"id": neuer_lieferantenartikel["id"], "type": "exlieferantenartikel"}
         })
-
         neue_entities.append(neuer_lieferantenartikel)
 
+    # 2. Neue Lieferantenrelation am Artikel setzen (plus Relationen zu den neuen Lieferantenartikeln)
+    artikel_entity = overlay_entity(
+        artikel_entity,
+        id=article_id,
+        name=article_name,
+        relationships={
+            "relxliefzuart": relations(artikel_entity, "relxliefzuart") + [{
+                "id": "1_0_0",
+                "relTo": {"id": supplier_id, "type": "exlieferant"},
+                "properties": {
+                    "direction": "both",
+                    "relationshipType": "relxliefzuart"
+                },
+                "attributes": {
+                    "arelxregellieferant": {
+                        "values": [{
+                            "id": "1_0_0",
+                            "value": False,
+                            "locale": "de-DE"
+                        }]
+                    }
+                }
+            }],
+            "relxartikelzulieferantenartikel": relations(artikel_entity, "relxartikelzulieferantenartikel") + neue_lieferantenartikel_rels
+        }
+    )
+
     # Finaler Output: ursprünglicher Artikel (aktualisiert) + alle neuen Entitäten (Lieferantenartikel & Trade Items)
     result = [artikel_entity] + [e for e in entities if e["type"] not in ["exartikel", "exlieferantenartikel", "extradeitem"]] + neue_entities
-    return result
\ No newline at end of file
+    return result
@@ -0,0 +1,82 @@
+# benchmarks/bench_entity_model.py – Speicherbedarf je Entität: MDM-JSON-dicts gegenüber dem __slots__-Modell
+#
+# Ausführen im Projektverzeichnis:
+#     python -m benchmarks.bench_entity_model
+#     python -m benchmarks.bench_entity_model --articles 500 --conditions 20 --copies 50
+import argparse
+import itertools
+import gc
+import json
+import time
+import tracemalloc
+from app.entity_model import Entity
+from app.id_mapper import clone_copies
+from benchmarks.graph_generator import generate_article_graph, generate_supplier
+
+
+def _footprint(build):
+    """Speicher (Bytes), den das Ergebnis von build() belegt, und die Dauer des Aufbaus."""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speicherbedarf des Entitätsmodells gegenüber JSON-dicts")
+    parser.add_argument("--articles", type=int, default=200, help="Artikel im Batch")
+    parser.add_argument("--supplier-articles", type=int, default=2)
+    parser.add_argument("--trade-items", type=int, default=2)
+    parser.add_argument("--conditions", type=int, default=4)
+    parser.add_argument("--copies", type=int, default=100, help="Kopien eines Artikels (clone_copies)")
+    args = parser.parse_args()
+
+    supplier = generate_supplier("S-BENCH", "900001")
+    graph = []
+    for i in range(args.articles):
+        graph.extend(generate_article_graph(str(1000000 + i), args.supplier_articles, args.trade_items,
+                                            args.conditions, suppliers=[supplier["id"]], seed=i))
+    # Wie aus response.json(): jede Antwort erzeugt eigene Strings (auch für locale/source)
+    raw = json.dumps(graph, ensure_ascii=False).encode("utf-8")
+    del graph
+    count = len(json.loads(raw))
+
+    dicts, dict_size, dict_time = _footprint(lambda: json.loads(raw))
+    entities, model_size, model_time = _footprint(lambda: [Entity.from_mdm(ent) for ent in json.loads(raw)])
+
+    # Verlustfrei: to_mdm() muss die ursprünglichen JSON-Objekte ergeben
+    started = time.perf_counter()
+    restored = [ent.to_mdm() for ent in entities]
+    back_time = time.perf_counter() - started
+    assert restored == dicts, "Rundreise Entity ↔ MDM-JSON nicht verlustfrei"
+
+    print(f"{count} Entitäten aus {args.articles} Artikeln ({len(raw) / 1024:.0f} KiB JSON kompakt)")
+    print(f"{'JSON-dicts (response.json)':30s} {dict_size / 1024 / 1024:8.1f} MiB  {dict_size / count:8.0f} B/Entität  "
+          f"Parsen {dict_time * 1000:7.1f} ms")
+    print(f"{'Entity (__slots__, interniert)':30s} {model_size / 1024 / 1024:8.1f} MiB  {model_size / count:8.0f} B/Entität  "
+          f"Parsen + Aufbau {model_time * 1000:7.1f} ms")
+    print(f"{'Ersparnis':30s} {(1 - model_size / dict_size) * 100:7.1f} %   "
+          f"to_mdm() {back_time * 1000:7.1f} ms, Rundreise verlustfrei")
+
+    # clone_copies: alle Kopien bleiben bis zum Upload im Speicher (CompactEntities statt Liste von dicts)
+    numbers = itertools.count(9000000)
+    article = generate_article_graph("1000000", args.supplier_articles, args.trade_items, args.conditions,
+                                     suppliers=[supplier["id"]], seed=0)
+    (copies, _), store_size, store_time = _footprint(lambda: clone_copies(
+        article, "1000000", args.copies, lambda identifier, count: [str(next(numbers)) for _ in range(count)]))
+    as_dicts, list_size, _ = _footprint(lambda: list(copies))
+    print(f"\nclone_copies: {args.copies} Kopien, {len(copies)} Entitäten")
+    print(f"{'als Liste von dicts':30s} {list_size / 1024 / 1024:8.1f} MiB  {list_size / len(copies):8.0f} B/Entität")
+    print(f"{'als CompactEntities':30s} {store_size / 1024 / 1024:8.1f} MiB  {store_size / len(copies):8.0f} B/Entität  "
+          f"Klonen {store_time * 1000:7.1f} ms")
+    print(f"{'Ersparnis':30s} {(1 - store_size / list_size) * 100:7.1f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_id_mapper.py – Skalierung der ID-Umschreibung auf synthetischen Klon-Graphen
+#
+# Ausführen im Projektverzeichnis:
+#     python -m benchmarks.bench_id_mapper
+import itertools
+import time
+from app.id_mapper import assign_new_ids_and_update_relations
+
+# Kinder pro Artikel: (Typ, Relation zum Artikel, Anzahl)
+CHILDREN = (
+    ("exlieferantenartikel", "relxtradeitemzuliefartikel", 3),
+    ("extradeitem", "relxtradeitemzuart", 3),
+    ("exeinkaufskond", "relxexeinkaufskondzuexartikel", 2),
+    ("exverkaufskond", "relxexverkaufskondzuexartikel", 2)
+)
+ENTITIES_PER_ROOT = 1 + sum(count for _, _, count in CHILDREN)
+
+
+def _value(value):
+    return {"values": [{"id": "1_0_0", "value": value, "locale": "de-DE", "source": "internal"}]}
+
+
+def make_graph(entity_count):
+    """Erzeugt einen Graphen mit Artikeln, Kindern (Relationen auf den Artikel) und axidentifier-Verweisen."""
+    entities = []
+    for r in range(max(1, entity_count // ENTITIES_PER_ROOT)):
+        root_id = f"{1000000 + r}"
+        supplier_article_ids = []
+        children = []
+        for typ, rel, count in CHILDREN:
+            for c in range(count):
+                child_id = f"{typ}-{r}-{c}"
+                if typ == "exlieferantenartikel":
+                    supplier_article_ids.append(child_id)
+                children.append({
+                    "id": child_id,
+                    "name": child_id,
+                    "type": typ,
+                    "data": {
+                        "attributes": {"axidentifier": _value(root_id), "axnameeins": _value(f"Name {c}")},
+                        "relationships": {rel: [{"relTo": {"id": root_id, "type": "exartikel"}}]}
+                    }
+                })
+        entities.append({
+            "id": root_id,
+            "name": root_id,
+            "type": "exartikel",
+            "data": {
+                "attributes": {"axartikelnrsap": _value(root_id), "axartikelkurztext": _value("Artikel")},
+                "relationships": {
+                    "relxartikelzulieferantenartikel": [
+                        {"relTo": {"id": i, "type": "exlieferantenartikel"}, "attributes": {"axidentifier": _value(i)}}
+                        for i in supplier_article_ids
+                    ]
+                }
+            }
+        })
+        entities.extend(children)
+    return entities
+
+
+def main(sizes=(10_000, 20_000, 40_000, 80_000)):
+    counter = itertools.count(5000000)
+    allocate = lambda identifier: str(next(counter))  # Ohne SAP/MDM: nur die Umschreibung wird gemessen
+
+    for size in sizes:
+        entities = make_graph(size)
+        start = time.perf_counter()
+        cloned, id_map, _ = assign_new_ids_and_update_relations(entities, entities[0]["id"], allocate)
+        elapsed = time.perf_counter() - start
+
+        # Kein Verweis darf mehr auf eine alte ID zeigen
+        old_ids = {old for ids in id_map.values() for old in ids}
+        stale = sum(
+            rel["relTo"]["id"] in old_ids
+            for ent in cloned for rels in ent["data"]["relationships"].values() for rel in rels
+        )
+        print(f"{len(cloned):7d} Entitäten  {elapsed * 1000:8.1f} ms  {elapsed / len(cloned) * 1e6:6.2f} µs/Entität  "
+              f"Artikel: {len(id_map['exartikel']):5d}  alte Verweise: {stale}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_payload_templates.py – Kosten pro Payload: kompiliertes Template vs. dump/replace/reparse
+#
+# Ausführen im Projektverzeichnis:
+#     python -m benchmarks.bench_payload_templates
+import json
+import timeit
+from utils.helpers import load_and_customize_payload, load_json
+
+TEMPLATE_PATH = "payloads/template.json"
+CONFIG_PATH = "config/clone/exartikel_ArtikelKomplett.json"
+
+
+def legacy_load_and_customize_payload(template_path, entity_type, artikelnummer, attributes, relationships, relationship_attributes):
+    """Bisheriges Verfahren: Datei lesen, dumps, Textersetzung, loads (zum Vergleich)."""
+    with open(template_path, "r", encoding="utf-8") as f:
+        template = json.load(f)
+
+    json_str = json.dumps(template)
+    json_str = json_str.replace("REPLACE_ENTITY", entity_type)
+    json_str = json_str.replace("REPLACE_ARTNR", artikelnummer)
+    json_str = json_str.replace('"REPLACE_ATTRIBUTES"', json.dumps(attributes))
+    json_str = json_str.replace('"REPLACE_RELATIONSHIPS"', json.dumps(relationships))
+    json_str = json_str.replace('"REPLACE_RELATIONSHIPATTR"', json.dumps(relationship_attributes))
+
+    return json.loads(json_str)
+
+
+def main(number=5000):
+    cfg = load_json(CONFIG_PATH)["entity_configs"][0]
+    args = (TEMPLATE_PATH, cfg["typ"], "1008276", cfg["attributes"], cfg["relationships"], cfg["relationship_attributes"])
+
+    # Beide Varianten müssen für normale Identifier dasselbe Ergebnis liefern
+    assert legacy_load_and_customize_payload(*args) == load_and_customize_payload(*args)
+
+    results = {}
+    for name, func in (("legacy (dump/replace/reparse)", legacy_load_and_customize_payload),
+                       ("compiled template", load_and_customize_payload)):
+        seconds = min(timeit.repeat(lambda: func(*args), number=number, repeat=3))
+        results[name] = seconds / number * 1e6
+        print(f"{name:32s} {results[name]:8.1f} µs/Payload")
+
+    legacy, compiled = results.values()
+    print(f"{'Faktor':32s} {legacy / compiled:8.1f}x")
+
+    # Identifier mit Anführungszeichen/Backslash: bisher kaputtes JSON, jetzt korrekt eingesetzt
+    tricky = 'A"12\\3'
+    try:
+        legacy_load_and_customize_payload(TEMPLATE_PATH, "exartikel", tricky, [], [], [])
+        print("legacy mit Sonderzeichen:        ok")
+    except json.JSONDecodeError as e:
+        print(f"legacy mit Sonderzeichen:        Fehler ({e.msg})")
+    payload = load_and_customize_payload(TEMPLATE_PATH, "exartikel", tricky, [], [], [])
+    value = payload["params"]["query"]["filters"]["attributesCriterion"][0]["axartikelnrsap"]["exacts"]
+    print(f"compiled mit Sonderzeichen:      {'ok' if value == tricky else 'falsch'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/bench_serialization.py – Grösse und Dauer der Serialisierung (eingerückt, kompakt, orjson, gzip)
+#
+# Ausführen im Projektverzeichnis:
+#     python -m benchmarks.bench_serialization
+#     python -m benchmarks.bench_serialization --articles 50 --conditions 40
+import argparse
+import gzip
+import json
+import time
+from benchmarks.graph_generator import generate_article_graph, generate_supplier
+from utils.serialization import DEFAULT_GZIP_LEVEL, gzip_chunks, orjson
+
+
+def _json_pretty(entities):
+    return json.dumps(entities, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def _json_compact(entities):
+    return json.dumps(entities, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _variants():
+    """(Name, Serialisierung, gzip-Stufe oder None) – jeweils das ganze JSON-Array."""
+    variants = [
+        ("json indent=2 (bisher)", _json_pretty, None),
+        ("json kompakt", _json_compact, None)
+    ]
+    if orjson is not None:
+        variants.append(("orjson kompakt", orjson.dumps, None))
+    fastest = orjson.dumps if orjson is not None else _json_compact
+    for level in (1, DEFAULT_GZIP_LEVEL, 9):
+        variants.append((f"kompakt + gzip {level}", fastest, level))
+    return variants
+
+
+def _measure(entities, serialize, level, repeat):
+    best = None
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        data = serialize(entities)
+        if level is not None:
+            data = b"".join(gzip_chunks([data], level))
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        size = len(data)
+    return size, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vergleich der JSON-Serialisierung für Upload und lokale Kopien")
+    parser.add_argument("--articles", type=int, default=20, help="Anzahl Artikelgraphen")
+    parser.add_argument("--supplier-articles", type=int, default=2)
+    parser.add_argument("--trade-items", type=int, default=2)
+    parser.add_argument("--conditions", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=5, help="Wiederholungen (bester Lauf zählt)")
+    args = parser.parse_args()
+
+    supplier = generate_supplier("S-BENCH", "900001")
+    entities = []
+    for i in range(args.articles):
+        entities.extend(generate_article_graph(str(1000000 + i), args.supplier_articles, args.trade_items,
+                                               args.conditions, suppliers=[supplier], seed=i))
+
+    # Alle Varianten müssen dieselben Daten abbilden
+    reference = json.loads(_json_compact(entities))
+    for name, serialize, level in _variants():
+        data = serialize(entities)
+        assert json.loads(data) == reference, name
+        if level is not None:
+            assert json.loads(gzip.decompress(b"".join(gzip_chunks([data], level)))) == reference, name
+
+    print(f"{len(entities)} Entitäten aus {args.articles} Artikeln")
+    baseline = None
+    for name, serialize, level in _variants():
+        size, seconds = _measure(entities, serialize, level, args.repeat)
+        baseline = baseline or (size, seconds)
+        print(f"{name:26s} {size / 1024:10.1f} KiB ({size / baseline[0] * 100:5.1f} %)  "
+              f"{seconds * 1000:8.2f} ms ({seconds / baseline[1] * 100:6.1f} %)  "
+              f"{size / len(entities):8.0f} B/Entität")
+
+
+if __name__ == "__main__":
+    main()
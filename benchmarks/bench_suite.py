@@ -0,0 +1,234 @@
+# benchmarks/bench_suite.py – End-to-End-Szenarien (Einzelklon, Lieferantenwechsel, Batch) gegen den lokalen Stand-in
+#
+# Ausführen im Projektverzeichnis (kein MDM, SAP oder Blob Storage nötig):
+#     python -m benchmarks.bench_suite
+#     python -m benchmarks.bench_suite --mdm 0.02,0 --sap 0.05,0.05 --output data/bench/latest.json
+#     python -m benchmarks.bench_suite --baseline data/bench/latest.json   # Exit-Code 1 bei Regression
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from app.batch_runner import DEFAULT_STAGE_WORKERS, _percentile, run_batch
+from app.clone_runner import run_clone_process
+from app.export_cache import configure_export_cache
+from benchmarks.graph_generator import collect_fields, generate_supplier
+from benchmarks.stand_in import SERVICES, parse_profile, seed_articles, stand_in_env, start_stand_in
+from utils.config_registry import get_clone_config
+from utils.env_config import get_env_config
+from utils.metrics import get_metrics, reset_metrics
+from utils.serialization import get_backend
+
+SCENARIOS = ("single_clone", "graph_clone", "supplier_switch", "supplier_switch_delta", "batch", "batch_pipeline")
+SINGLE_SCENARIOS = ("single_clone", "graph_clone", "supplier_switch", "supplier_switch_delta")
+SWITCH_SCENARIOS = ("supplier_switch", "supplier_switch_delta")
+CLONE_CONFIG = "exartikel_ArtikelKomplett"
+SWITCH_CONFIG = "exartikel_Lieferantenwechsel"
+SUPPLIER_ID = "S-BENCH"
+SUPPLIER_NR = "900001"
+# Zulässige Verschlechterung gegenüber der Baseline (Anteil, p50 und p95)
+DEFAULT_TOLERANCE = 0.2
+
+
+def _serialization_stats(operations, env_config):
+    # Serialisierte und tatsächlich hochgeladene Bytes (ggf. gzip) sowie Serialisierungszeit je Artikel
+    totals = {"serialize": [0.0, 0], "upload": [0.0, 0]}
+    for row in get_metrics():
+        if row["span"] in totals:
+            totals[row["span"]][0] += row["seconds"]
+            totals[row["span"]][1] += row["bytes"]
+    per_op = max(operations, 1)
+    return {
+        "backend": get_backend(),
+        "upload_gzip": env_config.get("upload_gzip", False),
+        "serialize_ms_per_op": round(totals["serialize"][0] / per_op * 1000, 2),
+        "serialized_bytes_per_op": totals["serialize"][1] // per_op,
+        "upload_bytes_per_op": totals["upload"][1] // per_op
+    }
+
+
+def _summarize(name, latencies, elapsed, operations, calls, serialization):
+    latencies = sorted(latencies)
+    return {
+        "scenario": name,
+        "runs": len(latencies),
+        "operations": operations,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(operations / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 50) * 1000, 1),
+            "p95": round(_percentile(latencies, 95) * 1000, 1),
+            "p99": round(_percentile(latencies, 99) * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0
+        },
+        "http_calls_per_op": {service: round(count / operations, 1) if operations else 0.0
+                              for service, count in calls.items()},
+        "serialization": serialization
+    }
+
+
+def _calls_since(server, before):
+    return {service: server.calls[service] - before[service] for service in SERVICES}
+
+
+def run_scenario(name, server, identifiers, data_dir, runs, batch_size, workers):
+    """
+    Führt ein Szenario aus und misst die Latenz je Lauf.
+
+    - single_clone: run_clone_process mit Klon-Modus (IDs, SAP-Nummer, Upload)
+    - graph_clone: wie single_clone mit fetch_strategy "graph"; exverkaufskond ist über keine
+      Relation erreichbar und läuft daher über den Identifier-Fallback – fehlt danach ein
+      konfigurierter Typ, bricht das Szenario ab
+    - supplier_switch: run_clone_process mit Lieferantenwechsel
+    - supplier_switch_delta: Lieferantenwechsel mit Delta-Upload (nur Änderungen)
+    - batch / batch_pipeline: run_batch über batch_size Artikel (Thread-Pool bzw. Stufen-Pipeline);
+      Latenz = Dauer des ganzen Batches, Durchsatz = Artikel pro Sekunde
+
+    Returns:
+        dict: Ergebnis mit Perzentilen, Durchsatz, HTTP-Aufrufen sowie Bytes und
+            Serialisierungszeit je Operation
+    """
+    os.makedirs(os.path.join(data_dir, name), exist_ok=True)
+    env_config = get_env_config()
+    sync_config = get_clone_config(SWITCH_CONFIG if name in SWITCH_SCENARIOS else CLONE_CONFIG)
+    sync_config["save_local_copy"] = False
+    sync_config["upload_delta"] = name == "supplier_switch_delta"
+    if name == "graph_clone":
+        sync_config["fetch_strategy"] = "graph"
+    before = dict(server.calls)
+    reset_metrics()
+    latencies = []
+    operations = 0
+
+    started = time.perf_counter()
+    for run in range(runs):
+        run_started = time.perf_counter()
+        if name in SINGLE_SCENARIOS:
+            identifier = identifiers[run % len(identifiers)]
+            supplier_nr = SUPPLIER_NR if name in SWITCH_SCENARIOS else None
+            fetched = {}
+            run_clone_process(identifier, sync_config, env_config, "payloads/template.json",
+                              os.path.join(data_dir, name), supplier_nr=supplier_nr,
+                              progress=lambda event, **details: fetched.update(
+                                  {details["typ"]: details["entity_count"]} if event == "type_fetched" else {}))
+            empty = [cfg["typ"] for cfg in sync_config["entity_configs"] if not fetched.get(cfg["typ"])]
+            if empty:
+                raise RuntimeError(f"{identifier}: keine Entitäten für {', '.join(empty)} geladen")
+            operations += 1
+        else:
+            items = [{"identifier": identifier, "supplier_nr": None} for identifier in identifiers[:batch_size]]
+            stage_workers = DEFAULT_STAGE_WORKERS if name == "batch_pipeline" else None
+            summary = run_batch(items, sync_config, env_config, "payloads/template.json", data_dir,
+                                os.path.join(data_dir, f"{name}-{run}.jsonl"), workers=workers,
+                                stage_workers=stage_workers)
+            if summary["failed"]:
+                raise RuntimeError(f"{summary['failed']} Artikel im Batch fehlgeschlagen")
+            operations += summary["ok"]
+        latencies.append(time.perf_counter() - run_started)
+    elapsed = time.perf_counter() - started
+
+    return _summarize(name, latencies, elapsed, operations, _calls_since(server, before),
+                      _serialization_stats(operations, env_config))
+
+
+def compare_with_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Vergleicht p50/p95 und Durchsatz mit einer früheren Ergebnisdatei.
+
+    Returns:
+        list: Meldungen zu Szenarien, die mehr als tolerance schlechter sind
+    """
+    previous = {r["scenario"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        old = previous.get(result["scenario"])
+        if not old:
+            continue
+        for pct in ("p50", "p95"):
+            before, now = old["latency_ms"][pct], result["latency_ms"][pct]
+            if before and now > before * (1 + tolerance):
+                regressions.append(f"{result['scenario']}: {pct} {before} ms → {now} ms")
+        before, now = old["throughput_per_s"], result["throughput_per_s"]
+        if before and now < before * (1 - tolerance):
+            regressions.append(f"{result['scenario']}: Durchsatz {before}/s → {now}/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark-Suite gegen den lokalen MDM/SAP/Blob-Stand-in")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Kommagetrennt aus {', '.join(SCENARIOS)}")
+    parser.add_argument("--runs", type=int, default=20, help="Läufe je Einzel-Szenario (Batch: runs // 10, mind. 1)")
+    parser.add_argument("--articles", type=int, default=20, help="Artikel im Stand-in bzw. pro Batch")
+    parser.add_argument("--workers", type=int, default=4, help="Worker im Batch-Szenario")
+    parser.add_argument("--supplier-articles", type=int, default=2, help="Lieferantenartikel pro Artikel (N)")
+    parser.add_argument("--trade-items", type=int, default=2, help="Trade Items pro Lieferantenartikel (M)")
+    parser.add_argument("--conditions", type=int, default=4, help="Einkaufs- und Verkaufskonditionen pro Artikel (K)")
+    for service in SERVICES:
+        parser.add_argument(f"--{service}", default="0,0", help=f"Latenz (s) und Fehlerquote für {service}, z. B. 0.02,0.01")
+    parser.add_argument("--output", help="Ergebnisse als JSON schreiben")
+    parser.add_argument("--baseline", help="Frühere Ergebnisdatei zum Vergleich (Exit-Code 1 bei Regression)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Zulässige Verschlechterung (0.2 = 20 %%)")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unbekannte Szenarien: {', '.join(sorted(unknown))}")
+
+    profiles = {service: parse_profile(getattr(args, service)) for service in SERVICES}
+    server, base_url = start_stand_in(profiles=profiles)
+    server.mdm.add([generate_supplier(SUPPLIER_ID, SUPPLIER_NR)])
+    identifiers = seed_articles(server, args.articles, supplier_articles=args.supplier_articles,
+                                trade_items=args.trade_items, conditions=args.conditions)
+    entity_count = sum(len(entities) for entities in server.mdm.by_type.values())
+    field_count = sum(len(f["attributes"]) for f in collect_fields().values())
+
+    with tempfile.TemporaryDirectory(prefix="mdm-bench-") as data_dir:
+        # Die App liest URLs und Caches aus der Umgebung: auf den Stand-in und ein Wegwerf-Verzeichnis zeigen
+        os.environ.update(stand_in_env(base_url))
+        os.environ["REFERENCE_CACHE_PATH"] = os.path.join(data_dir, "reference_cache.json")
+        # Die Szenarien klonen dieselben Artikel wiederholt – gemessen werden sollen die MDM-Abfragen
+        configure_export_cache(enabled=False)
+
+        print(f"[INFO] Stand-in {base_url}: {len(identifiers)} Artikel, {entity_count} Entitäten, "
+              f"{field_count} Attribute aus config/clone")
+        results = []
+        for name in scenarios:
+            runs = args.runs if name in SINGLE_SCENARIOS else max(1, args.runs // 10)
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = run_scenario(name, server, identifiers, data_dir, runs, args.articles, args.workers)
+            results.append(result)
+            lat = result["latency_ms"]
+            calls = " ".join(f"{k}={v}" for k, v in result["http_calls_per_op"].items())
+            print(f"{name:22s} {result['runs']:4d} Läufe | p50 {lat['p50']:8.1f} ms | p95 {lat['p95']:8.1f} ms | "
+                  f"p99 {lat['p99']:8.1f} ms | {result['throughput_per_s']:8.2f} Artikel/s | HTTP/Artikel: {calls}")
+            ser = result["serialization"]
+            print(f"{'':22s} {ser['backend']:>10s} | serialisiert {ser['serialized_bytes_per_op'] / 1024:8.1f} KiB "
+                  f"in {ser['serialize_ms_per_op']:6.2f} ms | hochgeladen {ser['upload_bytes_per_op'] / 1024:8.1f} KiB"
+                  f"{' (gzip)' if ser['upload_gzip'] else ''} je Artikel")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"[INFO] Ergebnisse gespeichert: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_with_baseline(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"[WARNUNG] Regression {message}")
+        if regressions:
+            raise SystemExit(1)
+        print("[INFO] Keine Regression gegenüber der Baseline.")
+
+
+if __name__ == "__main__":
+    main()
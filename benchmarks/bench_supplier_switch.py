@@ -0,0 +1,223 @@
+# benchmarks/bench_supplier_switch.py – Lieferantenwechsel: Index + Copy-on-write vs. Listensuche + deepcopy
+#
+# Ausführen im Projektverzeichnis:
+#     python -m benchmarks.bench_supplier_switch
+import copy
+import gc
+import itertools
+import json
+import time
+import uuid
+from app.supplier_switch import switch_supplier
+
+SUPPLIER_ID = "lieferant-neu"
+SUPPLIER_NR = "70001"
+SUPPLIER_NAME = "Neuer Lieferant AG"
+
+
+def _value(value):
+    return {"values": [{"id": "1_0_0", "value": value, "locale": "de-DE", "source": "internal"}]}
+
+
+def make_article(trade_item_count, supplier_article_count=2, attribute_count=40):
+    """Artikel mit Lieferantenartikeln und je trade_item_count Trade Items (mit vielen Attributen)."""
+    def attributes(prefix):
+        return {f"ax{prefix}{i}": _value(f"Wert {i}") for i in range(attribute_count)}
+
+    entities = [{
+        "id": "1008276",
+        "name": "1008276",
+        "type": "exartikel",
+        "data": {
+            "attributes": {**attributes("art"), "axartikelnrsap": _value("1008276"),
+                           "axidentifier": _value("1008276"), "axmdmname": _value("Artikel")},
+            "relationships": {"relxliefzuart": [{"id": "1_0_0", "relTo": {"id": "lieferant-alt", "type": "exlieferant"}}]}
+        }
+    }]
+    for s in range(supplier_article_count):
+        trade_item_ids = [f"ti-{s}-{t}" for t in range(trade_item_count)]
+        entities.append({
+            "id": f"la-{s}",
+            "name": f"la-{s}",
+            "type": "exlieferantenartikel",
+            "data": {
+                "attributes": attributes("la"),
+                "relationships": {
+                    "relxliefzuliefart": [{"id": "1_0_0", "relTo": {"id": "lieferant-alt", "type": "exlieferant"}}],
+                    "relxtradeitemzuliefartikel": [{"id": "1_0_0", "relTo": {"id": i, "type": "extradeitem"}} for i in trade_item_ids]
+                }
+            }
+        })
+        entities.extend({
+            "id": i,
+            "name": i,
+            "type": "extradeitem",
+            "data": {
+                "attributes": attributes("ti"),
+                "relationships": {"relxtradeitemzuart": [{"id": "1_0_0", "relTo": {"id": "1008276", "type": "exartikel"}}]}
+            }
+        } for i in trade_item_ids)
+    return entities
+
+
+def legacy_switch_supplier(entities, identifier, supplier_nr, supplier_id, supplier_name):
+    """Bisheriges Verfahren: Listensuche je Trade Item und deepcopy aller Klone (zum Vergleich)."""
+    # Initiale Daten extrahieren
+    artikel_entity = next((e for e in entities if e.get("type") == "exartikel"), None)
+    alte_lieferantenartikel = [e for e in entities if e.get("type") == "exlieferantenartikel"]
+    alte_tradeitems = [e for e in entities if e.get("type") == "extradeitem"]
+
+    if not artikel_entity:
+        raise Exception("exartikel nicht vorhanden in Konfiguration – erforderlich für Lieferantenwechsel.")
+
+    # SAP-ID vom Artikel extrahieren
+    sap_id_value = artikel_entity.get("data", {}).get("attributes", {}).get("axartikelnrsap", {}).get("values", [{}])[0].get("value")
+    article_id = artikel_entity.get("data", {}).get("attributes", {}).get("axidentifier", {}).get("values", [{}])[0].get("value")
+    article_name = artikel_entity.get("data", {}).get("attributes", {}).get("axmdmname", {}).get("values", [{}])[0].get("value")
+
+    # 2. Neue Lieferantenrelation am Artikel setzen
+    artikel_entity = copy.deepcopy(artikel_entity)
+    artikel_entity.setdefault("data", {}).setdefault("relationships", {}).setdefault("relxliefzuart", []).append({
+        "id": "1_0_0",
+        "relTo": {"id": supplier_id, "type": "exlieferant"},
+        "properties": {
+            "direction": "both",
+            "relationshipType": "relxliefzuart"
+        },
+        "attributes": {
+            "arelxregellieferant": {
+                "values": [{
+                    "id": "1_0_0",
+                    "value": False,
+                    "locale": "de-DE"
+                }]
+            }
+        }
+    })
+
+    neue_entities = []
+    artikel_entity["id"] = article_id
+    artikel_entity["name"] = article_name
+
+    for alt_lieferantenartikel in alte_lieferantenartikel:
+        # 3. Neuer Lieferantenartikel
+        neuer_lieferantenartikel = copy.deepcopy(alt_lieferantenartikel)
+        neuer_lieferantenartikel["id"] = f"{sap_id_value}-{supplier_nr}"
+        neuer_lieferantenartikel.pop("name", f"{sap_id_value}-{supplier_name}-{supplier_nr}")
+
+        # Neue Lieferanteninfo setzen
+        attrs = neuer_lieferantenartikel.setdefault("data", {}).setdefault("attributes", {})
+        attrs["axlieferantennr"] = {"values": [{"id": "1_0_0", "value": supplier_nr, "locale": "de-DE", "source": "internal"}]}
+        attrs["axnameeins"] = {"values": [{"id": "1_0_0", "value": supplier_name, "locale": "de-DE", "source": "internal"}]}
+        attrs["axartikelnrsap"] = {"values": [{"id": "1_0_0", "value": sap_id_value, "locale": "de-DE", "source": "internal"}]}
+        attrs["axmdmname"] = {"values": [{"id": "1_0_0", "value": f"{sap_id_value}-{supplier_name}-{supplier_nr}", "locale": "de-DE", "source": "internal"}]}
+        attrs["axidentifier"] = {"values": [{"id": "1_0_0", "value": f"{sap_id_value}-{supplier_nr}", "locale": "de-DE", "source": "internal"}]}
+
+        # Bestehende Lieferanten-Relationen bereinigen
+        neuer_lieferantenartikel.setdefault("data", {}).setdefault("relationships", {})["relxliefzuliefart"] = []
+        
+        # Neue Relation zum Lieferanten
+        neuer_lieferantenartikel.setdefault("data", {}).setdefault("relationships", {}).setdefault("relxliefzuliefart", []).append({
+            "id": "1_0_0",
+            "relTo": {"id": supplier_id, "type": "exlieferant"}
+        })
+
+        # 4. Neue Trade Items klonen
+        neue_tradeitem_ids = []
+        original_tradeitem_ids = alt_lieferantenartikel.get("data", {}).get("relationships", {}).get("relxtradeitemzuliefartikel", [])
+
+        for rel in original_tradeitem_ids:
+            trade_item_id = rel.get("relTo", {}).get("id")
+            if not trade_item_id:
+                continue
+
+            original_trade_item = next((t for t in alte_tradeitems if t.get("id") == trade_item_id), None)
+            if not original_trade_item:
+                continue
+
+            new_trade_item = copy.deepcopy(original_trade_item)
+            new_trade_item["id"] = str(uuid.uuid4())
+            new_trade_item.pop("name", None)
+
+            new_trade_item.setdefault("data", {}).setdefault("relationships", {}).setdefault("relxtradeitemzuart", []).append({
+                "id": "1_0_0",
+                "relTo": {"id": identifier, "type": "exartikel"},
+                "properties": {"relationshipType": "relxtradeitemzuart"}
+            })
+            
+            # Artikelnummer auf neue Trade Item schreiben
+            new_trade_item.setdefault("data", {}).setdefault("attributes", {})["axartikelnrsap"] = {
+                "values": [{"id": "1_0_0", "value": sap_id_value, "locale": "de-DE", "source": "internal"}]
+            }
+            
+            # Lieferanten Name auf neue Trade Item schreiben
+            new_trade_item.setdefault("data", {}).setdefault("attributes", {})["axnameeins"] = {
+                "values": [{"id": "1_0_0", "value": supplier_name, "locale": "de-DE", "source": "internal"}]
+            }
+
+            # Lieferanten Nummer auf neue Trade Item schreiben
+            new_trade_item.setdefault("data", {}).setdefault("attributes", {})["axlieferantennr"] = {
+                "values": [{"id": "1_0_0", "value": supplier_nr, "locale": "de-DE", "source": "internal"}]
+            }
+
+            neue_tradeitem_ids.append({"id": "1_0_0", "relTo": {"id": new_trade_item["id"], "type": "extradeitem"}})
+            neue_entities.append(new_trade_item)
+
+        # Neue Trade Item Relationen hinzufügen
+        neuer_lieferantenartikel.setdefault("data", {}).setdefault("relationships", {}).setdefault("relxtradeitemzuliefartikel", []).extend(neue_tradeitem_ids)
+
+        # 5. Neue Relation zum Artikel
+        artikel_entity.setdefault("data", {}).setdefault("relationships", {}).setdefault("relxartikelzulieferantenartikel", []).append({
+            "id": "1_0_0",
+            "relTo": {"id": neuer_lieferantenartikel["id"], "type": "exlieferantenartikel"}
+        })
+
+        neue_entities.append(neuer_lieferantenartikel)
+
+    # Finaler Output: ursprünglicher Artikel (aktualisiert) + alle neuen Entitäten (Lieferantenartikel & Trade Items)
+    result = [artikel_entity] + [e for e in entities if e["type"] not in ["exartikel", "exlieferantenartikel", "extradeitem"]] + neue_entities
+    return result
+
+def _without_generated_ids(entities):
+    # Zufällige Trade-Item-IDs durch fortlaufende Nummern ersetzen, damit beide Ergebnisse vergleichbar sind
+    text = json.dumps(entities, sort_keys=True)
+    counter = itertools.count()
+    generated = {}
+    for ent in entities:
+        if ent["type"] == "extradeitem" and ent["id"] not in generated and not ent["id"].startswith("ti-"):
+            generated[ent["id"]] = f"neu-{next(counter)}"
+    for old, new in generated.items():
+        text = text.replace(old, new)
+    return text
+
+
+def _timed(func, *args, repeat=3):
+    # Bestes von mehreren Läufen, ohne Garbage Collection während der Messung
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            result = func(*args)
+            elapsed = (time.perf_counter() - start) * 1000
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main(sizes=(50, 200, 500, 1000)):
+    args = ("1008276", SUPPLIER_NR, SUPPLIER_ID, SUPPLIER_NAME)
+    for size in sizes:
+        entities = make_article(size)
+        legacy, legacy_ms = _timed(legacy_switch_supplier, entities, *args)
+        result, indexed_ms = _timed(switch_supplier, entities, *args)
+
+        same = _without_generated_ids(legacy) == _without_generated_ids(result)
+        print(f"{size:5d} Trade Items/Lieferantenartikel  legacy {legacy_ms:8.1f} ms  "
+              f"Index+COW {indexed_ms:7.1f} ms  Faktor {legacy_ms / indexed_ms:6.1f}x  gleiches Ergebnis: {same}")
+
+
+if __name__ == "__main__":
+    main()
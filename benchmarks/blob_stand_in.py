@@ -0,0 +1,169 @@
+# benchmarks/blob_stand_in.py – Lokaler Ersatz für Azure Blob Storage (Put Blob / Put Block / Put Block List)
+#
+# Start als eigenständiger Server:
+#     python -m benchmarks.blob_stand_in --port 10000 --fail-rate 0.1
+# und dann z. B. API_URL_UPLOAD=http://127.0.0.1:10000/container/Filename setzen.
+import argparse
+import base64
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from xml.etree import ElementTree
+
+
+class BlobStandInHandler(BaseHTTPRequestHandler):
+    """Emuliert die von der App genutzten Blob-Operationen im Speicher."""
+
+    protocol_version = "HTTP/1.1"
+    # Header und Body werden getrennt geschrieben: ohne TCP_NODELAY kostet jede Antwort
+    # auf einer Keep-Alive-Verbindung bis zu 40 ms (Nagle + verzögertes ACK)
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = bytearray()
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return bytes(body)
+                body += self.rfile.read(size)
+                self.rfile.readline()
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _reply(self, status, body=b"", content_type="application/xml"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject(self):
+        """Simulierte Latenz und zufällige Fehler (503) gemäss Server-Einstellungen."""
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        return random.random() < self.server.fail_rate
+
+    def do_PUT(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        chunked = "Content-Length" not in self.headers
+        body = self._read_body()
+        comp = query.get("comp", [None])[0]
+
+        if chunked:
+            # Wie Azure: Put Blob / Put Block verlangen Content-Length (kein Transfer-Encoding: chunked)
+            return self._reply(411, b"<Error><Code>MissingContentLengthHeader</Code></Error>")
+
+        if self._inject():
+            self.server.stats["injected_errors"] += 1
+            return self._reply(503, b"<Error><Code>ServerBusy</Code></Error>")
+
+        with self.server.lock:
+            if comp == "block":
+                md5 = self.headers.get("Content-MD5")
+                if md5 and base64.b64decode(md5) != hashlib.md5(body).digest():
+                    return self._reply(400, b"<Error><Code>Md5Mismatch</Code></Error>")
+                self.server.staged.setdefault(parts.path, {})[query["blockid"][0]] = body
+                self.server.stats["blocks"] += 1
+                return self._reply(201)
+
+            if comp == "blocklist":
+                staged = self.server.staged.get(parts.path, {})
+                committed = self.server.committed_blocks.get(parts.path, {})
+                blocks = {}
+                for element in ElementTree.fromstring(body):
+                    block_id = element.text
+                    source = committed if element.tag == "Committed" else staged
+                    if block_id not in source and element.tag == "Latest":
+                        source = committed
+                    if block_id not in source:
+                        return self._reply(400, b"<Error><Code>InvalidBlockList</Code></Error>")
+                    blocks[block_id] = source[block_id]
+                order = [element.text for element in ElementTree.fromstring(body)]
+                self.server.blobs[parts.path] = b"".join(blocks[block_id] for block_id in order)
+                self.server.committed_blocks[parts.path] = blocks
+                self.server.staged.pop(parts.path, None)
+                self.server.stats["commits"] += 1
+                return self._reply(201)
+
+            # Put Blob: ganze Datei in einem Request
+            self.server.blobs[parts.path] = body
+            self.server.stats["put_blobs"] += 1
+            return self._reply(201)
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+
+        with self.server.lock:
+            if query.get("comp", [None])[0] == "blocklist":
+                staged = self.server.staged.get(parts.path)
+                committed = self.server.committed_blocks.get(parts.path)
+                if staged is None and committed is None:
+                    return self._reply(404, b"<Error><Code>BlobNotFound</Code></Error>")
+                list_type = query.get("blocklisttype", ["committed"])[0]
+                xml = ["<?xml version=\"1.0\" encoding=\"utf-8\"?><BlockList>"]
+                if list_type in ("committed", "all"):
+                    xml.append("<CommittedBlocks>")
+                    xml.extend(f"<Block><Name>{n}</Name><Size>{len(d)}</Size></Block>" for n, d in (committed or {}).items())
+                    xml.append("</CommittedBlocks>")
+                if list_type in ("uncommitted", "all"):
+                    xml.append("<UncommittedBlocks>")
+                    xml.extend(f"<Block><Name>{n}</Name><Size>{len(d)}</Size></Block>" for n, d in (staged or {}).items())
+                    xml.append("</UncommittedBlocks>")
+                xml.append("</BlockList>")
+                return self._reply(200, "".join(xml).encode("utf-8"))
+
+            blob = self.server.blobs.get(parts.path)
+            if blob is None:
+                return self._reply(404, b"<Error><Code>BlobNotFound</Code></Error>")
+            return self._reply(200, blob, content_type="application/json")
+
+
+def init_blob_store(server, latency=0.0, fail_rate=0.0):
+    """Legt den In-Memory-Speicher und die Fehler-/Latenz-Einstellungen am Server an."""
+    server.lock = threading.Lock()
+    server.blobs = {}
+    server.staged = {}
+    server.committed_blocks = {}
+    server.latency = latency
+    server.fail_rate = fail_rate
+    server.stats = {"put_blobs": 0, "blocks": 0, "commits": 0, "injected_errors": 0}
+
+
+def start_blob_stand_in(port=0, latency=0.0, fail_rate=0.0):
+    """
+    Startet den Stand-in in einem Hintergrund-Thread.
+
+    Args:
+        port (int): Port (0 = frei wählen)
+        latency (float): Zusätzliche Latenz pro Request in Sekunden
+        fail_rate (float): Anteil der Schreib-Requests, die mit 503 beantwortet werden
+
+    Returns:
+        tuple: (server, base_url) – base_url z. B. http://127.0.0.1:12345
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), BlobStandInHandler)
+    init_blob_store(server, latency, fail_rate)
+    threading.Thread(target=server.serve_forever, daemon=True, name="blob-stand-in").start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokaler Blob-Storage-Stand-in")
+    parser.add_argument("--port", type=int, default=10000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latenz pro Request in Sekunden")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Anteil Schreib-Requests mit 503")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), BlobStandInHandler)
+    init_blob_store(server, args.latency, args.fail_rate)
+    print(f"[INFO] Blob-Stand-in läuft auf http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,155 @@
+# benchmarks/graph_generator.py – Synthetische Artikelgraphen auf Basis der Feldlisten in config/clone
+#
+# Beispiel:
+#     from benchmarks.graph_generator import generate_article_graph
+#     entities = generate_article_graph("1008276", supplier_articles=3, trade_items=4, conditions=20)
+import random
+from utils.config_registry import find_clone_configs, get_clone_config
+
+ROOT_TYPE = "exartikel"
+SUPPLIER_TYPE = "exlieferant"
+# Zieltyp je Relation (wie im MDM-Datenmodell)
+REL_TARGETS = {
+    "relxliefzuart": SUPPLIER_TYPE,
+    "relxartikelzulieferantenartikel": "exlieferantenartikel",
+    "relxexeinkaufskondzuexartikel": ROOT_TYPE,
+    "relxexlieferantenartikelzuexeinkaufskond": "exeinkaufskond",
+    "relxliefzuliefart": SUPPLIER_TYPE,
+    "relxtradeitemzuliefartikel": "extradeitem",
+    "relxtradeitemzuart": ROOT_TYPE,
+    "relxexverkaufskondzuexartikel": ROOT_TYPE
+}
+# Attribute mit festem Inhalt (Filter, Nummernkreis-Ermittlung, Lieferantenwechsel)
+ARTIKELART = "ZHAW"
+
+
+def collect_fields():
+    """
+    Vereinigt die Feldlisten aller gültigen Clone-Konfigurationen je Entitätstyp,
+    damit die generierten Entitäten jede Konfiguration vollständig abdecken.
+
+    Returns:
+        dict: typ → {"attributes": [...], "relationships": [...], "relationship_attributes": [...]}
+    """
+    fields = {}
+    for entry in find_clone_configs():
+        for cfg in get_clone_config(entry["filename"])["entity_configs"]:
+            target = fields.setdefault(cfg["typ"], {"attributes": [], "relationships": [], "relationship_attributes": []})
+            for key in target:
+                target[key].extend(v for v in cfg[key] if v not in target[key])
+    return fields
+
+
+def _value(value):
+    return {"values": [{"id": "1_0_0", "value": value, "locale": "de-DE", "source": "internal"}]}
+
+
+def _relation(target_id, target_type, rel_name, rel_attributes=()):
+    rel = {
+        "id": "1_0_0",
+        "relTo": {"id": target_id, "type": target_type},
+        "properties": {"relationshipType": rel_name}
+    }
+    if rel_attributes:
+        rel["attributes"] = {name: _value(False) for name in rel_attributes}
+    return rel
+
+
+class _Builder:
+    def __init__(self, identifier, fields, rng):
+        self.identifier = identifier
+        self.fields = fields
+        self.rng = rng
+
+    def entity(self, typ, entity_id, relationships, **fixed):
+        attributes = {}
+        for name in self.fields.get(typ, {}).get("attributes", ()):
+            attributes[name] = _value(f"{name}-{self.rng.randrange(10 ** 6)}")
+        attributes.update({name: _value(value) for name, value in fixed.items()})
+        attributes["axartikelnrsap"] = _value(self.identifier)
+        attributes["axidentifier"] = _value(entity_id)
+        rel_attributes = self.fields.get(typ, {}).get("relationship_attributes", ())
+        return {
+            "id": entity_id,
+            "name": f"{typ}-{entity_id}",
+            "type": typ,
+            "data": {
+                "attributes": attributes,
+                "relationships": {
+                    rel_name: [_relation(target_id, REL_TARGETS[rel_name], rel_name, rel_attributes) for target_id in targets]
+                    for rel_name, targets in relationships.items()
+                }
+            }
+        }
+
+
+def generate_article_graph(identifier, supplier_articles=2, trade_items=2, conditions=4, suppliers=None,
+                           fields=None, seed=0):
+    """
+    Erzeugt den Entitätsgraphen eines Artikels, wie ihn der MDM-Export liefert.
+
+    Aufbau (Relationen gemäss REL_TARGETS):
+    - 1 exartikel (Identifier = axartikelnrsap)
+    - supplier_articles exlieferantenartikel, je mit trade_items extradeitem
+    - conditions Einkaufskonditionen (reihum auf die Lieferantenartikel verteilt) und
+      conditions Verkaufskonditionen
+
+    Alle in config/clone konfigurierten Attribute werden mit synthetischen Werten befüllt.
+
+    Args:
+        identifier (str): SAP-Artikelnummer (axartikelnrsap aller Entitäten)
+        supplier_articles (int): Anzahl Lieferantenartikel (N)
+        trade_items (int): Trade Items pro Lieferantenartikel (M)
+        conditions (int): Anzahl Einkaufs- und Verkaufskonditionen (K)
+        suppliers (list, optional): IDs der Lieferanten (Standard: einer pro Lieferantenartikel)
+        fields (dict, optional): Feldlisten je Typ (Standard: collect_fields())
+        seed (int): Startwert für die Zufallswerte (gleicher Seed = gleicher Graph)
+
+    Returns:
+        list: Entitäten im MDM-Format
+    """
+    rng = random.Random(f"{seed}-{identifier}")
+    build = _Builder(identifier, fields if fields is not None else collect_fields(), rng)
+    suppliers = suppliers or [f"L{i:04d}" for i in range(max(1, supplier_articles))]
+
+    supplier_article_ids = [f"{identifier}-LA{i}" for i in range(supplier_articles)]
+    purchase_ids = [f"{identifier}-EK{i}" for i in range(conditions)]
+    sales_ids = [f"{identifier}-VK{i}" for i in range(conditions)]
+
+    entities = [build.entity(ROOT_TYPE, identifier, {
+        "relxliefzuart": suppliers[:max(1, supplier_articles)],
+        "relxartikelzulieferantenartikel": supplier_article_ids
+    }, axartikelartsap=ARTIKELART, axmdmname=f"Artikel {identifier}")]
+
+    for i, supplier_article_id in enumerate(supplier_article_ids):
+        trade_item_ids = [f"{supplier_article_id}-TI{j}" for j in range(trade_items)]
+        entities.append(build.entity("exlieferantenartikel", supplier_article_id, {
+            "relxexlieferantenartikelzuexeinkaufskond": purchase_ids[i::supplier_articles],
+            "relxliefzuliefart": [suppliers[i % len(suppliers)]],
+            "relxtradeitemzuliefartikel": trade_item_ids
+        }))
+        for trade_item_id in trade_item_ids:
+            entities.append(build.entity("extradeitem", trade_item_id, {"relxtradeitemzuart": [identifier]}))
+
+    for purchase_id in purchase_ids:
+        entities.append(build.entity("exeinkaufskond", purchase_id, {"relxexeinkaufskondzuexartikel": [identifier]}))
+    for sales_id in sales_ids:
+        entities.append(build.entity("exverkaufskond", sales_id, {"relxexverkaufskondzuexartikel": [identifier]}))
+    return entities
+
+
+def generate_supplier(supplier_id, supplier_nr, name=None):
+    """Lieferant (exlieferant) für die Lieferantenabfrage des Lieferantenwechsels."""
+    return {
+        "id": supplier_id,
+        "name": name or f"Lieferant {supplier_nr}",
+        "type": SUPPLIER_TYPE,
+        "data": {
+            "attributes": {
+                "axlieferantennr": _value(supplier_nr),
+                "axnameeins": _value(name or f"Lieferant {supplier_nr}"),
+                "axmdmname": _value(name or f"Lieferant {supplier_nr}")
+            },
+            "relationships": {}
+        }
+    }
@@ -0,0 +1,252 @@
+# benchmarks/stand_in.py – Lokaler Ersatz für MDM-Get-API, SAP (Token / Artikelnummer) und Blob Storage
+#
+# Start als eigenständiger Server (mit 20 generierten Artikeln 1000000…1000019):
+#     python -m benchmarks.stand_in --port 10001 --articles 20 --mdm 0.05,0.01
+# und dann z. B. setzen:
+#     API_URL_GET=http://127.0.0.1:10001/mdm/get
+#     API_URL_UPLOAD=http://127.0.0.1:10001/container/Filename
+#     SAP_TOKEN_URL=http://127.0.0.1:10001/sap/token
+#     SAP_ID_URL_TEMPLATE=http://127.0.0.1:10001/sap/id/{nummernkreis}
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from urllib.parse import urlsplit
+from benchmarks.blob_stand_in import BlobStandInHandler, init_blob_store
+from benchmarks.graph_generator import ARTIKELART, collect_fields, generate_article_graph, generate_supplier
+
+# Pfade der emulierten Endpunkte
+MDM_PATH = "/mdm/get"
+SAP_TOKEN_PATH = "/sap/token"
+SAP_ID_PREFIX = "/sap/id/"
+# Nummernkreis der generierten Artikelart
+NUMMERNKREIS = "01"
+SERVICES = ("mdm", "sap", "blob")
+
+
+class MdmStore:
+    """
+    Entitäten des Stand-ins, indiziert nach (Typ, ID) und – beim ersten Filter auf ein
+    Attribut – nach (Typ, Attribut, Wert).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.by_type = {}
+        self._attribute_index = {}
+
+    def add(self, entities):
+        with self.lock:
+            for ent in entities:
+                self.by_type.setdefault(ent["type"], {})[ent["id"]] = ent
+            self._attribute_index = {}
+
+    def clear(self):
+        with self.lock:
+            self.by_type = {}
+            self._attribute_index = {}
+
+    def _index(self, typ, attribute):
+        key = (typ, attribute)
+        index = self._attribute_index.get(key)
+        if index is None:
+            index = {}
+            for ent in self.by_type.get(typ, {}).values():
+                for value in ent["data"]["attributes"].get(attribute, {}).get("values", []):
+                    index.setdefault(value.get("value"), []).append(ent)
+            self._attribute_index[key] = index
+        return index
+
+    def query(self, query):
+        """Wertet ids, typesCriterion und attributesCriterion (exacts) einer Abfrage aus."""
+        filters = query.get("filters", {})
+        types = filters.get("typesCriterion") or list(self.by_type)
+        with self.lock:
+            if "ids" in query:
+                return [self.by_type.get(typ, {})[i] for typ in types for i in query["ids"]
+                        if i in self.by_type.get(typ, {})]
+            result = None
+            for typ in types:
+                matches = list(self.by_type.get(typ, {}).values())
+                for criterion in filters.get("attributesCriterion", []):
+                    for attribute, condition in criterion.items():
+                        exacts = condition.get("exacts")
+                        exacts = exacts if isinstance(exacts, list) else [exacts]
+                        index = self._index(typ, attribute)
+                        allowed = {id(ent) for value in exacts for ent in index.get(value, [])}
+                        matches = [ent for ent in matches if id(ent) in allowed]
+                result = (result or []) + matches
+            return result or []
+
+
+def _project(ent, fields):
+    # Wie MDM: nur angefragte Attribute und Relationen zurückgeben
+    attributes = fields.get("attributes")
+    relationships = fields.get("relationships")
+    data = ent["data"]
+    return {
+        **{k: v for k, v in ent.items() if k != "data"},
+        "data": {
+            "attributes": {k: v for k, v in data["attributes"].items() if attributes is None or k in attributes},
+            "relationships": {k: v for k, v in data.get("relationships", {}).items()
+                              if relationships is not None and k in relationships}
+        }
+    }
+
+
+class StandInHandler(BlobStandInHandler):
+    """Emuliert MDM-Get (POST /mdm/get), SAP (GET /sap/token, GET /sap/id/<nummernkreis>) und Blob (PUT/GET)."""
+
+    def _inject(self, service="blob"):
+        """Simulierte Latenz und zufällige Fehler (503) gemäss Einstellungen des Dienstes."""
+        latency, fail_rate = self.server.profiles[service]
+        if latency:
+            time.sleep(latency)
+        with self.server.lock:
+            self.server.calls[service] += 1
+        return random.random() < fail_rate
+
+    def _reject(self, body=b"", content_type="text/plain"):
+        with self.server.lock:
+            self.server.stats["injected_errors"] += 1
+        return self._reply(503, body, content_type=content_type)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        if urlsplit(self.path).path != MDM_PATH:
+            return self._reply(404, b"{}", content_type="application/json")
+        if self._inject("mdm"):
+            return self._reject(b'{"response":{"status":"error"}}', content_type="application/json")
+
+        params = body.get("params", {})
+        entities = self.server.mdm.query(params.get("query", {}))
+        total = len(entities)
+        options = params.get("options", {})
+        if "maxRecords" in options:
+            start = int(options.get("from", 0))
+            entities = entities[start:start + int(options["maxRecords"])]
+        fields = params.get("fields", {})
+        response = {
+            "response": {
+                "status": "success",
+                "entities": [_project(ent, fields) for ent in entities],
+                "totalRecords": total
+            }
+        }
+        self._reply(200, json.dumps(response, ensure_ascii=False).encode("utf-8"), content_type="application/json")
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == SAP_TOKEN_PATH:
+            if self._inject("sap"):
+                return self._reject()
+            token = f"token-{next(self.server.token_counter)}"
+            with self.server.lock:
+                self.server.tokens.add(token)
+            body = json.dumps({"access_token": token, "expires_in": self.server.token_ttl}).encode("utf-8")
+            return self._reply(200, body, content_type="application/json")
+
+        if path.startswith(SAP_ID_PREFIX):
+            auth = self.headers.get("Authorization", "")
+            if auth[len("Bearer "):] not in self.server.tokens:
+                return self._reply(401, b"", content_type="text/plain")
+            if self._inject("sap"):
+                return self._reject()
+            number = next(self.server.sap_counter)
+            return self._reply(200, f"{number:014d}".encode("ascii"), content_type="text/plain")
+
+        super().do_GET()
+
+
+def init_stand_in(server, profiles=None, token_ttl=3600, first_sap_id=9000000):
+    """Legt MDM-Daten, SAP-Zähler, Blob-Speicher und die Latenz-/Fehlerprofile am Server an."""
+    init_blob_store(server)
+    server.profiles = {service: (0.0, 0.0) for service in SERVICES}
+    server.profiles.update(profiles or {})
+    server.calls = {service: 0 for service in SERVICES}
+    server.mdm = MdmStore()
+    server.tokens = set()
+    server.token_ttl = token_ttl
+    server.token_counter = itertools.count(1)
+    server.sap_counter = itertools.count(first_sap_id)
+    # Referenzdaten für die SAP-Nummernvergabe (Artikelart → Nummernkreis)
+    server.mdm.add([{
+        "id": f"ref-{ARTIKELART}",
+        "name": ARTIKELART,
+        "type": "refxartikelartsap",
+        "data": {"attributes": {
+            "value": {"values": [{"value": ARTIKELART}]},
+            "arefxnummernkreis": {"values": [{"value": NUMMERNKREIS}]}
+        }, "relationships": {}}
+    }])
+
+
+def start_stand_in(port=0, profiles=None, token_ttl=3600):
+    """
+    Startet den Stand-in in einem Hintergrund-Thread.
+
+    Args:
+        port (int): Port (0 = frei wählen)
+        profiles (dict, optional): Dienst ("mdm", "sap", "blob") → (Latenz in Sekunden, Fehlerquote)
+        token_ttl (int): Gültigkeit der SAP-Tokens (expires_in)
+
+    Returns:
+        tuple: (server, base_url) – Entitäten über server.mdm.add(...) hinzufügen
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandInHandler)
+    init_stand_in(server, profiles, token_ttl)
+    threading.Thread(target=server.serve_forever, daemon=True, name="stand-in").start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def stand_in_env(base_url):
+    """Umgebungsvariablen, mit denen die App gegen den Stand-in läuft."""
+    return {
+        "API_URL_GET": f"{base_url}{MDM_PATH}",
+        "API_URL_UPLOAD": f"{base_url}/container/Filename",
+        "SAP_TOKEN_URL": f"{base_url}{SAP_TOKEN_PATH}",
+        "SAP_TOKEN_AUTH": "Basic c3RhbmQtaW46c3RhbmQtaW4=",
+        "SAP_ID_URL_TEMPLATE": f"{base_url}{SAP_ID_PREFIX}{{nummernkreis}}"
+    }
+
+
+def seed_articles(server, count, first_identifier=1000000, supplier_articles=2, trade_items=2, conditions=4):
+    """Legt count generierte Artikel (fortlaufende Identifier) im Stand-in an."""
+    fields = collect_fields()
+    identifiers = []
+    for n in range(count):
+        identifier = str(first_identifier + n)
+        server.mdm.add(generate_article_graph(identifier, supplier_articles, trade_items, conditions, fields=fields))
+        identifiers.append(identifier)
+    return identifiers
+
+
+def parse_profile(value):
+    """Liest "Latenz,Fehlerquote" (z. B. "0.05,0.01") als Tupel (float, float)."""
+    latency, _, fail_rate = value.partition(",")
+    return float(latency or 0), float(fail_rate or 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokaler MDM/SAP/Blob-Stand-in")
+    parser.add_argument("--port", type=int, default=10001)
+    parser.add_argument("--articles", type=int, default=10, help="Anzahl generierter Artikel")
+    parser.add_argument("--supplier-articles", type=int, default=2)
+    parser.add_argument("--trade-items", type=int, default=2)
+    parser.add_argument("--conditions", type=int, default=4)
+    for service in SERVICES:
+        parser.add_argument(f"--{service}", default="0,0", help=f"Latenz (s) und Fehlerquote für {service}, z. B. 0.05,0.01")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), StandInHandler)
+    init_stand_in(server, {service: parse_profile(getattr(args, service)) for service in SERVICES})
+    server.mdm.add([generate_supplier("S-BENCH", "900001")])
+    identifiers = seed_articles(server, args.articles, supplier_articles=args.supplier_articles,
+                                trade_items=args.trade_items, conditions=args.conditions)
+    print(f"[INFO] Stand-in läuft auf http://127.0.0.1:{args.port} ({identifiers[0]}…{identifiers[-1]}, Lieferant 900001)")
+    for key, value in stand_in_env(f"http://127.0.0.1:{args.port}").items():
+        print(f"  {key}={value}")
+    server.serve_forever()
@@ -1,82 +1,275 @@
 # main.py – Einstiegspunkt der MDM Clone App
 
 import argparse
+import atexit
 import os
 from dotenv import load_dotenv
-from utils.helpers import load_json
 from utils.env_config import get_env_config
-from app.clone_runner import run_clone_process
+from app.clone_api import DATA_DIR, TEMPLATE_PATH, build_entity_link, load_clone_config, run_clone
+from app.batch_runner import read_manifest, run_batch, print_batch_summary, parse_stage_workers
+from app.pipeline import DEFAULT_QUEUE_SIZE
+from utils.reference_cache import clear_reference_cache
+from app.sap_id_pool import configure_sap_id_pool
+from app.blob_upload import resume_block_upload
+from app.shard_upload import resend_shards
+from app.export_cache import configure_export_cache, get_export_cache_stats
 from utils.logging_config import configure_logging
-import logging
+from utils.metrics import METRICS_DIR, start_run, finish_run, format_profile, format_summary
+from utils.http_client import get_http_stats
 
 # --- Logging konfigurieren ---
 # Initialisiert das Logging mit einheitlichem Format (wird aus utils geladen)
-# configure_logging()
+configure_logging()
 
 # --- Kommandozeilenargumente definieren und parsen ---
 parser = argparse.ArgumentParser(description="MDM Clone App")
 parser.add_argument(
     "--clone",
     dest="clone_config",
-    required=True,
-    help="Name der Clone-Konfiguration (z. B. exartikel_STANDARD)"
+    required=False,
+    help="Name der Clone-Konfiguration (z. B. exartikel_STANDARD; nicht nötig für --resume-upload / --resend-shards)"
 )
-parser.add_argument(
+source_group = parser.add_mutually_exclusive_group(required=True)
+source_group.add_argument(
     "--articlenr",
     dest="articlenr",
-    required=True,
     help="Artikelnummer oder Identifier zur Verarbeitung"
 )
+source_group.add_argument(
+    "--manifest",
+    dest="manifest",
+    help="CSV-Datei mit vielen Artikelnummern (Batch-Modus, eine pro Zeile, optional 2. Spalte Lieferantennummer)"
+)
+source_group.add_argument(
+    "--resend-shards",
+    dest="resend_shards",
+    help="Nicht hochgeladene Teile eines aufgeteilten Imports erneut senden (Pfad zu data/uploads/<name>.manifest.json)"
+)
+source_group.add_argument(
+    "--resume-upload",
+    dest="resume_upload",
+    help="Abgebrochenen Block-Upload fortsetzen (Pfad zu data/uploads/<datei>.state.json)"
+)
+parser.add_argument(
+    "--shard",
+    dest="shards",
+    type=int,
+    action="append",
+    help="(Mit --resend-shards) Nur diesen Teil erneut senden (mehrfach angebbar)"
+)
 parser.add_argument(
     "--supplier",
     dest="supplier",
     required=False,
     help="(Optional) Neue Lieferantennummer für Lieferantenwechsel-Prozess"
 )
+parser.add_argument(
+    "--delta",
+    dest="delta",
+    action="store_true",
+    help="(Lieferantenwechsel) Nur geänderte Attribute und neue Relationen hochladen (Delta-Upload)"
+)
+parser.add_argument(
+    "--copies",
+    dest="copies",
+    type=int,
+    required=False,
+    help="(Klon) Anzahl Kopien aus einem Export: SAP-Nummern gemeinsam vergeben, alle Kopien in einem Upload"
+)
+parser.add_argument(
+    "--workers",
+    dest="workers",
+    type=int,
+    default=4,
+    help="(Batch) Anzahl parallel verarbeiteter Artikel (Standard: 4)"
+)
+parser.add_argument(
+    "--pipeline",
+    dest="pipeline",
+    action="store_true",
+    help="(Batch) Laden, ID-/SAP-Vergabe und Upload als überlappende Stufen ausführen (statt --workers)"
+)
+parser.add_argument(
+    "--stage-workers",
+    dest="stage_workers",
+    required=False,
+    help="(Batch, Pipeline) Worker je Stufe, z. B. fetch=3,transform=1,upload=2 (aktiviert --pipeline)"
+)
+parser.add_argument(
+    "--pipeline-queue",
+    dest="pipeline_queue",
+    type=int,
+    default=DEFAULT_QUEUE_SIZE,
+    help=f"(Batch, Pipeline) Plätze in der Warteschlange vor jeder Stufe (Standard: {DEFAULT_QUEUE_SIZE})"
+)
+parser.add_argument(
+    "--journal",
+    dest="journal",
+    required=False,
+    help="(Batch) Pfad zum Lauf-Journal (Standard: data/batch_journal.jsonl)"
+)
+parser.add_argument(
+    "--resume",
+    dest="resume",
+    action="store_true",
+    help="(Batch) Bereits abgeschlossene Artikel aus dem Journal überspringen"
+)
+parser.add_argument(
+    "--retry-unconfirmed",
+    dest="retry_unconfirmed",
+    action="store_true",
+    help="(Batch, mit --resume) Artikel mit vergebener SAP-Nummer, aber unbestätigtem Abschluss neu klonen"
+)
+parser.add_argument(
+    "--sap-id-pool",
+    dest="sap_id_pool",
+    type=int,
+    required=False,
+    help="Anzahl SAP-Artikelnummern, die pro Nummernkreis im Voraus reserviert werden (0 = aus)"
+)
+parser.add_argument(
+    "--refresh-reference-cache",
+    dest="refresh_reference_cache",
+    action="store_true",
+    help="Gecachte MDM-Referenzwerte (z. B. Artikelart → Nummernkreis) vor dem Lauf verwerfen"
+)
+parser.add_argument(
+    "--no-cache",
+    dest="no_cache",
+    action="store_true",
+    help="Lokalen Export-Cache nicht verwenden (alle Quell-Entitäten neu aus MDM laden)"
+)
+parser.add_argument(
+    "--metrics-dir",
+    dest="metrics_dir",
+    default=METRICS_DIR,
+    help=f"Ordner für Messwerte des Laufs (JSON-Zeilen je Schritt und Prometheus-Textfile, Standard: {METRICS_DIR})"
+)
+parser.add_argument(
+    "--profile",
+    dest="profile",
+    action="store_true",
+    help="CPU-Profil der Transformationsschritte (Lieferantenwechsel, ID-Vergabe) aufzeichnen"
+)
 args = parser.parse_args()
+if not (args.resume_upload or args.resend_shards) and not args.clone_config:
+    parser.error("--clone ist erforderlich")
+if args.copies is not None and args.copies < 1:
+    parser.error("--copies muss mindestens 1 sein")
+if args.copies and args.supplier:
+    parser.error("--copies ist nur ohne --supplier (Klon-Modus) möglich")
 
 # --- Umgebungsvariablen laden (.env Datei) ---
 # Ermöglicht Zugriff auf API-URLs, Tokens etc. über os.getenv(...)
 load_dotenv()
 
-# --- Konstanten und Pfade definieren ---
-CLONE_DIR = "config/clone"             # Pfad zu den Clone-Konfigurationen
-DATA_DIR = "data"                      # Speicherort für JSON-Daten
-TEMPLATE_PATH = "payloads/template.json"  # Template für API-Requests
+# --- Messlauf starten: Dauer, Bytes und Entitäten je Schritt (MDM-Abfragen, SAP, Umschreiben, Upload) ---
+run_id = start_run(args.metrics_dir, profile=args.profile)
+
+
+def report_metrics():
+    """Schreibt die Messwerte des Laufs und gibt eine Zusammenfassung aus (auch bei Abbruch)."""
+    http = get_http_stats()
+    cache = get_export_cache_stats()
+    extra = {f"http_{key}": value for key, value in http.items()}
+    extra.update({f"export_cache_{key}": value for key, value in cache.items()})
+    paths = finish_run(extra=extra)
+    summary = format_summary()
+    if summary:
+        print("\n[INFO] Messwerte je Schritt:")
+        print(summary)
+    if cache["hits"] or cache["misses"]:
+        print(f"[INFO] Export-Cache: {cache['hits']} Treffer, {cache['misses']} Abfragen "
+              f"(davon {cache['expired']} abgelaufen, {cache['stale']} geändert) – Trefferquote {cache['hit_rate']:.0%}")
+    if paths:
+        print(f"[INFO] Messwerte: {paths['log']} | {paths['prometheus']}")
+    if paths.get("profile"):
+        print(f"[INFO] CPU-Profil: {paths['profile']}")
+        print(format_profile(paths["profile"]))
+
+
+atexit.register(report_metrics)
 
-# --- Konfigurationsdateien laden ---
-# Lade die gewählte Clone-Konfiguration
-sync_config_path = os.path.join(CLONE_DIR, f"{args.clone_config}.json")
-sync_config = load_json(sync_config_path)
+# --- Referenz-Cache bei Bedarf leeren (wird beim nächsten Zugriff neu aus MDM geladen) ---
+if args.refresh_reference_cache:
+    clear_reference_cache()
+    print("[INFO] Referenz-Cache wurde geleert.")
 
-# Merke den technischen Namen der Konfiguration (für Upload-Filenamen)
-sync_config["clone_config"] = args.clone_config
+# --- Export-Cache umgehen (überschreibt EXPORT_CACHE) ---
+if args.no_cache:
+    configure_export_cache(enabled=False)
 
-# Umgebungskonfiguration laden (API-URLs, Header)
-env_config = get_env_config()
+# --- Abgebrochenen Block-Upload fortsetzen (kein Export/Klon) ---
+if args.resume_upload:
+    if not os.path.exists(args.resume_upload):
+        parser.error(f"Zustandsdatei {args.resume_upload} nicht gefunden (Upload bereits abgeschlossen oder falscher Pfad)")
+    resume_block_upload(args.resume_upload, get_env_config())
+    raise SystemExit(0)
 
-# Artikelnummer/Identifier über Argument
-identifier = args.articlenr
-supplier_nr = args.supplier
+# --- Fehlgeschlagene Teile eines aufgeteilten Imports erneut senden ---
+if args.resend_shards:
+    try:
+        failed = resend_shards(args.resend_shards, get_env_config(), parts=args.shards)
+    except ValueError as e:
+        parser.error(str(e))
+    raise SystemExit(1 if failed else 0)
+
+# --- SAP-Nummern-Pool (überschreibt SAP_ID_POOL_SIZE) ---
+if args.sap_id_pool is not None:
+    configure_sap_id_pool(args.sap_id_pool)
+
+# --- Batch-Modus: viele Artikel in einem Prozess ---
+if args.manifest:
+    # Konfiguration und Umgebung nur einmal für alle Artikel laden
+    sync_config = load_clone_config(args.clone_config)
+    if args.delta:
+        sync_config["upload_delta"] = True
+    if args.copies:
+        sync_config["copies"] = args.copies
+    env_config = get_env_config()
+
+    stage_workers = None
+    if args.pipeline or args.stage_workers:
+        try:
+            stage_workers = parse_stage_workers(args.stage_workers)
+        except ValueError as e:
+            parser.error(str(e))
+
+    items = read_manifest(args.manifest)
+    if args.supplier:
+        # Globale Lieferantennummer gilt für alle Zeilen ohne eigene Angabe
+        for item in items:
+            item["supplier_nr"] = item["supplier_nr"] or args.supplier
+
+    summary = run_batch(
+        items,
+        sync_config,
+        env_config,
+        TEMPLATE_PATH,
+        DATA_DIR,
+        journal_path=args.journal or os.path.join(DATA_DIR, "batch_journal.jsonl"),
+        workers=args.workers,
+        resume=args.resume,
+        stage_workers=stage_workers,
+        queue_size=args.pipeline_queue,
+        retry_unconfirmed=args.retry_unconfirmed
+    )
+    print_batch_summary(summary)
+    raise SystemExit(1 if summary["failed"] or summary["unconfirmed"] else 0)
 
 # --- Starte Klonprozess ---
 # Ruft die gesamte Business-Logik auf und erhält ggf. eine neue SAP-ID zurück
-new_sap_id, entity_type = run_clone_process(
-    identifier,
-    sync_config,
-    env_config,
-    TEMPLATE_PATH,
-    DATA_DIR,
-    supplier_nr=supplier_nr
-)
+result = run_clone(args.clone_config, args.articlenr, supplier_nr=args.supplier, upload_delta=True if args.delta else None,
+                   copies=args.copies)
 
 # --- Ausgabe bei erfolgreicher SAP-ID Generierung ---
 # Wenn eine neue SAP-ID erzeugt wurde, gib den Link zur neuen Entität aus
-if new_sap_id:
-    base_url = os.getenv("BASE_URL")
-    if base_url:
-        link = f"{base_url}/entity-manage?id={new_sap_id}&type={entity_type}"
-        print(f"\n[INFO] Neue SAP-Artikelnummer: {new_sap_id}")
-        print(f"\n[INFO] Artikel wird erstellt: {link}")
-    else:
-        print(f"\n[INFO] Neue SAP-Artikelnummer: {new_sap_id}")
+if len(result["new_sap_ids"]) > 1:
+    print(f"\n[INFO] {len(result['new_sap_ids'])} Kopien erstellt:")
+    for new_sap_id in result["new_sap_ids"]:
+        link = build_entity_link(new_sap_id, result["entity_type"])
+        print(f"  {new_sap_id}" + (f" – {link}" if link else ""))
+elif result["new_sap_id"]:
+    print(f"\n[INFO] Neue SAP-Artikelnummer: {result['new_sap_id']}")
+    if result["link"]:
+        print(f"\n[INFO] Artikel wird erstellt: {result['link']}")
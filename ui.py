@@ -1,10 +1,13 @@
 import streamlit as st
 import os
 import json
-import subprocess
-import requests
+import queue
+from concurrent.futures import ThreadPoolExecutor
 import utils.env_config as env_config
 import utils.helpers as helpers
+from utils.http_client import request
+from app.clone_api import run_clone
+from app.entity_model import first_entity, first_value, relations, response_entities
 
 # --- URL-Parameter lesen ---
 params = st.query_params
@@ -14,6 +17,11 @@ entity_type = params.get("entity_type", "")
 # --- Template für API-Requests ---
 TEMPLATE_PATH_EXISTING_SUPPLIERS = "payloads/template_get_existing_suppliers.json"
 TEMPLATE_PATH_EXISTING_SUPPLIERS_DATA = "payloads/template_get_existing_suppliers_data.json"
+TEMPLATE_PATH_EXISTING_SUPPLIERS_NAMES = "payloads/template_get_existing_suppliers_names.json"
+
+# --- Lieferanten-Abfrage: Cache-Dauer (Sekunden) und parallele Einzelabfragen im Fallback ---
+SUPPLIER_CACHE_TTL = 120
+SUPPLIER_LOOKUP_WORKERS = 4
 
 # --- Mapping für Anzeige ---
 ENTITY_LABELS = {
@@ -24,49 +32,148 @@ ENTITY_LABELS = {
     "exeinkaufskond": "Einkaufskondition"
 }
 
+# --- Warmer Worker für Klonvorgänge (einmal pro Server-Prozess) ---
+@st.cache_resource
+def get_clone_executor():
+    # Ein Worker: Klone teilen sich die Zwischendateien in data/ und laufen daher nacheinander
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="ui-clone")
+
+# --- Fortschrittsereignis als Textzeile formatieren ---
+def format_progress(event, details):
+    if event == "type_fetched":
+        label = ENTITY_LABELS.get(details["typ"], details["typ"])
+        return f"✅ {label}: {details['entity_count']} Eintrag(e) geladen"
+    if event == "fetched":
+        return f"📥 Export abgeschlossen: {details['entity_count']} Entität(en)"
+    if event == "ids_assigned":
+        return f"🆔 Neue SAP-Artikelnummer: {details.get('new_sap_id')}"
+    if event == "uploaded":
+        return f"📤 Upload abgeschlossen: {details['entity_count']} Entität(en)"
+    return f"{event}: {details}"
+
+# --- Klonvorgang im Worker starten und Fortschritt live anzeigen ---
+def run_clone_with_progress(clone_config, identifier, supplier_nr):
+    events = queue.Queue()
+
+    def progress(event, **details):
+        events.put((event, details))
+
+    future = get_clone_executor().submit(run_clone, clone_config, identifier, supplier_nr=supplier_nr, progress=progress)
+
+    status = st.status("Bitte warten – Klonvorgang läuft...", expanded=True)
+    upload_bar = None
+    while True:
+        try:
+            event, details = events.get(timeout=0.2)
+        except queue.Empty:
+            if future.done():
+                break
+            continue
+
+        if event == "upload_progress":
+            # Upload-Fortschritt als Balken statt als einzelne Zeilen (Gesamtgrösse bei chunked Upload unbekannt)
+            total = details["bytes_total"]
+            if total:
+                text = f"📤 Upload: {details['bytes_sent'] / 1024:.0f} / {total / 1024:.0f} KB"
+                value = min(details["bytes_sent"] / total, 1.0)
+            else:
+                text = f"📤 Upload: {details['bytes_sent'] / 1024:.0f} KB gesendet"
+                value = 0.5
+            if upload_bar is None:
+                upload_bar = status.progress(0.0, text=text)
+            upload_bar.progress(value, text=text)
+        else:
+            status.write(format_progress(event, details))
+
+    try:
+        result = future.result()
+    except Exception as e:
+        status.update(label="Klonvorgang fehlgeschlagen", state="error")
+        st.error(f"Fehler beim Klonen: {e}")
+        return
+
+    status.update(label="Klonvorgang abgeschlossen", state="complete")
+    if result["new_sap_id"]:
+        st.success(f"Neue SAP-Artikelnummer: {result['new_sap_id']}")
+    if result["link"]:
+        st.markdown(f"[Artikel im MDM öffnen]({result['link']})")
+
+# --- Name eines Lieferanten aus einer API-Entität lesen ---
+def _supplier_name(entity):
+    return first_value(entity, "axmdmname")
+
+# --- Einzelabfrage (Fallback, falls die Mehrfachabfrage nicht alle Namen liefert) ---
+def _fetch_supplier_name(url, headers, supplier_id):
+    payload_data = helpers.load_and_customize_payload_existing_suppliers_data(TEMPLATE_PATH_EXISTING_SUPPLIERS_DATA, supplier_id)
+    response_data = request("POST", url, endpoint="mdm", json=payload_data, headers=headers)
+    response_data.raise_for_status()
+    return _supplier_name(first_entity(response_data.json()))
+
+# --- Lieferantenbeziehungen und Namen laden (pro Artikel kurz gecacht, damit Reruns nicht neu abfragen) ---
+@st.cache_data(ttl=SUPPLIER_CACHE_TTL, show_spinner=False)
+def load_existing_suppliers(identifier, url, headers):
+    payload = helpers.load_and_customize_payload_existing_suppliers(TEMPLATE_PATH_EXISTING_SUPPLIERS, identifier)
+    response = request("POST", url, endpoint="mdm", json=payload, headers=headers)
+    response.raise_for_status()
+    data = response.json()
+
+    supplier_infos = []
+    for entity in response_entities(data):
+        for rel in relations(entity, "relxliefzuart"):
+            supplier_id = rel.get("relTo", {}).get("id")
+            is_default = first_value(rel, "arelxregellieferant") is True
+            if supplier_id:
+                supplier_infos.append({
+                    "id": supplier_id,
+                    "is_default": is_default
+                })
+
+    # Namen aller Lieferanten in einer Abfrage auflösen
+    supplier_ids = list(dict.fromkeys(sup["id"] for sup in supplier_infos))
+    names = {}
+    warnings = []
+    if supplier_ids:
+        try:
+            payload_names = helpers.load_and_customize_payload_existing_suppliers_names(TEMPLATE_PATH_EXISTING_SUPPLIERS_NAMES, supplier_ids)
+            response_names = request("POST", url, endpoint="mdm", json=payload_names, headers=headers)
+            response_names.raise_for_status()
+            for entity in response_names.json().get("response", {}).get("entities", []):
+                names[entity.get("id")] = _supplier_name(entity)
+        except Exception as e:
+            warnings.append(f"Mehrfachabfrage der Lieferantennamen fehlgeschlagen, frage einzeln ab: {e}")
+
+    # Fallback: fehlende Namen begrenzt parallel einzeln abfragen
+    missing = [supplier_id for supplier_id in supplier_ids if not names.get(supplier_id)]
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(SUPPLIER_LOOKUP_WORKERS, len(missing))) as executor:
+            futures = {supplier_id: executor.submit(_fetch_supplier_name, url, headers, supplier_id) for supplier_id in missing}
+        for supplier_id, future in futures.items():
+            try:
+                names[supplier_id] = future.result()
+            except Exception as e:
+                warnings.append(f"Name für Lieferant {supplier_id} konnte nicht geladen werden: {e}")
+
+    return supplier_infos, names, warnings
+
 # --- Bestehende Lieferanten per API abrufen ---
 def get_existing_suppliers(env_config):
-    url = env_config["url_get"]
-    headers = env_config["headers_get"]
-    payload = helpers.load_and_customize_payload_existing_suppliers(TEMPLATE_PATH_EXISTING_SUPPLIERS, identifier)
-    
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        supplier_infos = []
-
-        for entity in data.get("response", {}).get("entities", []):
-            rels = entity.get("data", {}).get("relationships", {}).get("relxliefzuart", [])
-            for rel in rels:
-                supplier_id = rel.get("relTo", {}).get("id")
-                is_default = rel.get("attributes", {}).get("arelxregellieferant", {}).get("values", [{}])[0].get("value") is True
-                if supplier_id:
-                    supplier_infos.append({
-                        "id": supplier_id,
-                        "is_default": is_default
-                    })
-
+        supplier_infos, names, warnings = load_existing_suppliers(identifier, env_config["url_get"], env_config["headers_get"])
     except Exception as e:
         st.error(f"Keine Lieferantenbeziehungen gefunden: {e}")
         return [], None
 
-    # Namen auflösen
+    for warning in warnings:
+        st.warning(warning)
+
     supplier_names = []
     default_index = 0
-    for idx, sup in enumerate(supplier_infos):
-        try:
-            payload_data = helpers.load_and_customize_payload_existing_suppliers_data(TEMPLATE_PATH_EXISTING_SUPPLIERS_DATA, sup["id"])
-            response_data = requests.post(url, json=payload_data, headers=headers)
-            response_data.raise_for_status()
-            entity = response_data.json().get("response", {}).get("entities", [{}])[0]
-            name = entity.get("data", {}).get("attributes", {}).get("axmdmname", {}).get("values", [{}])[0].get("value")
-            if name:
-                supplier_names.append(name)
-                if sup["is_default"]:
-                    default_index = idx
-        except Exception as e:
-            st.warning(f"Name für Lieferant {sup['id']} konnte nicht geladen werden: {e}")
+    for sup in supplier_infos:
+        name = names.get(sup["id"])
+        if name:
+            if sup["is_default"]:
+                default_index = len(supplier_names)
+            supplier_names.append(name)
 
     return supplier_names, default_index
 
@@ -95,13 +202,10 @@ def search_suppliers(query, env_config):
         }
     }
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = request("POST", url, endpoint="mdm", json=payload, headers=headers)
         response.raise_for_status()
         data = response.json()
-        return [
-            e.get("data", {}).get("attributes", {}).get("axmdmname", {}).get("values", [{}])[0].get("value")
-            for e in data.get("response", {}).get("entities", [])
-        ]
+        return [first_value(e, "axmdmname") for e in response_entities(data)]
     except Exception as e:
         st.error(f"Fehler beim Abrufen der Lieferanten: {e}")
         return []
@@ -118,17 +222,19 @@ st.text_input("🆔 Identifier", value=identifier, disabled=True)
 available_configs = helpers.get_matching_clone_configs(entity_type) if entity_type else []
 config_display_names = ["Bitte Klon-Konfiguration wählen..."] + [c["display_name"] for c in available_configs]
 config_filename_map = {c["display_name"]: c["filename"] for c in available_configs}
+config_process_map = {c["display_name"]: c["process_type"] for c in available_configs}
 
 # --- Auswahl Konfiguration ---
 selected_display = st.selectbox("🧩 Klon-Konfiguration wählen", config_display_names, index=0)
 selected_config = config_filename_map.get(selected_display)
+ist_lieferantenwechsel = config_process_map.get(selected_display) == "lieferantenwechsel"
 
 # --- Lieferantensuche (nur bei Lieferantenwechsel) ---
 supplier_nr = None
 suchtext = ""
 lieferant_ausgewaehlt = False
 
-if selected_display and "Lieferanten Wechsel" in selected_display:
+if ist_lieferantenwechsel:
     env_config = env_config.get_env_config()
 
     # Bestehende Lieferanten laden
@@ -154,7 +260,6 @@ if selected_display and "Lieferanten Wechsel" in selected_display:
 
 # --- Bedingungen für Button prüfen ---
 config_ausgewaehlt = selected_config is not None
-ist_lieferantenwechsel = selected_display and "Lieferanten Wechsel" in selected_display
 alle_bedingungen_ok = (
     config_ausgewaehlt
     and identifier
@@ -165,17 +270,7 @@ alle_bedingungen_ok = (
 # --- Button nur anzeigen, wenn Bedingungen erfüllt ---
 if alle_bedingungen_ok:
     if st.button("🚀 Klonen starten"):
-        command = f"python main.py --clone {selected_config} --articlenr {identifier}"
-        if supplier_nr:
-            command += f" --supplier {supplier_nr}"
-
-        st.text(f"Führe aus: {command}")
-
-        with st.spinner("Bitte warten – Klonvorgang läuft..."):
-            result = subprocess.run(command, shell=True, capture_output=True, text=True)
-            st.code(result.stdout)
-            if result.stderr:
-                st.error(result.stderr)
+        run_clone_with_progress(selected_config, identifier, supplier_nr)
 
 # --- Footer ---
 st.markdown("---")
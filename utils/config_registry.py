@@ -0,0 +1,221 @@
+# utils/config_registry.py – Zentrales, indiziertes Register aller Clone-Konfigurationen
+import copy
+import json
+import os
+import threading
+import time
+
+# Ordner mit den Clone-Konfigurationen
+CLONE_DIR = os.path.join("config", "clone")
+# Mindestabstand (Sekunden) zwischen zwei Prüfungen des Ordners auf geänderte Dateien
+CHECK_INTERVAL = 1.0
+
+# Pflichtfelder und erwartete Typen
+REQUIRED_KEYS = {
+    "entity_type": str,
+    "identifier_attribute": str,
+    "entity_configs": list
+}
+ENTITY_CONFIG_KEYS = {
+    "typ": str,
+    "attributes": list,
+    "relationships": list,
+    "relationship_attributes": list
+}
+OPTIONAL_KEYS = {
+    "display_name": str,     # Anzeigename in der UI (Standard: Dateiname)
+    "clone": bool,
+    "debug": bool,
+    "process_type": str,
+    "fetch_strategy": str,
+    "page_size": int,
+    "stream_entities": bool,
+    "upload_delta": bool,
+    "copies": int
+}
+# Erlaubte Export-Strategien (Standard: "filter" = je Typ über den Identifier)
+FETCH_STRATEGIES = ("filter", "graph")
+
+_lock = threading.Lock()
+_state = {
+    "files": {},             # name → {"mtime_ns", "config", "errors"}
+    "by_entity_type": {},    # entity_type → [name, ...]
+    "by_process_type": {},   # process_type → [name, ...]
+    "checked_at": 0.0
+}
+
+
+def validate_clone_config(config):
+    """
+    Prüft eine Clone-Konfiguration auf Pflichtfelder und Typen.
+
+    Args:
+        config (dict): Geladene Konfiguration.
+
+    Returns:
+        list: Fehlermeldungen (leer, wenn gültig).
+    """
+    if not isinstance(config, dict):
+        return ["Konfiguration ist kein JSON-Objekt"]
+
+    errors = []
+    for key, expected in REQUIRED_KEYS.items():
+        if key not in config:
+            errors.append(f"Pflichtfeld '{key}' fehlt")
+        elif not isinstance(config[key], expected):
+            errors.append(f"'{key}' muss vom Typ {expected.__name__} sein")
+    for key, expected in OPTIONAL_KEYS.items():
+        if key in config and not isinstance(config[key], expected):
+            errors.append(f"'{key}' muss vom Typ {expected.__name__} sein")
+
+    if isinstance(config.get("fetch_strategy"), str) and config["fetch_strategy"] not in FETCH_STRATEGIES:
+        errors.append(f"'fetch_strategy' muss einer von {', '.join(FETCH_STRATEGIES)} sein")
+
+    if isinstance(config.get("copies"), int) and config["copies"] < 1:
+        errors.append("'copies' muss mindestens 1 sein")
+
+    seen_types = set()
+    for i, cfg in enumerate(config.get("entity_configs") or []):
+        if not isinstance(cfg, dict):
+            errors.append(f"entity_configs[{i}] ist kein JSON-Objekt")
+            continue
+        for key, expected in ENTITY_CONFIG_KEYS.items():
+            if key not in cfg:
+                errors.append(f"entity_configs[{i}]: Pflichtfeld '{key}' fehlt")
+            elif not isinstance(cfg[key], expected):
+                errors.append(f"entity_configs[{i}]: '{key}' muss vom Typ {expected.__name__} sein")
+            elif expected is list and not all(isinstance(v, str) for v in cfg[key]):
+                errors.append(f"entity_configs[{i}]: '{key}' darf nur Strings enthalten")
+        if cfg.get("typ") in seen_types:
+            errors.append(f"entity_configs[{i}]: Typ '{cfg['typ']}' ist doppelt konfiguriert")
+        seen_types.add(cfg.get("typ"))
+    return errors
+
+
+def _load_file(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        return None, [f"Datei nicht lesbar: {e}"]
+    return config, validate_clone_config(config)
+
+
+def refresh_registry(force=False):
+    """
+    Gleicht das Register mit dem Konfigurationsordner ab.
+
+    Es werden nur Dateien neu geladen, deren mtime sich geändert hat; gelöschte Dateien
+    werden entfernt. Ohne force erfolgt die Prüfung höchstens alle CHECK_INTERVAL Sekunden.
+
+    Args:
+        force (bool): Ordner unabhängig vom Prüfintervall prüfen.
+    """
+    now = time.monotonic()
+    if not force and now - _state["checked_at"] < CHECK_INTERVAL:
+        return
+
+    with _lock:
+        if not force and now - _state["checked_at"] < CHECK_INTERVAL:
+            return
+
+        # Auf einer Kopie arbeiten, damit Leser ohne Sperre nie ein halb aktualisiertes Register sehen
+        files = dict(_state["files"])
+        present = set()
+        changed = False
+        for fname in os.listdir(CLONE_DIR):
+            if not fname.endswith(".json"):
+                continue
+            name = fname[:-len(".json")]
+            path = os.path.join(CLONE_DIR, fname)
+            present.add(name)
+            mtime_ns = os.stat(path).st_mtime_ns
+            entry = files.get(name)
+            if entry and entry["mtime_ns"] == mtime_ns:
+                continue
+
+            config, errors = _load_file(path)
+            if errors:
+                print(f"[WARNUNG] Clone-Konfiguration {fname} ungültig: {'; '.join(errors)}")
+            files[name] = {
+                "mtime_ns": mtime_ns,
+                "config": config,
+                "errors": errors
+            }
+            changed = True
+
+        for name in set(files) - present:
+            del files[name]
+            changed = True
+
+        if changed:
+            _state["files"] = files
+            by_entity_type = {}
+            by_process_type = {}
+            for name in sorted(files):
+                entry = files[name]
+                if entry["errors"]:
+                    continue
+                by_entity_type.setdefault(entry["config"]["entity_type"], []).append(name)
+                by_process_type.setdefault(entry["config"].get("process_type"), []).append(name)
+            _state["by_entity_type"] = by_entity_type
+            _state["by_process_type"] = by_process_type
+
+        _state["checked_at"] = now
+
+
+def _get_entry(name):
+    refresh_registry()
+    entry = _state["files"].get(name)
+    if entry is None:
+        raise FileNotFoundError(f"Clone-Konfiguration '{name}' nicht gefunden in {CLONE_DIR}.")
+    if entry["errors"]:
+        raise ValueError(f"Clone-Konfiguration '{name}' ungültig: {'; '.join(entry['errors'])}")
+    return entry
+
+
+def get_clone_config(name):
+    """
+    Liefert eine Clone-Konfiguration aus dem Register.
+
+    Args:
+        name (str): Technischer Name ohne Endung (z. B. exartikel_ArtikelKomplett).
+
+    Returns:
+        dict: Kopie der Konfiguration inkl. "clone_config" (darf vom Aufrufer verändert werden).
+    """
+    config = copy.deepcopy(_get_entry(name)["config"])
+    config["clone_config"] = name
+    return config
+
+
+def find_clone_configs(entity_type=None, process_type=None):
+    """
+    Sucht gültige Konfigurationen über die Indizes nach entity_type und/oder process_type.
+
+    Args:
+        entity_type (str, optional): Entitätstyp (z. B. exartikel).
+        process_type (str, optional): Prozesstyp (z. B. lieferantenwechsel).
+
+    Returns:
+        list: Dicts {"filename", "display_name", "process_type"}, sortiert nach Dateiname.
+    """
+    refresh_registry()
+    names = None
+    if entity_type is not None:
+        names = set(_state["by_entity_type"].get(entity_type, []))
+    if process_type is not None:
+        by_process = set(_state["by_process_type"].get(process_type, []))
+        names = by_process if names is None else names & by_process
+    if names is None:
+        names = {name for name, entry in _state["files"].items() if not entry["errors"]}
+
+    result = []
+    for name in sorted(names):
+        config = _state["files"][name]["config"]
+        result.append({
+            "filename": name,
+            "display_name": config.get("display_name", name),
+            "process_type": config.get("process_type")
+        })
+    return result
@@ -15,8 +15,24 @@ def get_env_config():
             "auth-client-secret": os.getenv("RDP_CLIENT_SECRET"),
             "Content-Type": "application/json"
         },
+        # Einträge pro Seite bei MDM-Abfragen (0 = alles in einer Abfrage)
+        "page_size": int(os.getenv("MDM_PAGE_SIZE", "0")),
         "url": os.getenv("API_URL_UPLOAD"),
         "headers": {
             "x-ms-blob-type": "BlockBlob"
-        }
+        },
+        # Upload mit Transfer-Encoding: chunked statt Content-Length (Azure Put Blob verlangt Content-Length)
+        "upload_chunked": os.getenv("UPLOAD_CHUNKED", "false").lower() == "true",
+        # "single" = ein PUT pro Datei, "blocks" = paralleler Block-Upload (Put Block / Put Block List)
+        "upload_mode": os.getenv("UPLOAD_MODE", "single"),
+        "upload_block_size": int(os.getenv("UPLOAD_BLOCK_SIZE", str(4 * 1024 * 1024))),
+        "upload_block_workers": int(os.getenv("UPLOAD_BLOCK_WORKERS", "4")),
+        # Import in mehrere Dateien aufteilen: höchstens so viele Entitäten bzw. Bytes pro Datei (0 = aus)
+        "upload_shard_entities": int(os.getenv("UPLOAD_SHARD_ENTITIES", "0")),
+        "upload_shard_bytes": int(os.getenv("UPLOAD_SHARD_BYTES", "0")),
+        "upload_shard_workers": int(os.getenv("UPLOAD_SHARD_WORKERS", "4")),
+        # Upload gzip-komprimiert (.json.gz, Content-Encoding gzip) – nur wenn der Import dies unterstützt
+        "upload_gzip": os.getenv("UPLOAD_GZIP", "false").lower() == "true",
+        # Lokale Kopien der Entitäten (get_entities.json, send_entities.json) gzip-komprimiert schreiben
+        "local_copy_gzip": os.getenv("LOCAL_COPY_GZIP", "false").lower() == "true"
     }
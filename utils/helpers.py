@@ -1,11 +1,20 @@
-import json
-import requests
+import re
 import os
-import ui as ui
+import threading
+from utils.config_registry import find_clone_configs
+from utils.http_client import request
+from utils import serialization
+
+# Platzhalter in Payload-Templates (z. B. "REPLACE_ARTNR")
+PLACEHOLDER_PATTERN = re.compile(r"REPLACE_[A-Z]+")
+
+# Kompilierte Templates je Pfad: path → (mtime_ns, build, placeholders)
+_template_cache = {}
+_template_lock = threading.Lock()
 
 def load_json(path):
     """
-    Lädt eine JSON-Datei von einem gegebenen Pfad.
+    Lädt eine JSON-Datei von einem gegebenen Pfad (gzip-komprimierte Dateien werden erkannt).
 
     Args:
         path (str): Der Pfad zur Datei.
@@ -13,19 +22,100 @@ def load_json(path):
     Returns:
         dict: Der geladene JSON-Inhalt als Python-Dictionary.
     """
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return serialization.load(path)
 
-def save_json(data, path):
+def save_json(data, path, pretty=True, compress=False):
     """
     Speichert ein Dictionary als JSON-Datei an einem gegebenen Pfad.
 
     Args:
         data (dict): Die zu speichernden Daten.
         path (str): Der Pfad, an dem die Datei gespeichert werden soll.
+        pretty (bool): Eingerückt (lesbar) oder kompakt schreiben.
+        compress (bool): gzip-komprimiert schreiben (Pfad erhält die Endung .gz).
+
+    Returns:
+        str: Tatsächlich geschriebener Pfad.
+    """
+    return serialization.save(data, path, pretty=pretty, compress=compress)
+
+def _compile_node(node, path, placeholders):
+    """
+    Übersetzt einen Template-Knoten in eine Build-Funktion build(values) -> neuer Knoten.
+
+    Platzhalter werden dabei strukturell erfasst (Pfad im Baum), sodass beim Erzeugen eines
+    Payloads nur noch direkt eingesetzt wird – ohne erneutes Serialisieren/Parsen.
+    """
+    if isinstance(node, dict):
+        items = [(key, _compile_node(value, path + (key,), placeholders)) for key, value in node.items()]
+        return lambda values: {key: build(values) for key, build in items}
+
+    if isinstance(node, list):
+        builders = [_compile_node(value, path + (i,), placeholders) for i, value in enumerate(node)]
+        return lambda values: [build(values) for build in builders]
+
+    if isinstance(node, str):
+        names = PLACEHOLDER_PATTERN.findall(node)
+        if not names:
+            return lambda values: node
+        placeholders.append((path, node))
+        if names == [node]:
+            # Ganzer Wert ist ein Platzhalter: Wert direkt einsetzen (auch Listen)
+            return lambda values: _copy_value(values[node])
+
+        # Platzhalter innerhalb eines Textes: nur Textersetzung in diesem String
+        def build_text(values):
+            text = node
+            for name in names:
+                text = text.replace(name, str(values[name]))
+            return text
+        return build_text
+
+    return lambda values: node
+
+
+def _copy_value(value):
+    # Listen kopieren, damit Payloads keine Konfigurationslisten teilen
+    return list(value) if isinstance(value, list) else value
+
+
+def load_template(template_path):
+    """
+    Lädt ein Payload-Template und kompiliert es einmalig (Cache mit mtime-Invalidierung).
+
+    Args:
+        template_path (str): Pfad zur Template-Datei.
+
+    Returns:
+        tuple: (build, placeholders) – build(values) erzeugt einen neuen Payload-Baum,
+            placeholders ist die Liste der (Pfad, Platzhalter-Text) im Template.
+    """
+    mtime = os.stat(template_path).st_mtime_ns
+    cached = _template_cache.get(template_path)
+    if cached and cached[0] == mtime:
+        return cached[1], cached[2]
+
+    with _template_lock:
+        template = load_json(template_path)
+        placeholders = []
+        build = _compile_node(template, (), placeholders)
+        _template_cache[template_path] = (mtime, build, placeholders)
+    return build, placeholders
+
+
+def render_template(template_path, values):
+    """
+    Erzeugt einen Payload aus einem (gecachten) Template.
+
+    Args:
+        template_path (str): Pfad zur Template-Datei.
+        values (dict): Platzhalter → Wert, z. B. {"REPLACE_ARTNR": "1008276"}.
+
+    Returns:
+        dict: Neuer Payload-Baum (kann vom Aufrufer verändert werden).
     """
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    build, _ = load_template(template_path)
+    return build(values)
 
 def load_and_customize_payload(template_path, entity_type, artikelnummer, attributes, relationships, relationship_attributes):
     """
@@ -42,18 +132,14 @@ def load_and_customize_payload(template_path, entity_type, artikelnummer, attrib
     Returns:
         dict: Das angepasste Payload als Dictionary.
     """
-    with open(template_path, "r", encoding="utf-8") as f:
-        template = json.load(f)
-
-    # Ersetze Platzhalter im JSON-Template
-    json_str = json.dumps(template)
-    json_str = json_str.replace("REPLACE_ENTITY", entity_type)
-    json_str = json_str.replace("REPLACE_ARTNR", artikelnummer)
-    json_str = json_str.replace('"REPLACE_ATTRIBUTES"', json.dumps(attributes))
-    json_str = json_str.replace('"REPLACE_RELATIONSHIPS"', json.dumps(relationships))
-    json_str = json_str.replace('"REPLACE_RELATIONSHIPATTR"', json.dumps(relationship_attributes))
-
-    return json.loads(json_str)
+    # Ersetze Platzhalter im (kompilierten) JSON-Template
+    return render_template(template_path, {
+        "REPLACE_ENTITY": entity_type,
+        "REPLACE_ARTNR": artikelnummer,
+        "REPLACE_ATTRIBUTES": attributes,
+        "REPLACE_RELATIONSHIPS": relationships,
+        "REPLACE_RELATIONSHIPATTR": relationship_attributes
+    })
 
 def post_request(url, payload, headers):
     """
@@ -67,7 +153,7 @@ def post_request(url, payload, headers):
     Returns:
         dict: Die JSON-Antwort vom Server.
     """
-    response = requests.post(url, json=payload, headers=headers)
+    response = request("POST", url, endpoint="mdm", json=payload, headers=headers)
     response.raise_for_status()
     return response.json()
 
@@ -82,14 +168,8 @@ def load_and_customize_payload_existing_suppliers(template_path, artikelnummer):
     Returns:
         dict: Das angepasste Payload als Dictionary.
     """
-    with open(template_path, "r", encoding="utf-8") as f:
-        template = json.load(f)
-
-    # Ersetze Platzhalter im JSON-Template
-    json_str = json.dumps(template)
-    json_str = json_str.replace("REPLACE_ARTNR", artikelnummer)
-
-    return json.loads(json_str)
+    # Ersetze Platzhalter im (kompilierten) JSON-Template
+    return render_template(template_path, {"REPLACE_ARTNR": artikelnummer})
 
 
 def load_and_customize_payload_existing_suppliers_data(template_path, supplier_id):
@@ -103,24 +183,24 @@ def load_and_customize_payload_existing_suppliers_data(template_path, supplier_i
     Returns:
         dict: Das angepasste Payload als Dictionary.
     """
-    with open(template_path, "r", encoding="utf-8") as f:
-        template = json.load(f)
+    # Ersetze Platzhalter im (kompilierten) JSON-Template
+    return render_template(template_path, {"REPLACE_ID": supplier_id})
 
-    # Ersetze Platzhalter im JSON-Template
-    json_str = json.dumps(template)
-    json_str = json_str.replace("REPLACE_ID", supplier_id)
+def load_and_customize_payload_existing_suppliers_names(template_path, supplier_ids):
+    """
+    Lädt ein JSON-Template für die Abfrage der Namen mehrerer Lieferanten in einem Request.
 
-    return json.loads(json_str)
+    Args:
+        template_path (str): Pfad zur Template-Datei.
+        supplier_ids (list): Die Identifier der Lieferanten.
+
+    Returns:
+        dict: Das angepasste Payload als Dictionary.
+    """
+    # Ersetze Platzhalter im (kompilierten) JSON-Template
+    return render_template(template_path, {"REPLACE_IDS": list(supplier_ids)})
 
 # --- Hilfsfunktion: Liste passender Konfigs für Entitätstyp ---
 def get_matching_clone_configs(entity_type):
-    folder = "config/clone"
-    configs = []
-    for fname in os.listdir(folder):
-        if fname.endswith(".json") and fname.startswith(entity_type):
-            path = os.path.join(folder, fname)
-            with open(path, "r", encoding="utf-8") as f:
-                config = json.load(f)
-            display = config.get("display_name", fname.replace(".json", ""))
-            configs.append({"filename": fname.replace(".json", ""), "display_name": display})
-    return configs
+    # Aus dem geteilten Konfigurationsregister (lädt Dateien nur bei geänderter mtime neu)
+    return find_clone_configs(entity_type=entity_type)
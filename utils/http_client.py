@@ -0,0 +1,175 @@
+# utils/http_client.py – Gemeinsame HTTP-Schicht: Connection-Pooling, Timeouts und Wiederholungen
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+
+# Standardgrösse des Verbindungspools pro Host
+DEFAULT_POOL_MAXSIZE = 10
+# Timeouts (Verbindungsaufbau, Lesen) in Sekunden je Endpunkt
+DEFAULT_TIMEOUTS = {
+    "mdm": (5, 120),
+    "sap": (5, 30),
+    "blob": (5, 300),
+    "default": (5, 60)
+}
+# Wiederholungen nach dem ersten Versuch und Basis/Obergrenze der Wartezeit (Sekunden)
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+# Obergrenze für vom Server verlangte Wartezeiten (Retry-After)
+MAX_RETRY_AFTER = 120.0
+# Statuscodes, bei denen ein (idempotenter) Request wiederholt wird
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Statuscodes, bei denen der Server den Request nachweislich nicht verarbeitet hat
+# (auch für nicht idempotente Requests, z. B. die Vergabe einer SAP-Nummer)
+REJECTED_STATUSES = frozenset({429, 503})
+
+_session = None
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "retries": 0, "failures": 0}
+
+
+def _pool_limits():
+    """
+    Liest die Poolgrössen: HTTP_POOL_MAXSIZE für alle Hosts, HTTP_POOL_LIMITS für einzelne
+    Hosts (z. B. "mdm.example.com=20,sap.example.com=4").
+    """
+    default = int(os.getenv("HTTP_POOL_MAXSIZE", str(DEFAULT_POOL_MAXSIZE)))
+    per_host = {}
+    for entry in os.getenv("HTTP_POOL_LIMITS", "").split(","):
+        host, _, size = entry.strip().partition("=")
+        if host and size:
+            per_host[host] = int(size)
+    return default, per_host
+
+
+def get_session():
+    """
+    Liefert eine prozessweit geteilte requests.Session mit Keep-Alive und Connection-Pool.
+
+    Die Session wird beim ersten Aufruf erzeugt und danach wiederverwendet, damit
+    aufeinanderfolgende bzw. parallele Requests bestehende TCP/TLS-Verbindungen nutzen.
+    Poolgrössen sind über HTTP_POOL_MAXSIZE und HTTP_POOL_LIMITS (pro Host) einstellbar.
+
+    Returns:
+        requests.Session: Die geteilte Session.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                default, per_host = _pool_limits()
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=default, pool_maxsize=default)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                # Spezifischere Präfixe haben in requests Vorrang vor "https://"
+                for host, size in per_host.items():
+                    host_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+                    session.mount(f"https://{host}", host_adapter)
+                    session.mount(f"http://{host}", host_adapter)
+                _session = session
+    return _session
+
+
+def get_timeout(endpoint):
+    """
+    Timeout (Verbindungsaufbau, Lesen) für einen Endpunkt; überschreibbar per
+    HTTP_TIMEOUT_<ENDPOINT>, z. B. HTTP_TIMEOUT_MDM="5,180".
+    """
+    value = os.getenv(f"HTTP_TIMEOUT_{endpoint.upper()}")
+    if value:
+        connect, _, read = value.partition(",")
+        return float(connect), float(read or connect)
+    return DEFAULT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUTS["default"])
+
+
+def _retry_after(response):
+    """Wartezeit aus dem Retry-After-Header (Sekunden oder HTTP-Datum), sonst None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt):
+    # Exponentiell mit vollem Jitter, damit parallele Worker nicht gleichzeitig wiederholen
+    return random.uniform(0, min(MAX_BACKOFF, DEFAULT_BACKOFF * 2 ** attempt))
+
+
+def request(method, url, endpoint="default", idempotent=True, retries=None, **kwargs):
+    """
+    Führt einen Request über die geteilte Session aus und wiederholt ihn bei transienten Fehlern.
+
+    - Idempotente Requests (Lesen, Put Blob/Block) werden bei Verbindungsfehlern, Timeouts und
+      den Status 429/500/502/503/504 wiederholt.
+    - Nicht idempotente Requests (z. B. Vergabe einer SAP-Nummer) nur, wenn der Server den
+      Request nachweislich abgelehnt hat (429/503) oder keine Verbindung zustande kam.
+    - Retry-After wird beachtet, sonst exponentielles Backoff mit Jitter.
+
+    Args:
+        method (str): HTTP-Methode, z. B. "POST"
+        url (str): Ziel-URL
+        endpoint (str): Endpunkt für den Timeout ("mdm", "sap", "blob", "default")
+        idempotent (bool): Ob der Request gefahrlos wiederholt werden darf
+        retries (int, optional): Anzahl Wiederholungen (Standard: HTTP_RETRIES bzw. 3)
+        **kwargs: Weitere Argumente für requests (json, data, headers, stream, ...)
+
+    Returns:
+        requests.Response: Die letzte Antwort (Statusprüfung durch den Aufrufer)
+    """
+    session = get_session()
+    kwargs.setdefault("timeout", get_timeout(endpoint))
+    if retries is None:
+        retries = int(os.getenv("HTTP_RETRIES", str(DEFAULT_RETRIES)))
+    retry_statuses = RETRY_STATUSES if idempotent else REJECTED_STATUSES
+
+    attempt = 0
+    while True:
+        with _stats_lock:
+            _stats["requests"] += 1
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # Ohne Verbindung wurde nichts verarbeitet; sonst nur idempotente Requests wiederholen
+            safe = idempotent or isinstance(e, requests.ConnectTimeout)
+            if not safe or attempt >= retries:
+                with _stats_lock:
+                    _stats["failures"] += 1
+                raise
+            wait = _backoff(attempt)
+        else:
+            if response.status_code not in retry_statuses or attempt >= retries:
+                return response
+            wait = _retry_after(response)
+            wait = _backoff(attempt) if wait is None else min(wait, MAX_RETRY_AFTER)
+            response.close()
+
+        attempt += 1
+        with _stats_lock:
+            _stats["retries"] += 1
+        print(f"[WARNUNG] {method} {url.split('?')[0]} fehlgeschlagen – Wiederholung {attempt}/{retries} in {wait:.1f} s")
+        time.sleep(wait)
+
+
+def get_http_stats():
+    """
+    Zähler der HTTP-Schicht.
+
+    Returns:
+        dict: {"requests": ..., "retries": ..., "failures": ...}
+    """
+    with _stats_lock:
+        return dict(_stats)
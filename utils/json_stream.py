@@ -0,0 +1,192 @@
+# utils/json_stream.py – Inkrementelles Parsen grosser JSON-Antworten und JSON-Lines-Zwischenspeicher
+import codecs
+import json
+import os
+from utils.serialization import dumps, loads
+
+# Blockgrösse beim Lesen gestreamter HTTP-Antworten
+DEFAULT_READ_SIZE = 64 * 1024
+# Pfad zur Entitätsliste in MDM-Antworten
+ENTITIES_PATH = ("response", "entities")
+
+_WHITESPACE = " \t\r\n"
+_decoder = json.JSONDecoder()
+
+
+class _Reader:
+    """Liest Text aus bytes-Blöcken nach und dekodiert JSON-Werte, sobald sie vollständig vorliegen."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder("utf-8")().decode
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        # Bereits verarbeiteten Text verwerfen, damit der Puffer nur den aktuellen Wert enthält
+        for chunk in self._chunks:
+            text = self._decode(chunk)
+            if text:
+                self.buf = self.buf[self.pos:] + text
+                self.pos = 0
+                return True
+        if not self.eof:
+            self.eof = True
+            tail = self._decode(b"", final=True)
+            if tail:
+                self.buf = self.buf[self.pos:] + tail
+                self.pos = 0
+                return True
+        return False
+
+    def peek(self):
+        """Nächstes Zeichen ausser Leerraum (ohne es zu verbrauchen)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("Unerwartetes Ende der JSON-Antwort")
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Ungültige JSON-Antwort: '{char}' erwartet, '{found}' gefunden")
+        self.pos += 1
+
+    def value(self):
+        """Dekodiert den nächsten vollständigen JSON-Wert (liest bei Bedarf nach)."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # Zahl am Pufferende kann abgeschnitten sein (z. B. "12" von "1234")
+            if end == len(self.buf) and isinstance(value, (int, float)) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _walk(reader, path, meta):
+    if not path:
+        reader.expect("[")
+        if reader.peek() == "]":
+            reader.pos += 1
+            return
+        while True:
+            yield reader.value()
+            separator = reader.peek()
+            reader.pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise ValueError(f"Ungültige JSON-Antwort: ',' oder ']' erwartet, '{separator}' gefunden")
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.pos += 1
+        return
+    while True:
+        key = reader.value()
+        reader.expect(":")
+        if key == path[0]:
+            yield from _walk(reader, path[1:], meta)
+        else:
+            value = reader.value()
+            # Einfache Werte neben der Liste (z. B. totalRecords) für den Aufrufer festhalten
+            if meta is not None and len(path) == 1 and not isinstance(value, (dict, list)):
+                meta[key] = value
+        separator = reader.peek()
+        reader.pos += 1
+        if separator == "}":
+            return
+        if separator != ",":
+            raise ValueError(f"Ungültige JSON-Antwort: ',' oder '}}' erwartet, '{separator}' gefunden")
+
+
+def iter_json_items(chunks, path=ENTITIES_PATH, meta=None):
+    """
+    Liefert die Elemente einer JSON-Liste an der Stelle path, während die Antwort noch gelesen wird.
+
+    Es liegt jeweils nur ein Element (plus der noch nicht verarbeitete Rest des aktuellen
+    Blocks) im Speicher – unabhängig von der Gesamtgrösse der Antwort.
+
+    Args:
+        chunks (iterable): bytes-Blöcke der Antwort (z. B. response.iter_content())
+        path (tuple): Schlüssel von der Wurzel bis zur Liste, z. B. ("response", "entities")
+        meta (dict, optional): Erhält einfache Werte neben der Liste (z. B. "totalRecords")
+
+    Returns:
+        generator: Die dekodierten Listenelemente
+    """
+    yield from _walk(_Reader(chunks), tuple(path), meta)
+
+
+def iter_response_entities(response, meta=None):
+    """
+    Liefert die Entitäten einer (mit stream=True gestellten) MDM-Antwort als Generator.
+
+    Args:
+        response (requests.Response): Gestreamte Antwort
+        meta (dict, optional): Erhält einfache Werte neben der Liste (z. B. "totalRecords")
+    """
+    return iter_json_items(response.iter_content(DEFAULT_READ_SIZE), ENTITIES_PATH, meta)
+
+
+class JsonLinesSpool:
+    """
+    Zwischenspeicher für Entitäten auf der Festplatte (eine JSON-Zeile pro Entität).
+
+    Nach close() kann der Spool beliebig oft (auch parallel) gelesen werden; jede Iteration
+    liest die Datei neu und liefert frische Objekte, der Speicherbedarf bleibt konstant.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._count = 0
+        self._file = open(path, "wb")
+
+    def write(self, item):
+        self._file.write(dumps(item))
+        self._file.write(b"\n")
+        self._count += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def remove(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        with open(self.path, "rb") as f:
+            for line in f:
+                yield loads(line)
+
+    def map(self, func):
+        """Wiederholt lesbare Sicht auf den Spool, die func auf jede Entität anwendet."""
+        return _MappedSpool(self, func)
+
+
+class _MappedSpool:
+    def __init__(self, spool, func):
+        self._spool = spool
+        self._func = func
+
+    def __len__(self):
+        return len(self._spool)
+
+    def __iter__(self):
+        for item in self._spool:
+            yield self._func(item)
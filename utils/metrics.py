@@ -0,0 +1,274 @@
+# utils/metrics.py – Zeitmessung je Schritt (Spans), JSON-Logzeilen und Prometheus-Textfile pro Lauf
+import contextlib
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from datetime import datetime, timezone
+
+# Standardordner für die Ausgaben eines Laufs (<run_id>.jsonl, <run_id>.prom, <run_id>.prof)
+METRICS_DIR = os.path.join("data", "metrics")
+# Präfix aller exportierten Prometheus-Metriken
+METRIC_PREFIX = "mdm_clone"
+# Anzahl Funktionen in der Profil-Zusammenfassung
+PROFILE_TOP = 25
+
+# Eigener Logger: eine JSON-Zeile pro Span (ohne Weitergabe an die Konsole)
+logger = logging.getLogger("mdm_clone.metrics")
+logger.propagate = False
+
+_lock = threading.Lock()
+_aggregates = {}  # (span, labels) → {"count", "seconds", "max", "bytes", "entities", "errors"}
+_run = {"id": None, "dir": None, "started": None, "handler": None, "profile": None}
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def record(name, seconds, bytes=0, entities=0, error=None, **labels):
+    """
+    Erfasst einen abgeschlossenen Schritt (Dauer, Bytes, Entitäten) und schreibt eine JSON-Logzeile.
+
+    Args:
+        name (str): Name des Schritts, z. B. "mdm_fetch", "sap_step", "upload"
+        seconds (float): Dauer in Sekunden
+        bytes (int): Übertragene bzw. erzeugte Bytes
+        entities (int): Anzahl verarbeiteter Entitäten
+        error (str, optional): Name der Ausnahme, falls der Schritt fehlgeschlagen ist
+        **labels: Zusätzliche Merkmale, z. B. type="exartikel", step="token"
+    """
+    key = (name, _label_key(labels))
+    with _lock:
+        agg = _aggregates.get(key)
+        if agg is None:
+            agg = _aggregates[key] = {"count": 0, "seconds": 0.0, "max": 0.0, "bytes": 0, "entities": 0, "errors": 0}
+        agg["count"] += 1
+        agg["seconds"] += seconds
+        agg["max"] = max(agg["max"], seconds)
+        agg["bytes"] += bytes
+        agg["entities"] += entities
+        if error:
+            agg["errors"] += 1
+
+    if logger.handlers:
+        line = {
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "run_id": _run["id"],
+            "span": name,
+            **{k: v for k, v in labels.items() if v is not None},
+            "duration_ms": round(seconds * 1000, 3),
+            "bytes": bytes,
+            "entities": entities,
+            "thread": threading.current_thread().name
+        }
+        if error:
+            line["error"] = error
+        logger.info(json.dumps(line, ensure_ascii=False))
+
+
+@contextlib.contextmanager
+def span(name, **labels):
+    """
+    Misst die Dauer eines Schritts. Bytes und Entitäten setzt der Aufrufer im gelieferten Dict:
+
+        with span("mdm_fetch", type="exartikel") as s:
+            ...
+            s["entities"] = len(entities)
+
+    Ausnahmen werden als Fehler des Schritts gezählt und weitergereicht.
+    """
+    fields = {"bytes": 0, "entities": 0}
+    error = None
+    started = time.perf_counter()
+    try:
+        yield fields
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        record(name, time.perf_counter() - started, fields["bytes"], fields["entities"], error, **labels)
+
+
+@contextlib.contextmanager
+def profiled():
+    """
+    Zeichnet bei aktivem Profiling (start_run(profile=True)) ein CPU-Profil des Blocks auf.
+    Profile paralleler Threads werden zu einem Gesamtprofil des Laufs zusammengeführt.
+    """
+    if _run["profile"] is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        with _lock:
+            if _run["profile"] is not None:
+                if _run["profile"] is True:
+                    _run["profile"] = pstats.Stats(profiler)
+                else:
+                    _run["profile"].add(profiler)
+
+
+def get_metrics():
+    """
+    Momentaufnahme aller erfassten Schritte.
+
+    Returns:
+        list: Dicts {"span", "labels", "count", "seconds", "max", "bytes", "entities", "errors"}
+    """
+    with _lock:
+        return [
+            {"span": name, "labels": dict(labels), **agg}
+            for (name, labels), agg in sorted(_aggregates.items())
+        ]
+
+
+def reset_metrics():
+    """Verwirft alle erfassten Werte (z. B. zu Beginn eines Laufs)."""
+    with _lock:
+        _aggregates.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def render_prometheus(extra=None):
+    """
+    Rendert die erfassten Werte im Prometheus-Textformat (für den Textfile-Collector
+    des node_exporter; mit "# EOF" zugleich gültiges OpenMetrics).
+
+    Args:
+        extra (dict, optional): Zusätzliche Gauges name → Wert (ohne Präfix)
+
+    Returns:
+        str: Inhalt der .prom-Datei
+    """
+    with _lock:
+        items = sorted(_aggregates.items())
+
+    lines = []
+    metrics = (
+        ("step_duration_seconds", "summary", "Dauer der Schritte in Sekunden", None),
+        ("step_duration_max_seconds", "gauge", "Längste Einzeldauer eines Schritts", "max"),
+        ("step_bytes", "counter", "Übertragene bzw. serialisierte Bytes", "bytes"),
+        ("step_entities", "counter", "Verarbeitete Entitäten", "entities"),
+        ("step_errors", "counter", "Fehlgeschlagene Schritte", "errors")
+    )
+    for metric, kind, help_text, field in metrics:
+        full = f"{METRIC_PREFIX}_{metric}"
+        lines.append(f"# HELP {full} {help_text}")
+        lines.append(f"# TYPE {full} {kind}")
+        for (name, labels), agg in items:
+            label_text = _format_labels((("step", name),) + labels)
+            if field is None:
+                lines.append(f"{full}_sum{label_text} {agg['seconds']:.6f}")
+                lines.append(f"{full}_count{label_text} {agg['count']}")
+            elif kind == "counter":
+                lines.append(f"{full}_total{label_text} {agg[field]}")
+            else:
+                lines.append(f"{full}{label_text} {agg[field]:.6f}")
+
+    for name, value in (extra or {}).items():
+        full = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# TYPE {full} gauge")
+        lines.append(f"{full} {value}")
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def start_run(metrics_dir=METRICS_DIR, profile=False, run_id=None):
+    """
+    Beginnt einen Messlauf: setzt die Zähler zurück und schreibt ab jetzt jede Span als
+    JSON-Zeile nach <metrics_dir>/<run_id>.jsonl.
+
+    Args:
+        metrics_dir (str): Ausgabeordner
+        profile (bool): CPU-Profil der mit profiled() markierten Schritte aufzeichnen
+        run_id (str, optional): Kennung des Laufs (Standard: Zeitstempel + Prozess-ID)
+
+    Returns:
+        str: run_id
+    """
+    finish_run(write=False)
+    os.makedirs(metrics_dir, exist_ok=True)
+    run_id = run_id or f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    handler = logging.FileHandler(os.path.join(metrics_dir, f"{run_id}.jsonl"), encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+    reset_metrics()
+    _run.update(id=run_id, dir=metrics_dir, started=time.perf_counter(), handler=handler,
+                profile=True if profile else None)
+    return run_id
+
+
+def finish_run(write=True, extra=None):
+    """
+    Beendet den Messlauf und schreibt <run_id>.prom (und bei Profiling <run_id>.prof).
+
+    Args:
+        write (bool): Ausgabedateien schreiben (False = nur aufräumen)
+        extra (dict, optional): Zusätzliche Gauges für die .prom-Datei (z. B. HTTP-Zähler)
+
+    Returns:
+        dict: Pfade {"log", "prometheus", "profile"} bzw. leer, wenn kein Lauf aktiv war
+    """
+    if _run["id"] is None:
+        return {}
+    run_id, metrics_dir, handler = _run["id"], _run["dir"], _run["handler"]
+    profile = _run["profile"]
+    paths = {"log": os.path.join(metrics_dir, f"{run_id}.jsonl")}
+
+    if write:
+        gauges = {"run_duration_seconds": round(time.perf_counter() - _run["started"], 6),
+                  "run_timestamp_seconds": int(time.time())}
+        gauges.update(extra or {})
+        prom_path = os.path.join(metrics_dir, f"{run_id}.prom")
+        tmp_path = f"{prom_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(render_prometheus(gauges))
+        os.replace(tmp_path, prom_path)  # Textfile-Collector sieht nie eine halbe Datei
+        paths["prometheus"] = prom_path
+        if isinstance(profile, pstats.Stats):
+            paths["profile"] = os.path.join(metrics_dir, f"{run_id}.prof")
+            profile.dump_stats(paths["profile"])
+
+    logger.removeHandler(handler)
+    logger.setLevel(logging.NOTSET)
+    handler.close()
+    _run.update(id=None, dir=None, started=None, handler=None, profile=None)
+    return paths
+
+
+def format_profile(path, top=PROFILE_TOP):
+    """Kurze Zusammenfassung (nach kumulierter Zeit) einer .prof-Datei."""
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(top)
+    return out.getvalue()
+
+
+def format_summary():
+    """Tabelle der erfassten Schritte (Anzahl, Summe, Maximum, Bytes, Entitäten, Fehler) für die Konsole."""
+    rows = get_metrics()
+    if not rows:
+        return ""
+    lines = [f"  {'Schritt':<34} {'Anzahl':>6} {'Summe s':>9} {'Max s':>8} {'Bytes':>11} {'Entitäten':>9} {'Fehler':>6}"]
+    for row in rows:
+        label = row["span"] + "".join(f" {v}" for v in row["labels"].values())
+        lines.append(f"  {label:<34} {row['count']:>6} {row['seconds']:>9.3f} {row['max']:>8.3f} "
+                     f"{row['bytes']:>11} {row['entities']:>9} {row['errors']:>6}")
+    return "\n".join(lines)
@@ -0,0 +1,84 @@
+# utils/reference_cache.py – Kleiner persistenter TTL-Cache für selten ändernde MDM-Referenzwerte
+import json
+import os
+import threading
+import time
+
+# Speicherort des Caches (geteilt von CLI-Läufen und UI-Workern)
+DEFAULT_CACHE_PATH = os.path.join("data", "reference_cache.json")
+
+_cache_lock = threading.Lock()
+
+
+def _cache_path():
+    return os.getenv("REFERENCE_CACHE_PATH", DEFAULT_CACHE_PATH)
+
+
+def _read_cache(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        # Fehlender oder beschädigter Cache gilt als leer
+        return {}
+
+
+def _write_cache(path, data):
+    # Atomar schreiben, damit parallel lesende Prozesse nie eine halbe Datei sehen
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def get_cached_reference(namespace, key, ttl):
+    """
+    Liest einen Referenzwert aus dem Cache.
+
+    Args:
+        namespace (str): Bereich des Caches (z. B. "nummernkreis").
+        key (str): Schlüssel innerhalb des Bereichs (z. B. Wert von axartikelartsap).
+        ttl (float): Maximales Alter des Eintrags in Sekunden.
+
+    Returns:
+        Der gecachte Wert oder None, wenn kein gültiger Eintrag vorhanden ist.
+    """
+    with _cache_lock:
+        entry = _read_cache(_cache_path()).get(namespace, {}).get(str(key))
+    if not entry or time.time() - entry.get("stored_at", 0) > ttl:
+        return None
+    return entry.get("value")
+
+
+def put_cached_reference(namespace, key, value):
+    """
+    Speichert einen Referenzwert im Cache.
+
+    Args:
+        namespace (str): Bereich des Caches.
+        key (str): Schlüssel innerhalb des Bereichs.
+        value: JSON-serialisierbarer Wert.
+    """
+    path = _cache_path()
+    with _cache_lock:
+        data = _read_cache(path)
+        data.setdefault(namespace, {})[str(key)] = {"value": value, "stored_at": time.time()}
+        _write_cache(path, data)
+
+
+def clear_reference_cache(namespace=None):
+    """
+    Leert den Cache komplett oder nur einen Bereich (z. B. für --refresh-reference-cache).
+
+    Args:
+        namespace (str, optional): Nur diesen Bereich leeren.
+    """
+    path = _cache_path()
+    with _cache_lock:
+        data = _read_cache(path)
+        if namespace is None:
+            data = {}
+        else:
+            data.pop(namespace, None)
+        _write_cache(path, data)
@@ -0,0 +1,168 @@
+# utils/serialization.py – JSON-Serialisierung (kompakt/lesbar, optional orjson) und gzip für Dateien und Uploads
+import gzip
+import json
+import os
+import zlib
+
+try:
+    import orjson  # Optional: deutlich schnellere Serialisierung, falls installiert
+except ImportError:  # pragma: no cover - abhängig von der Umgebung
+    orjson = None
+
+# Kompressionsstufe für gzip (6 = Standard von gzip; 1 = schnell, 9 = klein)
+DEFAULT_GZIP_LEVEL = 6
+GZIP_SUFFIX = ".gz"
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def get_backend():
+    """
+    Liefert das verwendete JSON-Backend.
+
+    Standard ist orjson, sofern installiert; mit JSON_BACKEND=json wird immer das
+    json-Modul der Standardbibliothek verwendet.
+
+    Returns:
+        str: "orjson" oder "json"
+    """
+    if orjson is not None and os.getenv("JSON_BACKEND", "auto").lower() != "json":
+        return "orjson"
+    return "json"
+
+
+def dumps(data, pretty=False):
+    """
+    Serialisiert Daten als UTF-8-JSON.
+
+    Kompakt (ohne Leerzeichen) ist der Standard – Einrückung verdoppelt bei Entitäten mit vielen
+    Attributwerten etwa die Grösse. Werte, die orjson nicht abbildet (z. B. Ganzzahlen über
+    64 Bit), werden mit dem json-Modul serialisiert.
+
+    Args:
+        data: Zu serialisierende Daten
+        pretty (bool): Mit Einrückung (2 Leerzeichen) für von Hand gelesene Dateien
+
+    Returns:
+        bytes: JSON als UTF-8
+    """
+    if get_backend() == "orjson":
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0))
+        except TypeError:
+            pass
+    if pretty:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data):
+    """
+    Liest JSON aus bytes oder str (mit orjson, sofern verfügbar).
+
+    Args:
+        data (bytes|str): JSON-Text
+
+    Returns:
+        Die gelesenen Daten
+    """
+    if get_backend() == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def is_gzip_path(path):
+    """True, wenn der Pfad auf .gz endet."""
+    return path.endswith(GZIP_SUFFIX)
+
+
+def with_gzip_suffix(path, compress):
+    """Hängt bei compress die Endung .gz an (falls noch nicht vorhanden)."""
+    return path if not compress or is_gzip_path(path) else path + GZIP_SUFFIX
+
+
+def open_output(path, level=DEFAULT_GZIP_LEVEL):
+    """
+    Öffnet eine Datei zum binären Schreiben; Pfade mit der Endung .gz werden gzip-komprimiert.
+
+    Returns:
+        file: Binäre Datei (als Kontextmanager verwendbar)
+    """
+    if is_gzip_path(path):
+        return gzip.open(path, "wb", compresslevel=level)
+    return open(path, "wb")
+
+
+def open_input(path):
+    """
+    Öffnet eine Datei zum binären Lesen; gzip-komprimierte Dateien werden am Dateikopf
+    erkannt und transparent entpackt (unabhängig von der Endung).
+
+    Returns:
+        file: Binäre Datei (als Kontextmanager verwendbar)
+    """
+    f = open(path, "rb")
+    if f.read(2) == _GZIP_MAGIC:
+        f.close()
+        return gzip.open(path, "rb")
+    f.seek(0)
+    return f
+
+
+def save(data, path, pretty=False, compress=False):
+    """
+    Schreibt Daten als JSON-Datei.
+
+    Args:
+        data: Zu speichernde Daten
+        path (str): Zielpfad (bei compress wird .gz angehängt)
+        pretty (bool): Mit Einrückung schreiben
+        compress (bool): gzip-komprimiert schreiben
+
+    Returns:
+        str: Tatsächlich geschriebener Pfad
+    """
+    path = with_gzip_suffix(path, compress)
+    with open_output(path) as f:
+        f.write(dumps(data, pretty))
+    return path
+
+
+def load(path):
+    """Liest eine (ggf. gzip-komprimierte) JSON-Datei."""
+    with open_input(path) as f:
+        return loads(f.read())
+
+
+def gzip_compressor(level=DEFAULT_GZIP_LEVEL):
+    """
+    Fortlaufender gzip-Kompressor (compress()/flush() wie zlib), ohne Zeitstempel im Kopf.
+
+    Args:
+        level (int): Kompressionsstufe 1–9
+
+    Returns:
+        zlib.Compress: Kompressor-Objekt
+    """
+    return zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def gzip_chunks(chunks, level=DEFAULT_GZIP_LEVEL):
+    """
+    Komprimiert einen Strom von bytes-Blöcken fortlaufend im gzip-Format.
+
+    Die Ausgabe ist bei gleicher Eingabe identisch (kein Zeitstempel im Kopf), sodass die
+    Länge vorab in einem eigenen Durchlauf bestimmt werden kann.
+
+    Args:
+        chunks (iterable): Unkomprimierte bytes-Blöcke
+        level (int): Kompressionsstufe 1–9
+
+    Returns:
+        generator: Komprimierte bytes-Blöcke
+    """
+    compressor = gzip_compressor(level)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()